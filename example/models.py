@@ -6,6 +6,7 @@ from feincms.content.medialibrary.models import MediaFileContent
 from feincms.content.application.models import ApplicationContent
 
 from zipfelchappe.models import Project
+from zipfelchappe.views import conditional_response_processor
 
 MEDIA_TYPE_CHOICES = (
     ('full', _('full')),
@@ -28,8 +29,11 @@ Page.create_content_type(ApplicationContent, APPLICATIONS=(
 Page.create_content_type(RichTextContent)
 Page.create_content_type(MediaFileContent, TYPE_CHOICES=MEDIA_TYPE_CHOICES)
 
+Page.register_response_processor(conditional_response_processor)
+
 
 Project.register_extensions(
+    'zipfelchappe.extensions.author',
     'zipfelchappe.extensions.categories',
 )
 
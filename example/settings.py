@@ -124,6 +124,7 @@ INSTALLED_APPS = [
     'zipfelchappe.paypal',
     'zipfelchappe.postfinance',
     'zipfelchappe.cod',
+    'zipfelchappe.fake',
 
     'example',
     'example.backerprofiles',
@@ -175,6 +176,10 @@ LOGGING = {
             'handlers': ['console'],
             'level': 'DEBUG',
         },
+        'zipfelchappe.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
         'console': {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
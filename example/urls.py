@@ -15,6 +15,8 @@ urlpatterns = patterns('',
     url(r'^paypal/', include('zipfelchappe.paypal.urls')),
     url(r'^postfinance/', include('zipfelchappe.postfinance.urls')),
     url(r'^cod/', include('zipfelchappe.cod.urls')),
+    url(r'^fake/', include('zipfelchappe.fake.urls')),
+    url(r'^progress/', include('zipfelchappe.progress_urls')),
 )
 
 if 'rosetta' in settings.INSTALLED_APPS:
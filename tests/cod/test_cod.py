@@ -1,6 +1,7 @@
 # coding: utf-8
 from __future__ import absolute_import, unicode_literals
 from django.core import mail
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.contrib.auth.tests.utils import skipIfCustomUser
 from django.test import TestCase, Client
@@ -41,6 +42,8 @@ class CodTest(TestCase):
 
     def tearDown(self):
         mail.outbox = []
+        # the app_reverse prefix of the '/' override must not leak
+        cache.clear()
 
     def get_client_with_session(self):
         client = Client()
@@ -0,0 +1,2 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
\ No newline at end of file
@@ -0,0 +1,89 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth.tests.utils import skipIfCustomUser
+from django.core.urlresolvers import reverse
+from django.test import TestCase, Client
+from django.utils import timezone
+from feincms.content.application.models import ApplicationContent
+from feincms.module.page.models import Page
+
+from tests.factories import ProjectFactory, PledgeFactory
+from zipfelchappe import app_settings, payment_providers
+from zipfelchappe.fake.provider import FakeProvider, FakePaymentException
+from zipfelchappe.fake.tasks import process_payments
+from zipfelchappe.models import Pledge
+
+
+@skipIfCustomUser
+class FakeProviderTest(TestCase):
+
+    def setUp(self):
+        self.page = Page.objects.create(title='Projects', slug='projects')
+        ct = self.page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=self.page, urlconf_path=app_settings.ROOT_URLS)
+
+        self.project = ProjectFactory.create()
+        self.p1 = PledgeFactory.create(
+            project=self.project,
+            amount=10,
+            provider='fake',
+            status=Pledge.UNAUTHORIZED
+        )
+        self.client = self.get_client_with_session()
+
+    def tearDown(self):
+        payment_providers['fake'] = FakeProvider('fake')
+
+    def get_client_with_session(self):
+        client = Client()
+        engine = import_module(settings.SESSION_ENGINE)
+        s = engine.SessionStore()
+        s.save()
+        client.cookies[settings.SESSION_COOKIE_NAME] = s.session_key
+        return client
+
+    def pay(self):
+        session = self.client.session
+        session['pledge_id'] = self.p1.id
+        session.save()
+        return self.client.get(reverse('zipfelchappe_fake_payment'))
+
+    def test_payment_view_authorizes(self):
+        response = self.pay()
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].endswith('/pledge/thankyou/'))
+        self.assertEqual(Pledge.objects.get(pk=self.p1.pk).status, Pledge.AUTHORIZED)
+
+    def test_payment_view_declines(self):
+        payment_providers['fake'] = FakeProvider('fake', failure_probability=1)
+        response = self.pay()
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].endswith('/pledge/cancel/'))
+        self.assertEqual(Pledge.objects.get(pk=self.p1.pk).status, Pledge.FAILED)
+
+    def test_collect_pledge(self):
+        self.p1.status = Pledge.AUTHORIZED
+        self.p1.save()
+        FakeProvider('fake').collect_pledge(self.p1)
+        self.assertEqual(Pledge.objects.get(pk=self.p1.pk).status, Pledge.PAID)
+
+    def test_collect_pledge_fails(self):
+        self.p1.status = Pledge.AUTHORIZED
+        self.p1.save()
+        provider = FakeProvider('fake', failure_probability=1)
+        self.assertRaises(FakePaymentException, provider.collect_pledge, self.p1)
+        self.assertEqual(Pledge.objects.get(pk=self.p1.pk).status, Pledge.FAILED)
+
+    def test_process_payments(self):
+        self.p1.status = Pledge.AUTHORIZED
+        self.p1.amount = 200
+        self.p1.save()
+        Project = self.project.__class__
+        Project.objects.filter(pk=self.project.pk).update(
+            end=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(process_payments(), 1)
+        self.assertEqual(Pledge.objects.get(pk=self.p1.pk).status, Pledge.PAID)
@@ -0,0 +1,63 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils.timezone import now
+
+from tests.factories import ProjectFactory, PledgeFactory, RewardFactory
+from zipfelchappe.models import Pledge
+from zipfelchappe.paypal.models import Preapproval
+from zipfelchappe.paypal.tasks import sync_preapprovals, stale_preapprovals
+
+
+class SyncPreapprovalsTest(TestCase):
+
+    def setUp(self):
+        self.project = ProjectFactory.create()
+        self.reward = RewardFactory.create(project=self.project, minimum=10)
+        self.preapprovals = {}
+        for key in ('PA-1', 'PA-2', 'PA-3'):
+            pledge = PledgeFactory.create(project=self.project, amount=10,
+                                          reward=self.reward, provider='paypal',
+                                          status=Pledge.UNAUTHORIZED)
+            self.preapprovals[key] = Preapproval.objects.create(
+                pledge=pledge, key=key, amount=10)
+        Preapproval.objects.update(created=now() - timedelta(hours=1))
+        self.responses = {
+            'PA-1': {'status': 'ACTIVE', 'approved': 'true',
+                     'senderEmail': 'backer@example.com'},
+            'PA-2': {'status': 'CANCELED', 'approved': 'false'},
+            'PA-3': {'error': [{'errorId': '580022', 'message': 'Invalid key'}]},
+        }
+
+    def query(self, key):
+        return self.responses[key]
+
+    def test_sync_preapprovals(self):
+        changes = sync_preapprovals(list(stale_preapprovals()), query=self.query,
+                                    workers=2, rate=None, batch_size=1)
+        self.assertEqual(sorted((p.key, new) for p, old, new in changes), [
+            ('PA-1', 'ACTIVE'), ('PA-2', 'CANCELED'), ('PA-3', None)])
+
+        preapproval = Preapproval.objects.get(key='PA-1')
+        self.assertTrue(preapproval.approved)
+        self.assertEqual(preapproval.sender, 'backer@example.com')
+        self.assertEqual(preapproval.pledge.status, Pledge.AUTHORIZED)
+
+        pledge = Preapproval.objects.get(key='PA-2').pledge
+        self.assertEqual(pledge.status, Pledge.FAILED)
+        self.assertEqual(pledge.reward, None)
+
+        self.assertEqual(Preapproval.objects.get(key='PA-3').pledge.status,
+                         Pledge.UNAUTHORIZED)
+        self.assertEqual([p.key for p in stale_preapprovals()], ['PA-3'])
+
+    def test_abandoned_preapprovals_are_skipped(self):
+        Preapproval.objects.filter(key='PA-1').update(created=now() - timedelta(days=2))
+        self.assertEqual(sorted(p.key for p in stale_preapprovals()), ['PA-2', 'PA-3'])
+        self.assertEqual(len(stale_preapprovals(max_age_hours=72)), 3)
+
+    def test_recent_preapprovals_are_not_stale(self):
+        Preapproval.objects.filter(key='PA-1').update(created=now())
+        self.assertEqual(sorted(p.key for p in stale_preapprovals()), ['PA-2', 'PA-3'])
@@ -0,0 +1,69 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+from django.test import TestCase
+
+from tests.factories import ProjectFactory, PledgeFactory
+from zipfelchappe.models import Pledge
+from zipfelchappe.postfinance.models import Payment
+from zipfelchappe.postfinance.tasks import reconcile_payments, billable_pledges
+
+
+class ReconcileTest(TestCase):
+
+    def setUp(self):
+        self.project = ProjectFactory.create()
+        self.payments = {}
+        for payid, status, pledge_status in (('1', '91', Pledge.AUTHORIZED),
+                                             ('2', '51', Pledge.UNAUTHORIZED),
+                                             ('3', '92', Pledge.AUTHORIZED),
+                                             ('4', '5', Pledge.AUTHORIZED)):
+            pledge = PledgeFactory.create(project=self.project, amount=10,
+                                          provider='postfinance', status=pledge_status)
+            self.payments[payid] = Payment.objects.create(
+                order_id='test-%s' % pledge.pk, pledge=pledge, PAYID=payid, STATUS=status)
+        self.responses = {'1': '9', '2': '5', '3': '93', '4': '5'}
+
+    def query(self, payid):
+        return {'STATUS': self.responses[payid]}
+
+    def test_reconcile_payments(self):
+        changes = reconcile_payments(list(Payment.objects.all()), query=self.query,
+                                     workers=2, rate=None, batch_size=2)
+        self.assertEqual(len(changes), 3)
+
+        def pledge_status(payid):
+            return Payment.objects.get(PAYID=payid).pledge.status
+
+        self.assertEqual(Payment.objects.get(PAYID='1').STATUS, '9')
+        self.assertEqual(pledge_status('1'), Pledge.PAID)
+        self.assertEqual(pledge_status('2'), Pledge.AUTHORIZED)
+        self.assertEqual(pledge_status('3'), Pledge.FAILED)
+        self.assertEqual(pledge_status('4'), Pledge.AUTHORIZED)
+        self.assertEqual(Payment.objects.get(PAYID='3').pledge.details,
+                         'postfinance status 93: Payment refused\n')
+
+    def test_pledges_only_move_forward(self):
+        Pledge.objects.filter(postfinance_payment__PAYID='1').update(status=Pledge.FAILED)
+        Pledge.objects.filter(postfinance_payment__PAYID='2').update(status=Pledge.PROCESSING)
+        self.responses.update({'1': '5', '2': '5', '3': '2'})
+        Pledge.objects.filter(postfinance_payment__PAYID='3').update(status=Pledge.PAID)
+        reconcile_payments(list(Payment.objects.all()), query=self.query)
+
+        def pledge_status(payid):
+            return Payment.objects.get(PAYID=payid).pledge.status
+
+        self.assertEqual(pledge_status('1'), Pledge.FAILED)
+        self.assertEqual(pledge_status('2'), Pledge.PROCESSING)
+        self.assertEqual(pledge_status('3'), Pledge.FAILED)
+
+    def test_failed_queries_are_reported(self):
+        def query(payid):
+            raise IOError('timeout')
+
+        changes = reconcile_payments([self.payments['1']], query=query)
+        self.assertEqual(changes, [(self.payments['1'], '91', None)])
+        self.assertEqual(Payment.objects.get(PAYID='1').STATUS, '91')
+
+    def test_processing_payments_are_not_billable(self):
+        pledges = billable_pledges([self.project])
+        self.assertEqual([p.postfinance_payment.PAYID for p in pledges], ['4'])
@@ -0,0 +1,84 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+from datetime import timedelta
+
+from bs4 import BeautifulSoup
+from django.test import TestCase
+from django.test.client import Client
+from django.utils import timezone
+from feincms.content.application.models import ApplicationContent, app_reverse
+from feincms.module.page.models import Page
+
+from tests.factories import ProjectFactory, PledgeFactory, BackerFactory, UserFactory
+from zipfelchappe import app_settings
+from zipfelchappe.models import Pledge
+from zipfelchappe.utils import keyset_page
+
+
+class KeysetPaginationTest(TestCase):
+
+    def setUp(self):
+        self.project = ProjectFactory.create()
+        start = timezone.now() - timedelta(days=1)
+        self.pledges = []
+        for i in range(5):
+            pledge = PledgeFactory.create(project=self.project, amount=10)
+            # two pledges share the same timestamp
+            Pledge.objects.filter(pk=pledge.pk).update(
+                created=start + timedelta(minutes=min(i, 3)))
+            self.pledges.append(pledge.pk)
+        self.pledges.reverse()
+        self.queryset = self.project.backer_pledges
+
+    def test_pages(self):
+        first = keyset_page(self.queryset, 2)
+        self.assertEqual([p.pk for p in first], self.pledges[:2])
+        self.assertTrue(first.has_next)
+        self.assertFalse(first.has_previous)
+
+        second = keyset_page(self.queryset, 2, after=first.next_cursor)
+        self.assertEqual([p.pk for p in second], self.pledges[2:4])
+
+        last = keyset_page(self.queryset, 2, after=second.next_cursor)
+        self.assertEqual([p.pk for p in last], self.pledges[4:])
+        self.assertFalse(last.has_next)
+
+        back = keyset_page(self.queryset, 2, before=last.previous_cursor)
+        self.assertEqual([p.pk for p in back], self.pledges[2:4])
+        self.assertTrue(back.has_previous)
+
+    def test_invalid_cursor(self):
+        page = keyset_page(self.queryset, 2, after='garbage')
+        self.assertEqual([p.pk for p in page], self.pledges[:2])
+
+    def test_backer_names_need_no_extra_queries(self):
+        for pledge in Pledge.objects.all():
+            pledge.set_backer(BackerFactory.create(user=UserFactory.create()))
+            pledge.save()
+        with self.assertNumQueries(1):
+            names = [p.backer_name for p in keyset_page(self.queryset, 10)]
+        self.assertEqual(names, ['Hans Muster'] * 5)
+
+
+class BackerListViewTest(TestCase):
+
+    def setUp(self):
+        page = Page.objects.create(title='Projects', slug='projects')
+        ct = page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=page, urlconf_path=app_settings.ROOT_URLS)
+        self.project = ProjectFactory.create()
+        for i in range(app_settings.PAGINATE_BACKERS_BY + 1):
+            PledgeFactory.create(project=self.project, amount=1)
+
+    def test_backer_pages(self):
+        backers_url = app_reverse('zipfelchappe_project_backers', app_settings.ROOT_URLS,
+                                  kwargs={'slug': self.project.slug})
+        response = Client().get(backers_url)
+        backers = BeautifulSoup(response.content)
+        self.assertEqual(len(backers.find_all('li')), app_settings.PAGINATE_BACKERS_BY)
+        self.assertIn('%d backers' % (app_settings.PAGINATE_BACKERS_BY + 1), backers.text)
+
+        next_url = backers.find(class_='step-links').find('a')['href']
+        response = Client().get(backers_url + next_url.split('#')[0])
+        backers = BeautifulSoup(response.content)
+        self.assertEqual(len(backers.find_all('li')), 1)
@@ -0,0 +1,145 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+from datetime import timedelta
+
+from bs4 import BeautifulSoup
+from django.test import TestCase
+from django.test.client import Client
+from feincms.content.application.models import ApplicationContent
+from feincms.content.richtext.models import RichTextContent
+from feincms.module.page.models import Page
+
+from tests.factories import ProjectFactory, RewardFactory, PledgeFactory
+from zipfelchappe import app_settings
+from zipfelchappe.caching import generation
+from zipfelchappe.models import Category, MailTemplate, Pledge, Project, Update
+from zipfelchappe.translations.models import (
+    MailTemplateTranslation, ProjectTranslation, RewardTranslation)
+
+
+class GenerationTest(TestCase):
+
+    def setUp(self):
+        self.project = ProjectFactory.create()
+        self.other = ProjectFactory.create()
+
+    def assertBumped(self, func):
+        before = generation(self.project.pk), generation(self.other.pk), generation()
+        func()
+        after = generation(self.project.pk), generation(self.other.pk), generation()
+        self.assertGreater(after[0], before[0])
+        self.assertEqual(after[1], before[1])
+        self.assertGreater(after[2], before[2])
+
+    def test_related_changes_bump_generation(self):
+        self.assertBumped(lambda: self.project.save())
+        self.assertBumped(lambda: RewardFactory.create(project=self.project, minimum=10))
+        self.assertBumped(lambda: Update.objects.create(project=self.project, title='News'))
+        pledge = PledgeFactory.create(project=self.project, amount=10)
+
+        def fail_pledge():
+            pledge.status = Pledge.FAILED
+            pledge.save()
+        self.assertBumped(fail_pledge)
+        self.assertBumped(lambda: pledge.delete())
+
+    def test_pledge_saves(self):
+        # unauthorized pledges reserve rewards
+        reward = RewardFactory.create(project=self.project, minimum=10)
+        pledge = Pledge(project=self.project, amount=10, reward=reward)
+        self.assertBumped(lambda: pledge.save())
+
+        before = generation(self.project.pk), generation()
+        pledge.details = 'checkout'
+        pledge.save()
+        Pledge.objects.get(pk=pledge.pk).save()
+        Pledge.objects.only('details').get(pk=pledge.pk).save()
+        self.assertEqual(before, (generation(self.project.pk), generation()))
+
+        def change(**values):
+            def save():
+                loaded = Pledge.objects.get(pk=pledge.pk)
+                for field, value in values.items():
+                    setattr(loaded, field, value)
+                loaded.save()
+            return save
+        self.assertBumped(change(status=Pledge.AUTHORIZED))
+        self.assertBumped(change(amount=20))
+        self.assertBumped(change(reward=None))
+
+    def test_categories_bump_generation(self):
+        art = Category.objects.create(title='Art', slug='art')
+        self.assertBumped(lambda: self.project.categories.add(art))
+        self.assertBumped(lambda: art.projects.remove(self.project))
+
+    def test_translations_bump_generation(self):
+        translation = ProjectTranslation.objects.create(
+            translation_of=self.project, lang='de', title='Projekt')
+        reward = RewardFactory.create(project=self.project, minimum=10)
+        self.assertBumped(lambda: RewardTranslation.objects.create(
+            translation=translation, translation_of=reward, description='Dank'))
+        content_type = ProjectTranslation.content_type_for(RichTextContent)
+        self.assertBumped(lambda: content_type.objects.create(
+            parent=translation, region='main', ordering=0, text='Text'))
+
+    def test_translations_touch_translated_object(self):
+        translation = ProjectTranslation.objects.create(
+            translation_of=self.project, lang='de', title='Projekt')
+        reward = RewardFactory.create(project=self.project, minimum=10)
+        mail_template = MailTemplate.objects.create(
+            project=self.project, action=MailTemplate.ACTION_THANKYOU,
+            subject='Thanks', template='Hi')
+        translations = [
+            RewardTranslation(translation=translation, translation_of=reward,
+                              description='Dank'),
+            MailTemplateTranslation(translation=translation, translation_of=mail_template,
+                                    subject='Danke', template='Hallo'),
+        ]
+        for obj in translations:
+            model = type(obj.translation_of)
+            model.objects.filter(pk=obj.translation_of_id).update(
+                modified=obj.translation_of.modified - timedelta(days=1))
+            modified = model.objects.get(pk=obj.translation_of_id).modified
+            obj.save()
+            self.assertGreater(model.objects.get(pk=obj.translation_of_id).modified, modified)
+            obj.delete()
+            self.assertGreater(model.objects.get(pk=obj.translation_of_id).modified, modified)
+
+    def test_contents_bump_generation(self):
+        content_type = Project.content_type_for(RichTextContent)
+        content = content_type.objects.create(
+            parent=self.project, region='main', ordering=0, text='Text')
+        self.assertBumped(lambda: content.save())
+        self.assertBumped(lambda: content.delete())
+
+
+class FragmentCacheTest(TestCase):
+
+    def setUp(self):
+        page = Page.objects.create(title='Projects', slug='projects')
+        ct = page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=page, urlconf_path=app_settings.ROOT_URLS)
+        self.project = ProjectFactory.create()
+        self.client = Client()
+
+    def achieved(self):
+        soup = BeautifulSoup(self.client.get(self.project.get_absolute_url()).content)
+        return soup.find(class_='progress').find(class_='info').text.strip()
+
+    def test_progress_is_refreshed_by_pledges(self):
+        self.assertEqual(self.achieved(), '0 CHF (0%)')
+        PledgeFactory.create(project=self.project, amount=100)
+        self.assertEqual(self.achieved(), '100 CHF (50%)')
+
+    def test_rewards_are_refreshed(self):
+        self.client.get(self.project.get_absolute_url())
+        RewardFactory.create(project=self.project, minimum=42, description='A mug')
+        response = self.client.get(self.project.get_absolute_url())
+        self.assertContains(response, 'A mug')
+
+    def test_progress_is_cached(self):
+        pledge = PledgeFactory.create(project=self.project, amount=100)
+        self.assertEqual(self.achieved(), '100 CHF (50%)')
+        # queryset updates don't send signals, the fragment stays cached
+        Pledge.objects.filter(pk=pledge.pk).update(amount=200)
+        self.assertEqual(self.achieved(), '100 CHF (50%)')
@@ -0,0 +1,64 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from feincms.content.application.models import ApplicationContent
+from feincms.module.page.models import Page
+
+from tests.factories import ProjectFactory, RewardFactory, UserFactory, PledgeFactory
+from zipfelchappe import app_settings
+
+# Queries on zipfelchappe tables per checkout step, see docs/installation.rst
+BUDGET = {
+    'back form': 5,
+    'back form submit': 5,
+    'authenticate': 4,
+    'thank you': 2,
+}
+
+
+class CheckoutQueryBudgetTest(TestCase):
+
+    def setUp(self):
+        page = Page.objects.create(title='Projects', slug='projects')
+        ct = page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=page, urlconf_path=app_settings.ROOT_URLS)
+
+    def checkout(self, rewards):
+        """ Returns the number of zipfelchappe queries of each step """
+        cache.clear()
+        Site.objects.clear_cache()
+        project = ProjectFactory.create()
+        for i in range(rewards):
+            reward = RewardFactory.create(project=project, minimum=10 + i, quantity=5)
+            PledgeFactory.create(project=project, reward=reward, amount=10 + i)
+        user = UserFactory.create()
+        user.set_password('test')
+        user.save()
+        self.client.login(username=user.username, password='test')
+
+        url = '/projects/back/%s/' % project.slug
+        steps = (
+            ('back form', 'get', url, {}),
+            ('back form submit', 'post', url, {
+                'amount': '20', 'reward': project.rewards.all()[0].pk,
+                'provider': 'paypal', 'accept_tac': True}),
+            ('authenticate', 'get', '/projects/backer/authenticate/', {}),
+            ('thank you', 'get', '/projects/pledge/thankyou/', {}),
+        )
+        counts = {}
+        for step, method, path, data in steps:
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(path, data)
+            self.assertIn(response.status_code, (200, 302))
+            counts[step] = len([q for q in queries if 'zipfelchappe_' in q['sql']])
+        return counts
+
+    def test_budget(self):
+        for rewards in (1, 10, 100):
+            self.assertEqual(self.checkout(rewards), BUDGET,
+                             'Checkout with %d rewards' % rewards)
@@ -0,0 +1,216 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+from datetime import timedelta
+from smtplib import SMTPException
+from StringIO import StringIO
+
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.template import Context
+from django.test import TestCase
+from django.utils import timezone
+from feincms.content.application.models import ApplicationContent
+from feincms.module.page.models import Page
+
+from tests.factories import ProjectFactory, PledgeFactory, BackerFactory, UserFactory
+from zipfelchappe import app_settings, emails
+from zipfelchappe.emails import (
+    send_update_mails, send_closing_mails, queue_mail, send_outbox,
+    compiled_mail_template)
+from zipfelchappe.models import MailTemplate, OutboxMessage, Pledge, Project, Update
+
+
+class UpdateMailsTest(TestCase):
+
+    def setUp(self):
+        page = Page.objects.create(title='Projects', slug='projects')
+        ct = page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=page, urlconf_path=app_settings.ROOT_URLS)
+
+        self.project = ProjectFactory.create()
+        self.backers = [BackerFactory.create(user=UserFactory.create()) for i in range(3)]
+        for backer in self.backers:
+            PledgeFactory.create(project=self.project, amount=10, backer=backer)
+        # a second pledge of the same backer and a failed one
+        PledgeFactory.create(project=self.project, amount=20, backer=self.backers[0])
+        PledgeFactory.create(project=self.project, amount=10, status=Pledge.FAILED,
+                             backer=BackerFactory.create(user=UserFactory.create()))
+        self.update = Update.objects.create(project=self.project, title='News',
+                                            status=Update.STATUS_PUBLISHED)
+
+    def test_send_update_mails(self):
+        sent = send_update_mails(self.update, batch_size=2)
+
+        self.assertEqual(sent, 3)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox),
+                         sorted(b.user.email for b in self.backers))
+        self.assertIn(self.project.title, mail.outbox[0].subject)
+        update = Update.objects.get(pk=self.update.pk)
+        self.assertTrue(update.mails_sent)
+        self.assertEqual(update.mails_checkpoint, self.backers[-1].pk)
+
+    def test_resume_from_checkpoint(self):
+        Update.objects.filter(pk=self.update.pk).update(
+            mails_checkpoint=self.backers[1].pk)
+
+        out = StringIO()
+        call_command('send_update_mails', stdout=out)
+        self.assertEqual([m.to[0] for m in mail.outbox], [self.backers[2].user.email])
+
+        call_command('send_update_mails', stdout=out)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_old_updates_not_mailed(self):
+        Update.objects.filter(pk=self.update.pk).update(
+            modified=timezone.now() - timedelta(days=app_settings.UPDATE_MAILS_DAYS + 1))
+
+        call_command('send_update_mails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(Update.objects.get(pk=self.update.pk).mails_sent)
+
+        call_command('send_update_mails', days=app_settings.UPDATE_MAILS_DAYS + 2,
+                     stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+
+
+class ClosingMailsTest(TestCase):
+
+    def setUp(self):
+        self.project = ProjectFactory.create(goal=100)
+        self.backers = [BackerFactory.create(user=UserFactory.create()) for i in range(3)]
+        for backer in self.backers:
+            PledgeFactory.create(project=self.project, amount=10, backer=backer)
+
+    def end_project(self):
+        Project.objects.filter(pk=self.project.pk).update(
+            end=timezone.now() - timedelta(minutes=1))
+
+    def test_running_projects_are_skipped(self):
+        call_command('send_closing_mails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_unsuccessful_project(self):
+        self.end_project()
+        call_command('send_closing_mails', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn('not reached', mail.outbox[0].subject)
+        self.assertTrue(Project.objects.get(pk=self.project.pk).closing_mails_sent)
+
+        call_command('send_closing_mails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_old_projects_are_skipped(self):
+        Project.objects.filter(pk=self.project.pk).update(
+            end=timezone.now() - timedelta(days=app_settings.CLOSING_MAILS_DAYS + 1))
+        call_command('send_closing_mails', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command('send_closing_mails', days=app_settings.CLOSING_MAILS_DAYS + 2,
+                     stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_successful_project_resumes(self):
+        PledgeFactory.create(project=self.project, amount=100, backer=self.backers[0])
+        Project.objects.filter(pk=self.project.pk).update(
+            closing_mails_checkpoint=self.backers[0].pk)
+        self.end_project()
+
+        sent = send_closing_mails(Project.objects.get(pk=self.project.pk))
+        self.assertEqual(sent, 2)
+        self.assertIn('successfully been funded', mail.outbox[0].subject)
+
+
+class FlakyBackend(locmem.EmailBackend):
+    """ Refuses mails to addresses starting with fail """
+
+    def send_messages(self, messages):
+        if any(m.to[0].startswith('fail') for m in messages):
+            raise SMTPException('Relay access denied')
+        return super(FlakyBackend, self).send_messages(messages)
+
+
+class OutboxTest(TestCase):
+
+    def setUp(self):
+        emails.MAIL_OUTBOX = True
+
+    def tearDown(self):
+        emails.MAIL_OUTBOX = False
+
+    def test_queue_and_send(self):
+        queue_mail('Hello', 'Thanks', ['backer@example.org'])
+        queue_mail('Hello', 'Thanks', ['fail@example.org'])
+        queue_mail('Slip', 'Please', ['a@example.org', 'b@example.org'])
+        self.assertEqual(len(mail.outbox), 0)
+
+        sent, failed = send_outbox(batch_size=2, max_attempts=2,
+                                   connection=FlakyBackend())
+        self.assertEqual((sent, failed), (2, 1))
+        self.assertEqual([m.to for m in mail.outbox],
+                         [['backer@example.org'], ['a@example.org', 'b@example.org']])
+
+        message = OutboxMessage.objects.get(recipients='fail@example.org')
+        self.assertEqual(message.attempts, 1)
+        self.assertIn('Relay access denied', message.last_error)
+
+        self.assertEqual(send_outbox(max_attempts=2, connection=FlakyBackend()), (0, 1))
+        self.assertEqual(send_outbox(max_attempts=2, connection=FlakyBackend()), (0, 0))
+        self.assertEqual(OutboxMessage.objects.filter(sent__isnull=True).count(), 1)
+
+    def test_claimed_messages_are_skipped(self):
+        queue_mail('Hello', 'Thanks', ['claimed@example.org'])
+        queue_mail('Hello', 'Thanks', ['abandoned@example.org'])
+        OutboxMessage.objects.filter(recipients='claimed@example.org').update(
+            claimed=timezone.now())
+        OutboxMessage.objects.filter(recipients='abandoned@example.org').update(
+            claimed=timezone.now() - timedelta(
+                seconds=app_settings.MAIL_OUTBOX_CLAIM_TIMEOUT + 1))
+
+        self.assertEqual(send_outbox(connection=FlakyBackend()), (1, 0))
+        self.assertEqual([m.to for m in mail.outbox], [['abandoned@example.org']])
+
+    def test_sent_right_after_delivery(self):
+        queue_mail('Hello', 'Thanks', ['first@example.org'])
+        queue_mail('Hello', 'Thanks', ['second@example.org'])
+
+        class InterruptedBackend(locmem.EmailBackend):
+            def send_messages(self, messages):
+                if messages[0].to == ['second@example.org']:
+                    raise RuntimeError('killed')
+                return super(InterruptedBackend, self).send_messages(messages)
+
+        self.assertRaises(RuntimeError, send_outbox, connection=InterruptedBackend())
+        self.assertEqual(list(OutboxMessage.objects.filter(sent__isnull=False).values_list(
+            'recipients', flat=True)), ['first@example.org'])
+        # the interrupted message stays claimed until the timeout
+        self.assertEqual(send_outbox(connection=FlakyBackend()), (0, 0))
+
+
+class CompiledMailTemplateTest(TestCase):
+
+    def setUp(self):
+        self.project = ProjectFactory.create()
+        self.mail_template = MailTemplate.objects.create(
+            project=self.project, action=MailTemplate.ACTION_THANKYOU,
+            subject='Thanks {{ pledge.amount }}', template='Hi')
+
+    def test_templates_are_compiled_once(self):
+        templates = compiled_mail_template(self.project, MailTemplate.ACTION_THANKYOU)
+        self.assertEqual(templates[0].render(Context({'pledge': {'amount': 5}})), 'Thanks 5')
+
+        with self.assertNumQueries(1):
+            self.assertIs(templates, compiled_mail_template(
+                self.project, MailTemplate.ACTION_THANKYOU))
+
+    def test_changed_templates_are_recompiled(self):
+        compiled_mail_template(self.project, MailTemplate.ACTION_THANKYOU)
+        self.mail_template.template = 'Hello'
+        self.mail_template.save()
+
+        templates = compiled_mail_template(self.project, MailTemplate.ACTION_THANKYOU)
+        self.assertEqual(templates[1].render(Context()), 'Hello')
+
+    def test_missing_template(self):
+        self.assertIsNone(compiled_mail_template(ProjectFactory.create(), 'thankyou'))
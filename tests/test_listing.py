@@ -0,0 +1,188 @@
+from __future__ import absolute_import, unicode_literals
+from datetime import timedelta
+
+from bs4 import BeautifulSoup
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.six import StringIO
+from feincms.content.application.models import ApplicationContent
+from feincms.module.page.models import Page
+
+from tests.factories import ProjectFactory, PledgeFactory
+from zipfelchappe import app_settings
+from zipfelchappe.caching import generation
+from zipfelchappe.listing import (
+    cached_project_facets, filter_projects, project_facets, refresh_sort_keys)
+from zipfelchappe.models import Category, Pledge, Project
+
+
+class SortKeysTest(TestCase):
+
+    def setUp(self):
+        self.project = ProjectFactory.create(goal=200)
+        PledgeFactory.create(project=self.project, amount=100)
+        PledgeFactory.create(project=self.project, amount=51)
+        PledgeFactory.create(project=self.project, amount=500, status=Pledge.FAILED)
+        old = PledgeFactory.create(project=self.project, amount=9)
+        Pledge.objects.filter(pk=old.pk).update(
+            created=timezone.now() - timedelta(days=app_settings.TRENDING_DAYS + 1))
+
+    def test_refresh(self):
+        self.assertEqual(refresh_sort_keys(), 1)
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual(project.funded_percent, 80)
+        self.assertEqual(project.backer_total, 3)
+        self.assertAlmostEqual(project.trending_score, 75.5 / app_settings.TRENDING_DAYS)
+
+        # Nothing changed since the last run
+        self.assertEqual(refresh_sort_keys(), 0)
+
+    def test_refresh_bumps_lists(self):
+        before = generation()
+        refresh_sort_keys()
+        self.assertNotEqual(before, generation())
+
+    def test_command(self):
+        out = StringIO()
+        call_command('refresh_sort_keys', stdout=out)
+        self.assertIn('1 projects updated', out.getvalue())
+
+
+class FacetTest(TestCase):
+
+    def setUp(self):
+        self.art = Category.objects.create(title='Art', slug='art')
+        self.music = Category.objects.create(title='Music', slug='music')
+        self.active = ProjectFactory.create(currency='CHF')
+        self.active.categories.add(self.art, self.music)
+        self.successful = ProjectFactory.create(
+            currency='EUR', end=timezone.now() - timedelta(days=1), funded_percent=120)
+        self.successful.categories.add(self.art)
+        self.unsuccessful = ProjectFactory.create(
+            currency='CHF', end=timezone.now() - timedelta(days=1))
+        ProjectFactory.create(start=timezone.now() + timedelta(days=1))
+
+    def facets(self, **selected):
+        with self.assertNumQueries(1):
+            facets = project_facets(Project.objects.online(), [self.art, self.music], **selected)
+        return dict((facet, dict(counts)) for facet, counts in facets.items())
+
+    def test_counts(self):
+        facets = self.facets()
+        self.assertEqual(facets['category'], {self.art: 2, self.music: 1})
+        self.assertEqual(facets['currency'], {'CHF': 2, 'EUR': 1, 'USD': 0})
+        self.assertEqual(facets['status'], {
+            'active': 1, 'successful': 1, 'unsuccessful': 1})
+
+    def test_selected(self):
+        facets = self.facets(category=self.art, currency='CHF')
+        # The counts of a facet apply the values selected in the others
+        self.assertEqual(facets['category'], {self.art: 1, self.music: 1})
+        self.assertEqual(facets['currency'], {'CHF': 1, 'EUR': 1, 'USD': 0})
+        self.assertEqual(facets['status'], {
+            'active': 1, 'successful': 0, 'unsuccessful': 0})
+
+    def test_cached(self):
+        cache.clear()
+        categories = [self.art, self.music]
+        facets = cached_project_facets(categories, currency='CHF')
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_project_facets(categories, currency='CHF'), facets)
+        self.assertEqual(dict(facets['category']), {self.art: 1, self.music: 1})
+        self.assertEqual(dict(cached_project_facets(categories)['category']),
+                         {self.art: 2, self.music: 1})
+
+        ProjectFactory.create(currency='CHF')
+        self.assertEqual(dict(cached_project_facets(categories, currency='CHF')['currency']),
+                         {'CHF': 3, 'EUR': 1, 'USD': 0})
+
+    def test_filter_projects(self):
+        projects = filter_projects(Project.objects.online(), category=self.art)
+        self.assertEqual(set(projects), set([self.active, self.successful]))
+        projects = filter_projects(Project.objects.online(), status='successful')
+        self.assertEqual(list(projects), [self.successful])
+        projects = filter_projects(Project.objects.online(), sort='ending')
+        self.assertEqual(list(projects), [self.active])
+
+
+class SortedListViewTest(TestCase):
+
+    def setUp(self):
+        page = Page.objects.create(title='Projects', slug='projects')
+        ct = page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=page, urlconf_path=app_settings.ROOT_URLS)
+        self.projects = [ProjectFactory.create(backer_total=i) for i in range(3)]
+
+    def titles(self, url):
+        soup = BeautifulSoup(self.client.get(url).content)
+        return [h3.text for h3 in soup.find(class_='project_teaser_list').find_all('h3')]
+
+    def test_sort(self):
+        self.assertEqual(self.titles('/projects/?sort=backers'),
+                         [p.title for p in reversed(self.projects)])
+        self.assertEqual(self.titles('/projects/?sort=unknown'),
+                         [p.title for p in self.projects])
+
+    def test_facet_links(self):
+        soup = BeautifulSoup(self.client.get('/projects/?sort=backers&status=active').content)
+        link = [a for a in soup.find_all('a', class_='currency_link') if 'EUR' in a.text][0]
+        self.assertEqual(link['href'], '?currency=EUR&sort=backers&status=active')
+
+
+class CategoryCountTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.art = Category.objects.create(title='Art', slug='art')
+        self.music = Category.objects.create(title='Music', slug='music')
+        self.project = ProjectFactory.create()
+        self.project.categories.add(self.art)
+        self.upcoming = ProjectFactory.create(start=timezone.now() + timedelta(days=1))
+        self.upcoming.categories.add(self.art, self.music)
+
+    def counts(self):
+        return dict((c.slug, c.project_count) for c in Category.objects.with_project_counts())
+
+    def test_counts(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.counts(), {'art': 1, 'music': 0})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.counts(), {'art': 1, 'music': 0})
+
+    def test_invalidation(self):
+        self.counts()
+        self.project.categories.add(self.music)
+        self.assertEqual(self.counts(), {'art': 1, 'music': 1})
+
+        self.upcoming.start = timezone.now() - timedelta(days=1)
+        self.upcoming.save()
+        self.assertEqual(self.counts(), {'art': 2, 'music': 2})
+
+        Category.objects.create(title='Film', slug='film')
+        self.assertEqual(self.counts(), {'art': 2, 'music': 2, 'film': 0})
+
+    def test_unrelated_changes(self):
+        self.counts()
+        PledgeFactory.create(project=self.project, amount=10)
+        self.project.title = 'Renamed'
+        self.project.save()
+        with self.assertNumQueries(0):
+            self.counts()
+
+    def test_list_view(self):
+        page = Page.objects.create(title='Projects', slug='projects')
+        ct = page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=page, urlconf_path=app_settings.ROOT_URLS)
+        self.client.get('/projects/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/projects/')
+        self.assertFalse([q for q in queries.captured_queries
+                          if 'zipfelchappe_category' in q['sql']])
+        soup = BeautifulSoup(response.content)
+        badges = [a.find(class_='badge').text for a in soup.find_all('a', class_='category_link')
+                  if a.find(class_='badge')]
+        self.assertEqual(badges, ['1', '0'])
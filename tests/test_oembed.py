@@ -0,0 +1,120 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+from datetime import timedelta
+
+import requests
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import TestCase
+from django.utils import timezone
+
+from tests.factories import ProjectFactory
+from zipfelchappe.models import Update
+from zipfelchappe.oembed import (
+    fetch_oembed_html, refresh_external_content, stale_updates, url_hash,
+    OEmbedError, CACHE_KEY, FAILURE_CACHE_KEY)
+
+VIDEO_URL = 'http://vimeo.com/1234'
+
+
+class FakeResponse(object):
+
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError('%s Error' % self.status_code)
+
+    def json(self):
+        return self.data
+
+
+class FetchTest(TestCase):
+    """ Runs fetch_oembed_html against a replaced requests.get """
+
+    def setUp(self):
+        self.requests = []
+        self.response = None
+        self._get = requests.get
+        requests.get = self.get
+        cache.delete(FAILURE_CACHE_KEY % url_hash(VIDEO_URL))
+
+    def tearDown(self):
+        requests.get = self._get
+        for key in (CACHE_KEY, FAILURE_CACHE_KEY):
+            cache.delete(key % url_hash(VIDEO_URL))
+
+    def get(self, url, **kwargs):
+        self.requests.append(kwargs['params'])
+        if isinstance(self.response, Exception):
+            raise self.response
+        return self.response
+
+    def test_video(self):
+        self.response = FakeResponse({'type': 'video', 'html': '<iframe></iframe>'})
+        self.assertEqual(fetch_oembed_html(VIDEO_URL, '400x300'), '<iframe></iframe>')
+        self.assertEqual(self.requests, [
+            {'url': VIDEO_URL, 'maxwidth': '400', 'maxheight': '300'}])
+
+    def test_photo(self):
+        self.response = FakeResponse(
+            {'type': 'photo', 'url': 'http://example.com/a.jpg', 'title': 'A & B'})
+        self.assertEqual(fetch_oembed_html(VIDEO_URL),
+                         '<img src="http://example.com/a.jpg" alt="A &amp; B" />')
+
+    def test_failures_are_remembered(self):
+        self.response = requests.ConnectionError('unreachable')
+        self.assertRaises(OEmbedError, fetch_oembed_html, VIDEO_URL)
+        self.assertRaises(OEmbedError, fetch_oembed_html, VIDEO_URL)
+        self.assertEqual(len(self.requests), 1)
+
+    def test_invalid_responses(self):
+        for response in (FakeResponse({}, status_code=404), FakeResponse({'type': 'video'})):
+            cache.delete(FAILURE_CACHE_KEY % url_hash(VIDEO_URL))
+            self.response = response
+            self.assertRaises(OEmbedError, fetch_oembed_html, VIDEO_URL)
+
+
+class OEmbedTest(TestCase):
+
+    def setUp(self):
+        self.project = ProjectFactory.create()
+        self.update = Update.objects.create(project=self.project, title='Video',
+                                            external=VIDEO_URL)
+
+    def fetch(self, url):
+        return '<iframe src="%s"></iframe>' % url
+
+    def test_save_does_not_fetch(self):
+        self.assertEqual(self.update.external_html, '')
+        self.assertIsNone(self.update.external_fetched)
+        self.assertEqual(list(stale_updates()), [self.update])
+
+    def test_refresh_external_content(self):
+        Update.objects.create(project=self.project, title='Text')
+        self.assertEqual(list(stale_updates()), [self.update])
+
+        self.assertEqual(refresh_external_content(stale_updates(), fetch=self.fetch), (1, 0))
+        update = Update.objects.get(pk=self.update.pk)
+        self.assertEqual(update.external_html, self.fetch(VIDEO_URL))
+        self.assertEqual(list(stale_updates()), [])
+
+        Update.objects.update(external_fetched=timezone.now() - timedelta(days=30))
+        self.assertEqual(list(stale_updates()), [update])
+
+    def test_changed_url_is_fetched_again(self):
+        Update.objects.filter(pk=self.update.pk).update(
+            external_html=self.fetch(VIDEO_URL), external_fetched=timezone.now())
+        update = Update.objects.get(pk=self.update.pk)
+        update.external = 'http://vimeo.com/5678'
+        update.save()
+
+        self.assertEqual(update.external_html, '')
+        self.assertEqual(list(stale_updates()), [update])
+
+    def test_stored_html_is_rendered(self):
+        self.update.external_html = self.fetch(VIDEO_URL)
+        html = render_to_string('zipfelchappe/includes/updates.html', {'update': self.update})
+        self.assertIn(self.fetch(VIDEO_URL), html)
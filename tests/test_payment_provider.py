@@ -0,0 +1,118 @@
+from __future__ import absolute_import, unicode_literals
+from datetime import timedelta
+from decimal import Decimal
+from StringIO import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from tests.factories import ProjectFactory, PledgeFactory
+from zipfelchappe import metrics
+from zipfelchappe.metrics import (
+    record_latency, record_call, recent_latencies, latency_names, histograms,
+    flush_latencies, percentile, CACHE_KEY, NAMES_CACHE_KEY, HISTOGRAM_BUCKETS)
+from zipfelchappe.utils import map_concurrently
+from zipfelchappe.models import Project, Pledge
+from zipfelchappe.payment_provider import plan_collection
+
+
+class CollectionPlanTest(TestCase):
+
+    def setUp(self):
+        flush_latencies()
+        cache.delete(CACHE_KEY % 'fake.collect')
+        self.project = ProjectFactory.create()
+        for amount in (100, 150):
+            PledgeFactory.create(project=self.project, amount=amount, provider='fake')
+        Project.objects.filter(pk=self.project.pk).update(
+            end=timezone.now() - timedelta(minutes=1))
+
+    def tearDown(self):
+        cache.delete(CACHE_KEY % 'fake.collect')
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 50))
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+        self.assertEqual(percentile(range(1, 101), 95), 95)
+
+    def test_plan_collection(self):
+        for seconds in (1.0, 2.0, 3.0):
+            record_latency('fake.collect', seconds)
+        plan = plan_collection('fake', Pledge.objects.filter(provider='fake'), concurrency=2)
+        self.assertEqual(plan['pledges'], 2)
+        self.assertEqual(plan['totals'], {'CHF': Decimal('250')})
+        self.assertEqual(plan['samples'], 3)
+        self.assertEqual(plan['latency'], 2.0)
+        self.assertEqual(plan['duration'], 2.0)
+
+    def test_dry_run_does_not_collect(self):
+        out = StringIO()
+        call_command('fake_payments', dry_run=True, stdout=out)
+        self.assertIn('Total pledges: 2', out.getvalue())
+        self.assertIn(self.project.title, out.getvalue())
+        self.assertEqual(Pledge.objects.filter(status=Pledge.AUTHORIZED).count(), 2)
+
+
+class InstrumentationTest(TestCase):
+
+    def setUp(self):
+        self.names = ('paypal.Pay', 'postfinance.querydirect')
+        flush_latencies()
+        for name in self.names:
+            cache.delete(CACHE_KEY % name)
+        cache.delete(NAMES_CACHE_KEY)
+
+    def tearDown(self):
+        for name in self.names:
+            cache.delete(CACHE_KEY % name)
+        cache.delete(NAMES_CACHE_KEY)
+
+    def test_record_call(self):
+        metrics.METRICS_HOOK = __name__ + '.recording_hook'
+        try:
+            record_call('paypal', 'Pay', 0.3, 200, '580022')
+            record_call('paypal', 'Pay', 20, None, 'ConnectionError')
+        finally:
+            metrics.METRICS_HOOK = 'zipfelchappe.metrics.log_call'
+
+        self.assertEqual(recorded_calls[-2:], [
+            ('paypal', 'Pay', 0.3, 200, '580022'),
+            ('paypal', 'Pay', 20, None, 'ConnectionError'),
+        ])
+        counts = histograms()['paypal.Pay']
+        self.assertEqual(counts[HISTOGRAM_BUCKETS.index(0.5)], 1)
+        self.assertEqual(counts[-1], 1)
+        self.assertEqual(recent_latencies('paypal.Pay'), [0.3, 20])
+        self.assertEqual(latency_names(), ['paypal.Pay'])
+
+    def test_samples_are_buffered(self):
+        map_concurrently(lambda seconds: record_latency('paypal.Pay', seconds),
+                         [0.1] * 10, workers=4)
+        self.assertIsNone(cache.get(CACHE_KEY % 'paypal.Pay'))
+        self.assertEqual(len(recent_latencies('paypal.Pay')), 10)
+
+        flush_latencies()
+        self.assertEqual(cache.get(CACHE_KEY % 'paypal.Pay'), [0.1] * 10)
+        self.assertEqual(cache.get(NAMES_CACHE_KEY), ['paypal.Pay'])
+
+        for i in range(metrics.FLUSH_SAMPLES):
+            record_latency('paypal.Pay', 0.2)
+        self.assertEqual(len(cache.get(CACHE_KEY % 'paypal.Pay')), 10 + metrics.FLUSH_SAMPLES)
+
+    def test_provider_latency_command(self):
+        for seconds in (0.1, 0.2, 0.4):
+            record_call('postfinance', 'querydirect', seconds, 200)
+
+        out = StringIO()
+        call_command('provider_latency', stdout=out)
+        row = out.getvalue().splitlines()[1].split()
+        self.assertEqual(row, ['postfinance.querydirect', '3', '0.200s', '0.400s', '0.400s'])
+
+
+recorded_calls = []
+
+
+def recording_hook(*args):
+    recorded_calls.append(args)
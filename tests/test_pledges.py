@@ -1,5 +1,8 @@
 from __future__ import unicode_literals, absolute_import
 from datetime import timedelta
+from StringIO import StringIO
+
+from django.core.management import call_command
 from django.contrib.auth.tests.utils import skipIfCustomUser
 
 from django.test import TestCase
@@ -42,3 +45,19 @@ class BasicPledgeTest(TestCase):
         self.assertEquals(self.user.first_name, self.p1._first_name)
         self.assertEquals(self.user.last_name, self.p1._last_name)
         self.assertEquals(self.user.email, self.p1._email)
+        self.assertEquals('Hans Muster', self.p1.display_name)
+
+    def test_backer_name_uses_display_name(self):
+        self.p1.set_backer(self.backer)
+        self.p1.save()
+        pledge = Pledge.objects.only('display_name', 'anonymously').get(pk=self.p1.pk)
+        with self.assertNumQueries(0):
+            self.assertEquals('Hans Muster', pledge.backer_name)
+
+    def test_backfill_display_names(self):
+        self.p1.backer = self.backer
+        self.p1.save()
+        self.assertEquals('', self.p1.display_name)
+
+        call_command('backfill_display_names', stdout=StringIO())
+        self.assertEquals('Hans Muster', Pledge.objects.get(pk=self.p1.pk).display_name)
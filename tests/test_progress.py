@@ -0,0 +1,76 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+import json
+
+from django.test import TestCase
+
+from tests.factories import ProjectFactory, PledgeFactory
+from zipfelchappe.models import Pledge
+from zipfelchappe.progress import ProgressFeed, progress_events, progress_totals
+
+
+class ManualFeed(ProgressFeed):
+    """ Polled by the test instead of a background thread """
+
+    def start(self):
+        pass
+
+
+class ProgressFeedTest(TestCase):
+
+    def setUp(self):
+        self.project = ProjectFactory.create(goal=100)
+        self.other = ProjectFactory.create(goal=100)
+        PledgeFactory.create(project=self.project, amount=30)
+        PledgeFactory.create(project=self.project, amount=5, status=Pledge.FAILED)
+        self.calls = []
+
+    def totals(self, project_ids):
+        self.calls.append(sorted(project_ids))
+        return progress_totals(project_ids)
+
+    def test_totals(self):
+        with self.assertNumQueries(1):
+            totals = progress_totals([self.project.pk, self.other.pk])
+        self.assertEqual(totals, {self.project.pk: (30, 1), self.other.pk: (0, 0)})
+
+    def test_one_read_for_all_subscribers(self):
+        feed = ManualFeed(totals=self.totals)
+        for i in range(3):
+            feed.subscribe(self.project.pk)
+        feed.subscribe(self.other.pk)
+
+        feed.poll()
+        self.assertEqual(self.calls, [sorted([self.project.pk, self.other.pk])])
+        self.assertEqual(feed.wait(self.project.pk, timeout=0), (30, 1))
+
+        # nothing changed, nothing is read
+        feed.poll()
+        self.assertEqual(len(self.calls), 1)
+
+        PledgeFactory.create(project=self.project, amount=20)
+        feed.poll()
+        self.assertEqual(self.calls[-1], [self.project.pk])
+        self.assertEqual(feed.wait(self.project.pk, (30, 1), timeout=0), (50, 2))
+
+    def test_events(self):
+        feed = ManualFeed()
+        events = progress_events(self.project, feed, keepalive=0.01)
+        self.assertTrue(next(events).startswith('retry:'))
+        self.assertEqual(next(events), ': keepalive\n\n')
+
+        feed.poll()
+        event, data = next(events).strip().split('\n')
+        self.assertEqual(event, 'event: progress')
+        self.assertEqual(json.loads(data[len('data: '):]), {
+            'achieved': 30, 'goal': 100, 'percent': 30, 'backers': 1})
+        self.assertEqual(next(events), ': keepalive\n\n')
+
+        events.close()
+        self.assertEqual(dict(feed.subscribers), {})
+
+    def test_stream_view(self):
+        response = self.client.get('/progress/%s/' % self.project.slug)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.streaming)
+        self.assertEqual(404, self.client.get('/progress/unknown/').status_code)
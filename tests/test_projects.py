@@ -5,9 +5,14 @@ from django.contrib.auth.tests.utils import skipIfCustomUser
 
 from django.utils import timezone
 from django.test import TestCase
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.template.loader import render_to_string
+from feincms.content.application.models import ApplicationContent
+from feincms.module.page.models import Page
+from zipfelchappe.content import ProjectTeaserRowContent, load_teaser_projects
 from zipfelchappe.models import Project, Pledge
-from tests.factories import ProjectFactory, PledgeFactory
+from tests.factories import ProjectFactory, PledgeFactory, UserFactory
 from zipfelchappe import app_settings, payment_providers
 
 
@@ -107,3 +112,45 @@ class BasicProjectTest(TestCase):
         self.assertRaises(ValidationError, project.full_clean)
         project.end = now + timedelta(days=29)
         project.full_clean()
+
+
+class TeaserRow(object):
+    """ Stands in for a concrete ProjectTeaserRowContent """
+    project_fields = ProjectTeaserRowContent.project_fields
+
+    def __init__(self, *projects):
+        self.project1_id, self.project2_id, self.project3_id = [
+            p.pk if p else None for p in projects]
+
+
+class TeaserContentTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        page = Page.objects.create(title='Projects', slug='projects')
+        ct = page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=page, urlconf_path=app_settings.ROOT_URLS)
+        self.projects = [ProjectFactory.create() for i in range(4)]
+        self.projects[1].author = UserFactory.create(username='teaser_author')
+        self.projects[1].save()
+        PledgeFactory.create(project=self.projects[0], amount=50)
+        PledgeFactory.create(project=self.projects[0], amount=5, status=Pledge.FAILED)
+
+    def test_with_achieved(self):
+        projects = Project.objects.with_achieved().order_by('pk')
+        self.assertEqual([p.achieved for p in projects], [50, 0, 0, 0])
+
+    def test_load_teaser_projects(self):
+        rows = [TeaserRow(*self.projects[:3]), TeaserRow(self.projects[3], None, None)]
+        with self.assertNumQueries(2):
+            load_teaser_projects(rows)
+        self.assertIsNone(getattr(rows[1], 'project2', None))
+
+        # warm up the app_reverse cache of feincms
+        self.projects[0].get_absolute_url()
+        with self.assertNumQueries(0):
+            html = render_to_string('zipfelchappe/project_teaser_row.html', {
+                'project_list': (rows[0].project1, rows[0].project2, rows[0].project3)})
+        self.assertIn(self.projects[0].title, html)
+        self.assertIn('50 CHF (25%)', html)
+        self.assertIn('teaser_author', html)
@@ -0,0 +1,83 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+from io import BytesIO
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+from django.test.utils import override_settings
+from feincms.templatetags.feincms_thumbnail import cropscale
+from PIL import Image
+
+from tests.factories import ProjectFactory
+from zipfelchappe import renditions
+from zipfelchappe.models import Project
+from zipfelchappe.renditions import rendition_name, rendition_url, regenerate_all
+
+
+class RenditionsTest(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        renditions.RENDITIONS_ASYNC = False
+
+        buf = BytesIO()
+        Image.new('RGB', (400, 300), 'red').save(buf, 'png')
+        self.project = ProjectFactory.build()
+        self.project.teaser_image.save('teaser.png', ContentFile(buf.getvalue()), save=False)
+
+    def tearDown(self):
+        renditions.RENDITIONS_ASYNC = True
+        self.override.disable()
+        shutil.rmtree(self.media_root)
+
+    def exists(self, kind):
+        return os.path.exists(os.path.join(
+            self.media_root, rendition_name(self.project.teaser_image.name, kind)))
+
+    def test_renditions_are_generated_on_save(self):
+        self.assertFalse(self.exists('teaser'))
+        self.project.save()
+        self.assertTrue(self.exists('teaser'))
+        self.assertTrue(self.exists('og'))
+
+        # same names as the feincms filters
+        url = rendition_url(self.project.teaser_image, 'teaser')
+        self.assertEqual(url, cropscale(self.project.teaser_image, '150x150').url)
+        image = Image.open(os.path.join(self.media_root, rendition_name(
+            self.project.teaser_image.name, 'og')))
+        self.assertEqual(image.size, (1200, 630))
+
+    def test_unchanged_image_is_skipped(self):
+        scheduled = []
+        schedule_renditions = renditions.schedule_renditions
+        renditions.schedule_renditions = lambda image, kinds: scheduled.append(image.name)
+        try:
+            self.project.save()
+            self.project.title = 'Renamed'
+            self.project.save()
+            Project.objects.get(pk=self.project.pk).save()
+            self.assertEqual(len(scheduled), 1)
+
+            Project.objects.only('title').get(pk=self.project.pk).save()
+            self.assertEqual(len(scheduled), 1)
+        finally:
+            renditions.schedule_renditions = schedule_renditions
+
+    def test_regenerate_all(self):
+        self.project.save()
+        for kind in renditions.PROJECT_RENDITIONS:
+            path = os.path.join(self.media_root, rendition_name(
+                self.project.teaser_image.name, kind))
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.assertEqual(regenerate_all(processes=1), 1)
+        self.assertTrue(self.exists('teaser'))
+
+    def test_empty_image(self):
+        self.assertEqual(rendition_url(ProjectFactory.build().teaser_image, 'teaser'), '')
@@ -1,6 +1,8 @@
 from django.test import TestCase
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 
+from zipfelchappe.forms import BackProjectForm
 from zipfelchappe.models import Reward, Pledge
 
 from tests.factories import ProjectFactory, RewardFactory, PledgeFactory
@@ -70,3 +72,44 @@ class BasicRewardTest(TestCase):
         # That's too low
         self.reward.quantity = 1
         self.assertRaises(ValidationError, self.reward.full_clean)
+
+
+class RewardOptionTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.project = ProjectFactory.create()
+        self.reward = RewardFactory.create(
+            project=self.project, minimum=20, quantity=2, description='A mug')
+        PledgeFactory.create(project=self.project, amount=25, reward=self.reward)
+
+    def labels(self):
+        form = BackProjectForm(project=self.project)
+        return [label for value, label in form.fields['reward'].choices][1:]
+
+    def test_cached_label(self):
+        with self.assertTemplateUsed('zipfelchappe/reward_option.html'):
+            label, = self.labels()
+        self.assertIn('( 1 / 2 )', label)
+        self.assertIn('A mug', label)
+        self.assertIn('radio_text available', label)
+
+        PledgeFactory.create(project=self.project, amount=25, reward=self.reward)
+        with self.assertNumQueries(2):
+            label, = self.labels()
+        self.assertIn('( 0 / 2 )', label)
+        self.assertIn('radio_text unavailable', label)
+
+    def test_changed_reward(self):
+        self.labels()
+        self.reward.description = 'A cup'
+        self.reward.save()
+        label, = self.labels()
+        self.assertIn('A cup', label)
+
+    def test_changed_currency(self):
+        self.labels()
+        self.project.currency = 'EUR'
+        self.project.save()
+        label, = self.labels()
+        self.assertIn('20.00 EUR', label)
@@ -0,0 +1,117 @@
+from __future__ import absolute_import, unicode_literals
+from datetime import timedelta
+
+from bs4 import BeautifulSoup
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.six import StringIO
+from feincms.content.application.models import ApplicationContent
+from feincms.content.richtext.models import RichTextContent
+from feincms.module.page.models import Page
+
+from tests.factories import ProjectFactory
+from zipfelchappe import app_settings
+from zipfelchappe.models import Project, ProjectSearchEntry
+from zipfelchappe.search import SearchBackend, SqliteBackend, search_projects
+from zipfelchappe.translations.models import ProjectTranslation
+
+
+def titles(results):
+    return [project.title for project in results[:len(results)]]
+
+
+class SearchIndexTest(TestCase):
+
+    def setUp(self):
+        self.boat = ProjectFactory.create(
+            title='Solar boat', teaser_text='<p>A boat powered by the sun</p>')
+        self.garden = ProjectFactory.create(
+            title='Community garden', teaser_text='<p>Vegetables and solar lamps</p>')
+
+    def test_entries(self):
+        entries = ProjectSearchEntry.objects.filter(project=self.boat)
+        self.assertEqual(set(entries.values_list('language', flat=True)), set(['de', 'en', 'nl']))
+        self.assertEqual(entries[0].text, 'A boat powered by the sun')
+
+    def test_ranking(self):
+        # The title weighs more than the text
+        self.assertEqual(titles(search_projects('solar', 'en')),
+                         ['Solar boat', 'Community garden'])
+        self.assertEqual(titles(search_projects('boat sun', 'en')), ['Solar boat'])
+        self.assertEqual(titles(search_projects('veget', 'en')), ['Community garden'])
+        self.assertEqual(titles(search_projects('"; DROP', 'en')), [])
+        self.assertEqual(len(search_projects('', 'en')), 0)
+
+    def test_incremental_update(self):
+        self.boat.title = 'Electric boat'
+        self.boat.save()
+        self.assertEqual(titles(search_projects('electric', 'en')), ['Electric boat'])
+        self.assertEqual(titles(search_projects('solar', 'en')), ['Community garden'])
+
+    def test_content(self):
+        self.assertEqual(len(search_projects('propeller', 'en')), 0)
+        content_type = Project.content_type_for(RichTextContent)
+        content = content_type.objects.create(
+            parent=self.boat, region='main', ordering=0, text='<p>A quiet propeller</p>')
+        self.assertEqual(titles(search_projects('propeller', 'en')), ['Solar boat'])
+        content.delete()
+        self.assertEqual(len(search_projects('propeller', 'en')), 0)
+
+    def test_translation(self):
+        ProjectTranslation.objects.create(
+            translation_of=self.boat, lang='de', title='Solarboot',
+            teaser_text='Ein Boot, angetrieben von der Sonne')
+        self.assertEqual(titles(search_projects('sonne', 'de')), ['Solar boat'])
+        self.assertEqual(len(search_projects('sonne', 'en')), 0)
+        # Languages without a translation use the project itself
+        self.assertEqual(titles(search_projects('sun', 'nl')), ['Solar boat'])
+
+    def test_online_only(self):
+        ProjectFactory.create(title='Solar car', start=timezone.now() + timedelta(days=1))
+        self.assertEqual(len(search_projects('car', 'en')), 0)
+
+    def test_delete(self):
+        self.boat.delete()
+        self.assertEqual(titles(search_projects('solar', 'en')), ['Community garden'])
+        if isinstance(search_projects('', 'en').backend, SqliteBackend):
+            cursor = connection.cursor()
+            cursor.execute('SELECT COUNT(*) FROM %s' % SqliteBackend.table)
+            self.assertEqual(cursor.fetchone()[0], 3)
+
+    def test_fallback(self):
+        backend = SearchBackend()
+        self.assertEqual(backend.count(['solar'], 'en'), 2)
+        self.assertEqual(backend.search(['boat', 'sun'], 'en', 0, 10), [self.boat.pk])
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('2 projects indexed', out.getvalue())
+        self.assertEqual(len(search_projects('solar', 'en')), 2)
+
+
+class SearchViewTest(TestCase):
+
+    def setUp(self):
+        page = Page.objects.create(title='Projects', slug='projects')
+        ct = page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=page, urlconf_path=app_settings.ROOT_URLS)
+        for i in range(app_settings.PAGINATE_BY + 1):
+            ProjectFactory.create(title='Solar boat %d' % i)
+        ProjectFactory.create(title='Community garden')
+
+    def test_search(self):
+        response = self.client.get('/projects/search/?q=solar')
+        soup = BeautifulSoup(response.content)
+        teasers = soup.find(class_='project_teaser_list').find_all('h3')
+        self.assertEqual(len(teasers), app_settings.PAGINATE_BY)
+
+        response = self.client.get('/projects/search/?q=solar&page=2')
+        soup = BeautifulSoup(response.content)
+        self.assertEqual(len(soup.find(class_='project_teaser_list').find_all('h3')), 1)
+
+    def test_no_results(self):
+        response = self.client.get('/projects/search/?q=bicycle')
+        self.assertContains(response, 'No projects found for "bicycle"')
@@ -1,7 +1,11 @@
 from __future__ import absolute_import, unicode_literals
+import json
+
 from django.core import mail
+from django.db import connection
 from django.test import TestCase, override_settings
-from django.test.client import Client
+from django.test.client import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.contrib.auth.tests.utils import skipIfCustomUser
 from django.utils.translation import ugettext as _
@@ -14,7 +18,8 @@ from bs4 import BeautifulSoup
 from tests.factories import ProjectFactory, RewardFactory, PledgeFactory, UserFactory, \
     BackerFactory
 from zipfelchappe.models import Backer, Pledge
-from zipfelchappe import app_settings
+from zipfelchappe import app_settings, views
+from zipfelchappe.views import get_session_pledge
 
 
 @skipIfCustomUser
@@ -272,12 +277,181 @@ class PledgeWorkflowTest(TestCase):
             backer=backer
         )
 
+        backers_url = app_reverse('zipfelchappe_project_backers', app_settings.ROOT_URLS,
+                                  kwargs={'slug': self.project1.slug})
         response = self.client.get(detail_url)
         self.assertFalse(p1.anonymously)
         self.assertTrue(p2.anonymously)
         self.assertContains(response, self.project1.title)
-        self.assertContains(response, 'Hans Muster')
         self.assertContains(response, '19 CHF')
+        response = self.client.get(backers_url)
+        self.assertContains(response, 'Hans Muster')
         self.assertNotContains(response, 'Gates')
         self.assertNotContains(response, 'Bill')
-        self.assertContains(response, _('Anonymous'))
\ No newline at end of file
+        self.assertContains(response, _('Anonymous'))
+
+
+class ProjectProgressTest(TestCase):
+
+    def setUp(self):
+        self.page = Page.objects.create(title='Projects', slug='projects')
+        ct = self.page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=self.page, urlconf_path=app_settings.ROOT_URLS)
+
+        self.project = ProjectFactory.create(goal=200)
+        self.pledge = PledgeFactory.create(project=self.project, amount=50)
+        PledgeFactory.create(project=self.project, amount=20, status=Pledge.FAILED)
+        self.url = app_reverse('zipfelchappe_project_progress',
+            app_settings.ROOT_URLS, kwargs={'slug': self.project.slug})
+
+    def test_progress(self):
+        r = self.client.get(self.url)
+        self.assertEqual(200, r.status_code)
+        self.assertEqual('application/json', r['Content-Type'])
+        self.assertIn('public', r['Cache-Control'])
+        self.assertIn('ETag', r)
+
+        data = json.loads(r.content)
+        self.assertEqual(50, data['achieved'])
+        self.assertEqual(200, data['goal'])
+        self.assertEqual(25, data['percent'])
+        self.assertEqual(1, data['backers'])
+        self.assertTrue(data['remaining'] > 0)
+
+    def test_not_modified(self):
+        progress_minute = views.progress_minute
+        views.progress_minute = lambda: 1000
+        try:
+            etag = self.client.get(self.url)['ETag']
+            with CaptureQueriesContext(connection) as queries:
+                r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(304, r.status_code)
+            # the feincms page lookup aside, only the project id is queried
+            project_queries = [q for q in queries if 'zipfelchappe_' in q['sql']]
+            self.assertEqual(1, len(project_queries))
+            self.assertNotIn('MAX', project_queries[0]['sql'])
+
+            PledgeFactory.create(project=self.project, amount=10)
+            r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(200, r.status_code)
+            self.assertEqual(60, json.loads(r.content)['achieved'])
+            etag = r['ETag']
+
+            # the remaining time changes every minute
+            views.progress_minute = lambda: 1001
+            r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(200, r.status_code)
+        finally:
+            views.progress_minute = progress_minute
+
+    def test_unknown_project(self):
+        url = self.url.replace(self.project.slug, 'unknown')
+        self.assertEqual(404, self.client.get(url).status_code)
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        self.page = Page.objects.create(title='Projects', slug='projects')
+        ct = self.page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=self.page, urlconf_path=app_settings.ROOT_URLS)
+        self.project = ProjectFactory.create()
+        self.url = self.project.get_absolute_url()
+
+    def test_project_detail(self):
+        etag = self.client.get(self.url)['ETag']
+
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, r.status_code)
+        self.assertEqual(b'', r.content)
+
+        PledgeFactory.create(project=self.project, amount=10)
+        r = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, r.status_code)
+        self.assertNotEqual(etag, r['ETag'])
+
+    def test_project_list(self):
+        etag = self.client.get('/projects/')['ETag']
+        r = self.client.get('/projects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, r.status_code)
+
+        ProjectFactory.create()
+        r = self.client.get('/projects/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(200, r.status_code)
+
+    def test_logged_in(self):
+        user = UserFactory.create()
+        user.set_password('test')
+        user.save()
+        self.client.login(username=user.username, password='test')
+        r = self.client.get(self.url)
+        self.assertEqual(200, r.status_code)
+        self.assertFalse(r.has_header('ETag'))
+
+
+class ProjectTabsTest(TestCase):
+
+    def setUp(self):
+        page = Page.objects.create(title='Projects', slug='projects')
+        ct = page.content_type_for(ApplicationContent)
+        ct.objects.create(parent=page, urlconf_path=app_settings.ROOT_URLS)
+        self.project = ProjectFactory.create()
+        self.project.updates.create(
+            title='First update', content='News', status='published')
+        PledgeFactory.create(project=self.project, amount=10)
+
+    def fragment_url(self, name):
+        return app_reverse('zipfelchappe_project_%s' % name, app_settings.ROOT_URLS,
+                           kwargs={'slug': self.project.slug})
+
+    def test_detail_loads_tabs_lazily(self):
+        response = self.client.get(self.project.get_absolute_url())
+        soup = BeautifulSoup(response.content)
+        for name in ('updates', 'backers', 'comments'):
+            pane = soup.find(id=name)
+            self.assertEqual(pane['data-src'], self.fragment_url(name))
+            self.assertEqual(pane.text.strip(), '')
+
+    def test_fragments(self):
+        for name, text in (('updates', 'First update'),
+                           ('backers', '1 backer'),
+                           ('comments', _('You must be logged in to comment on this project'))):
+            response = self.client.get(self.fragment_url(name))
+            self.assertContains(response, text)
+            # Sent without the page around it
+            self.assertNotContains(response, '<html')
+
+            r = self.client.get(self.fragment_url(name),
+                                HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(304, r.status_code)
+
+    def test_backers_etag_depends_on_cursor(self):
+        url = self.fragment_url('backers')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(etag, self.client.get(url + '?backers-after=x')['ETag'])
+
+        PledgeFactory.create(project=self.project, amount=10)
+        self.assertEqual(200, self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code)
+
+
+class SessionPledgeTest(TestCase):
+
+    def setUp(self):
+        self.pledge = PledgeFactory.create(project=ProjectFactory.create(), amount=10)
+        self.request = RequestFactory().get('/')
+        self.request.session = {'pledge_id': self.pledge.pk}
+
+    def test_looked_up_once(self):
+        with self.assertNumQueries(1):
+            pledge = get_session_pledge(self.request)
+            self.assertEqual(pledge, get_session_pledge(self.request))
+            self.assertEqual(pledge.project, self.pledge.project)
+
+    def test_session_changes(self):
+        self.assertEqual(get_session_pledge(self.request), self.pledge)
+        del self.request.session['pledge_id']
+        self.assertIsNone(get_session_pledge(self.request))
+
+        other = PledgeFactory.create(project=self.pledge.project, amount=20)
+        self.request.session['pledge_id'] = other.pk
+        self.assertEqual(get_session_pledge(self.request), other)
@@ -18,7 +18,7 @@ from django.utils.translation import ugettext_lazy as _
 from feincms.admin import item_editor
 
 from .models import Project, Pledge, Backer, Update, Reward, MailTemplate
-from .models import ExtraField
+from .models import ExtraField, OutboxMessage
 from .widgets import AdminImageWidget, TestMailWidget
 from .utils import get_user_search_fields
 
@@ -180,13 +180,6 @@ class PledgeAdmin(admin.ModelAdmin):
         for field_name in get_user_search_fields():
             self.search_fields.append('backer__user__{0}'.format(field_name))
 
-    def username(self, pledge):
-        if pledge.backer and pledge.backer.user:
-            return pledge.backer.user
-        else:
-            return _('(None)')
-    username.short_description = _('username')
-
     def amount_display(self, pledge):
         return '%s %s' % (pledge.amount, pledge.currency)
     amount_display.short_description = _('amount')
@@ -249,7 +242,7 @@ class PledgeAdmin(admin.ModelAdmin):
     extradata_display.short_description = 'Extra Data'
 
     list_display = (
-        'username',
+        'display_name',
         '_email',
         '_first_name',
         '_last_name',
@@ -264,13 +257,13 @@ class PledgeAdmin(admin.ModelAdmin):
     export_excluded = ('extradata_display',)
 
     list_display_links = (
-        'username',
+        'display_name',
         '_email',
         '_first_name',
         '_last_name',
     )
 
-    search_fields = []  # Set dynamically in __init__
+    search_fields = ['display_name']  # Extended dynamically in __init__
 
     raw_id_fields = ('backer', 'project')
     list_filter = (
@@ -281,7 +274,8 @@ class PledgeAdmin(admin.ModelAdmin):
         RewardListFilter
     )
     actions = [export_as_csv]
-    readonly_fields = ['extradata', '_email', '_first_name', '_last_name', 'modified',
+    readonly_fields = ['extradata', '_email', '_first_name', '_last_name',
+                       'display_name', 'modified',
                        'details', 'anonymously', 'amount', 'project', 'backer', 'provider']
 
 
@@ -413,3 +407,13 @@ class ProjectAdmin(item_editor.ItemEditor):
 
 admin.site.register(Project, ProjectAdmin)
 admin.site.register(Pledge, PledgeAdmin)
+
+
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'created', 'sent', 'attempts')
+    list_filter = ('sent',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('attempts', 'last_error', 'sent')
+
+
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
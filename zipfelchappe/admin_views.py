@@ -76,11 +76,12 @@ def authorized_pledges(request, project_id):
     project = get_object_or_404(Project, pk=project_id)
 
     pledges = []
-    for pledge in project.collectable_pledges.all():
+    for pledge in project.collectable_pledges.only(
+            'amount', 'currency', 'display_name', 'provider'):
         pledges.append({
             'id': pledge.id,
             'amount': pledge.amount_display,
-            'backer': pledge.backer.full_name,
+            'backer': pledge.display_name,
             'provider': pledge.provider.capitalize(),
         })
 
@@ -33,3 +33,61 @@ MAX_PROJECT_DURATION_DAYS = getattr(settings, 'ZIPFELCHAPPE_MAX_PROJECT_DURATION
 TERMS_URL = settings.ZIPFELCHAPPE_TERMS_URL
 
 MANAGERS = getattr(settings, 'ZIPFELCHAPPE_MANAGERS', settings.MANAGERS)
+
+# Assumed duration in seconds of one provider call when estimating a
+# collection run without recent measurements.
+COLLECT_LATENCY_ESTIMATE = getattr(settings, 'ZIPFELCHAPPE_COLLECT_LATENCY_ESTIMATE', 1.0)
+
+# Dotted path to a function receiving (provider, endpoint, duration, status,
+# error) for every call to a payment provider API.
+METRICS_HOOK = getattr(settings, 'ZIPFELCHAPPE_METRICS_HOOK', 'zipfelchappe.metrics.log_call')
+
+# Number of mails rendered and sent per SMTP batch by the mail jobs
+MAIL_BATCH_SIZE = getattr(settings, 'ZIPFELCHAPPE_MAIL_BATCH_SIZE', 200)
+
+# Days after their last change in which published updates are still mailed
+UPDATE_MAILS_DAYS = getattr(settings, 'ZIPFELCHAPPE_UPDATE_MAILS_DAYS', 3)
+
+# Days after their end in which the backers of projects are still mailed
+# the outcome
+CLOSING_MAILS_DAYS = getattr(settings, 'ZIPFELCHAPPE_CLOSING_MAILS_DAYS', 3)
+
+# Store mails sent during checkout in the outbox instead of sending them
+# right away. The send_outbox command needs to run to deliver them.
+MAIL_OUTBOX = getattr(settings, 'ZIPFELCHAPPE_MAIL_OUTBOX', False)
+
+# Number of delivery attempts for outbox messages before giving up
+MAIL_OUTBOX_MAX_ATTEMPTS = getattr(settings, 'ZIPFELCHAPPE_MAIL_OUTBOX_MAX_ATTEMPTS', 5)
+
+# Seconds after which a message claimed by a send_outbox run that did not
+# finish can be claimed by another run
+MAIL_OUTBOX_CLAIM_TIMEOUT = getattr(settings, 'ZIPFELCHAPPE_MAIL_OUTBOX_CLAIM_TIMEOUT', 60 * 10)
+
+# oEmbed content of updates: maximum size, request timeout in seconds,
+# seconds until a failed url is tried again and until content is refreshed
+EMBED_SIZE = getattr(settings, 'ZIPFELCHAPPE_EMBED_SIZE', '427x427')
+EMBED_TIMEOUT = getattr(settings, 'ZIPFELCHAPPE_EMBED_TIMEOUT', 5)
+EMBED_FAILURE_TIMEOUT = getattr(settings, 'ZIPFELCHAPPE_EMBED_FAILURE_TIMEOUT', 60 * 5)
+EMBED_REFRESH_AFTER = getattr(settings, 'ZIPFELCHAPPE_EMBED_REFRESH_AFTER', 60 * 60 * 24 * 7)
+
+# Generate image renditions in a background thread after saving
+RENDITIONS_ASYNC = getattr(settings, 'ZIPFELCHAPPE_RENDITIONS_ASYNC', True)
+
+# Seconds cached fragments of project pages are kept, they are invalidated
+# by generation counters (see zipfelchappe.caching) when something changes
+FRAGMENT_CACHE_TIMEOUT = getattr(settings, 'ZIPFELCHAPPE_FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# Seconds clients and proxies may cache the JSON progress of a project
+PROGRESS_MAX_AGE = getattr(settings, 'ZIPFELCHAPPE_PROGRESS_MAX_AGE', 10)
+
+# Seconds between two checks of the progress stream feed and seconds until
+# a progress stream is closed and the browser reconnects
+PROGRESS_STREAM_INTERVAL = getattr(settings, 'ZIPFELCHAPPE_PROGRESS_STREAM_INTERVAL', 2)
+PROGRESS_STREAM_DURATION = getattr(settings, 'ZIPFELCHAPPE_PROGRESS_STREAM_DURATION', 60 * 5)
+
+# Seconds after which pages answered with 304 Not Modified are rendered again
+# even if nothing changed, 0 disables conditional GET of project pages
+CONDITIONAL_GET_PERIOD = getattr(settings, 'ZIPFELCHAPPE_CONDITIONAL_GET_PERIOD', 60 * 10)
+
+# Days of pledges that count for the trending order of the project list
+TRENDING_DAYS = getattr(settings, 'ZIPFELCHAPPE_TRENDING_DAYS', 7)
@@ -0,0 +1,102 @@
+"""
+Generation counters for cached fragments and pages.
+
+Every project has a generation number in the cache that is increased
+whenever the project, its updates, rewards, translations or pledges
+change. Cache keys that contain the generation of a project become
+unreachable as soon as something changes, so the cached content can be
+kept for a long time. A global generation is increased on every change
+and can be used for content that lists several projects.
+"""
+from __future__ import absolute_import, unicode_literals
+import time
+
+from django.core.cache import cache
+
+GENERATION_KEY = 'zipfelchappe_generation_%s'
+GLOBAL = 'all'
+# Changes when the number of online projects of a category may have changed
+CATEGORIES = 'categories'
+
+
+def _initial_generation():
+    # Counters start at the current time, so a counter that was evicted
+    # from the cache does not hand out versions that were used before.
+    return int(time.time() * 1000)
+
+
+def generation(project_id=GLOBAL):
+    """ Returns the current generation of a project or the global one """
+    key = GENERATION_KEY % project_id
+    value = cache.get(key)
+    if value is None:
+        value = _initial_generation()
+        if not cache.add(key, value, None):
+            value = cache.get(key, value)
+    return value
+
+
+def bump_generation(project_id):
+    """ Increases the generation of a project and the global generation """
+    for key in (GENERATION_KEY % project_id, GENERATION_KEY % GLOBAL):
+        _bump(key)
+
+
+def bump_generations(project_ids):
+    for project_id in set(project_ids):
+        bump_generation(project_id)
+
+
+def project_changed(sender, instance, **kwargs):
+    """ Signal handler for projects and models with a project foreign key """
+    bump_generation(getattr(instance, 'project_id', instance.pk))
+
+
+def pledge_changed(sender, instance, created=False, **kwargs):
+    """
+    Project pages show the achieved amount and the available rewards, which
+    depend on the status, amount and reward of pledges. Saves that change
+    none of them, e.g. of checkout details, keep the generation.
+    """
+    values = instance.page_values()
+    if created or values != instance._loaded_page_values:
+        bump_generation(instance.project_id)
+    instance._loaded_page_values = values
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_generation(), None)
+
+
+def global_changed(sender, **kwargs):
+    """ Signal handler for models shown on all project lists """
+    _bump(GENERATION_KEY % GLOBAL)
+
+
+def categories_changed(sender, **kwargs):
+    """ Signal handler for changes of categories and their projects """
+    _bump(GENERATION_KEY % CATEGORIES)
+
+
+def project_categories_changed(sender, instance, action, reverse, pk_set=None,
+                               **kwargs):
+    """ Signal handler for the categories of projects, lists filter by them """
+    if not action.startswith('post_'):
+        return
+    categories_changed(sender)
+    if not reverse:
+        bump_generation(instance.pk)
+    elif pk_set:
+        bump_generations(pk_set)
+    else:
+        global_changed(sender)
+
+
+def comment_posted(sender, comment, **kwargs):
+    """ Comments are shown on the project page """
+    content_type = comment.content_type
+    if (content_type.app_label, content_type.model) == ('zipfelchappe', 'project'):
+        bump_generation(comment.object_pk)
@@ -1,14 +1,12 @@
 from __future__ import absolute_import, unicode_literals
 
-from django.conf import settings
-from django.core.mail import send_mail
 from django.shortcuts import render, redirect
 from django.template import Context
 from django.views.generic import View, TemplateView
 
 from zipfelchappe.models import Pledge
 from zipfelchappe.views import PledgeRequiredMixin
-from zipfelchappe.emails import render_mail
+from zipfelchappe.emails import queue_mail, render_mail
 from zipfelchappe.app_settings import MANAGERS
 
 from .models import CodPayment
@@ -55,9 +53,7 @@ class PaymentView(PledgeRequiredMixin, View):
         context = Context({'request': request, 'pledge': self.pledge})
         subject, message = render_mail('cod_wiretransfer', context)
 
-        send_mail(
-            subject, message, settings.DEFAULT_FROM_EMAIL,
-            [self.pledge.backer.email], fail_silently=False)
+        queue_mail(subject, message, [self.pledge.backer.email])
 
 
 class RequestPaymentSlipView(View):
@@ -104,7 +100,7 @@ class RequestPaymentSlipView(View):
         context = Context({'payment': payment})
         subject, message = render_mail('cod_payment_slip', context)
         receivers = [r[1] for r in MANAGERS]
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, receivers, fail_silently=False)
+        queue_mail(subject, message, receivers)
 
 
 class PaymentSlipRequestRecievedView(TemplateView):
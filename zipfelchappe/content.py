@@ -5,12 +5,46 @@ from django.utils.translation import ugettext_lazy as _
 from .models import Project
 
 
-class ProjectTeaserContent(models.Model):
+def load_teaser_projects(contents):
+    """
+    Sets the projects of all teaser contents with one query. The projects
+    come with their achieved amount, translations and author.
+    """
+    ids = set()
+    for content in contents:
+        ids.update(getattr(content, '%s_id' % name) for name in content.project_fields)
+    ids.discard(None)
+
+    projects = Project.objects.with_achieved().filter(pk__in=ids)
+    # the author is an optional extension of the project
+    if any(field.name == 'author' for field in Project._meta.fields):
+        projects = projects.select_related('author')
+    projects = dict((project.pk, project) for project in Project.load_translations(projects))
+    for content in contents:
+        for name in content.project_fields:
+            project = projects.get(getattr(content, '%s_id' % name))
+            if project is not None:
+                setattr(content, name, project)
+        content._projects_loaded = True
+
+
+class TeaserContentMixin(object):
+
+    def process(self, request, **kwargs):
+        # Load the projects of all teasers of the page at once
+        if not getattr(self, '_projects_loaded', False):
+            load_teaser_projects(self.parent.content.all_of_type(
+                (ProjectTeaserContent, ProjectTeaserRowContent)))
+
+
+class ProjectTeaserContent(TeaserContentMixin, models.Model):
     """ Shows one project with a link to the project detail page """
 
     project = models.ForeignKey(Project, verbose_name=_('project'),
         related_name='teasercontents')
 
+    project_fields = ('project',)
+
     class Meta:
         verbose_name = _('project teaser')
         verbose_name_plural = _('project teasers')
@@ -24,7 +58,7 @@ class ProjectTeaserContent(models.Model):
         })
 
 
-class ProjectTeaserRowContent(models.Model):
+class ProjectTeaserRowContent(TeaserContentMixin, models.Model):
     """ A row of three project teasers with links to each project """
 
     project1 = models.ForeignKey(Project, verbose_name=_('project 1'),
@@ -36,6 +70,8 @@ class ProjectTeaserRowContent(models.Model):
     project3 = models.ForeignKey(Project, verbose_name=_('project 3'),
         related_name='teaserrowcontents3', blank=True, null=True)
 
+    project_fields = ('project1', 'project2', 'project3')
+
     class Meta:
         verbose_name = _('project teaser row')
         verbose_name_plural = _('project teaser row')
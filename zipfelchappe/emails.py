@@ -1,10 +1,71 @@
+from collections import OrderedDict
+from datetime import timedelta
+import logging
+from smtplib import SMTPException
+import threading
+
 from django.conf import settings
+from django.contrib.sites.models import Site
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.template import Context, Template
-from django.template.loader import render_to_string
+from django.db.models import Q, signals
+from django.template.loader import get_template, render_to_string
+from django.utils.timezone import now
+from django.utils.translation import get_language
+
+from .app_settings import (MAIL_BATCH_SIZE, MAIL_OUTBOX, MAIL_OUTBOX_MAX_ATTEMPTS,
+                           MAIL_OUTBOX_CLAIM_TIMEOUT)
+from .models import Backer, MailTemplate, OutboxMessage, Pledge, Project, Update
+
+logger = logging.getLogger('zipfelchappe.emails')
+
+# Number of compiled mail templates kept per process
+MAIL_TEMPLATE_CACHE_SIZE = 100
+
+_compiled_templates = OrderedDict()
+_compiled_templates_lock = threading.Lock()
+
+
+def compiled_mail_template(project, action):
+    """
+    Returns the compiled subject and message templates of the project's
+    MailTemplate for action in the active language, or None if the project
+    has no such template. Compiled templates are kept in an LRU cache keyed
+    by template, language and modification time.
+    """
+    try:
+        pk, modified = MailTemplate.objects.filter(
+            project=project, action=action).values_list('pk', 'modified')[0]
+    except IndexError:
+        return None
+
+    key = (pk, get_language(), modified)
+    with _compiled_templates_lock:
+        templates = _compiled_templates.pop(key, None)
+        if templates is not None:
+            _compiled_templates[key] = templates
+            return templates
+
+    mail_template = MailTemplate.objects.get(pk=pk).translated
+    templates = (Template(mail_template.subject), Template(mail_template.template))
+
+    with _compiled_templates_lock:
+        _compiled_templates[key] = templates
+        while len(_compiled_templates) > MAIL_TEMPLATE_CACHE_SIZE:
+            _compiled_templates.popitem(last=False)
+    return templates
+
+
+def invalidate_mail_template(sender, instance, **kwargs):
+    """ Drops the compiled versions of a changed MailTemplate """
+    with _compiled_templates_lock:
+        for key in [k for k in _compiled_templates if k[0] == instance.pk]:
+            del _compiled_templates[key]
 
-from .models import MailTemplate
+
+signals.post_save.connect(invalidate_mail_template, sender=MailTemplate)
+signals.post_delete.connect(invalidate_mail_template, sender=MailTemplate)
 
 
 def render_mail(template, context):
@@ -17,26 +78,200 @@ def render_mail(template, context):
     return subject, message
 
 
+def queue_mail(subject, message, recipient_list, fail_silently=False):
+    """
+    Sends a mail like django's send_mail, or stores it in the outbox if
+    ZIPFELCHAPPE_MAIL_OUTBOX is enabled.
+    """
+    if MAIL_OUTBOX:
+        OutboxMessage.objects.create(
+            subject=subject,
+            message=message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipients='\n'.join(recipient_list),
+        )
+    else:
+        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL,
+                  recipient_list, fail_silently=fail_silently)
+
+
+def unclaimed_outbox(max_attempts=MAIL_OUTBOX_MAX_ATTEMPTS):
+    """ Pending messages that no running send_outbox has claimed """
+    return OutboxMessage.objects.filter(
+        Q(claimed__isnull=True) |
+        Q(claimed__lt=now() - timedelta(seconds=MAIL_OUTBOX_CLAIM_TIMEOUT)),
+        sent__isnull=True, attempts__lt=max_attempts)
+
+
+def claim_outbox_message(outbox_message, max_attempts=MAIL_OUTBOX_MAX_ATTEMPTS):
+    """ Returns True if this run may deliver the message """
+    return unclaimed_outbox(max_attempts).filter(
+        pk=outbox_message.pk).update(claimed=now()) == 1
+
+
+def send_outbox(batch_size=MAIL_BATCH_SIZE, max_attempts=MAIL_OUTBOX_MAX_ATTEMPTS,
+                connection=None):
+    """
+    Delivers the pending outbox messages over one SMTP connection. Every
+    message is claimed before and marked as sent right after its delivery,
+    so overlapping runs don't send it twice. Failed messages are retried on
+    the next run until max_attempts is reached.
+
+    :return: Tuple of the number of sent and failed messages.
+    """
+    pending = unclaimed_outbox(max_attempts)
+    connection = connection or get_connection()
+    connection.open()
+    sent = failed = 0
+    last = 0
+    try:
+        while True:
+            batch = list(pending.filter(pk__gt=last).order_by('pk')[:batch_size])
+            if not batch:
+                break
+            last = batch[-1].pk
+
+            for outbox_message in batch:
+                if not claim_outbox_message(outbox_message, max_attempts):
+                    continue
+                mail = EmailMessage(
+                    outbox_message.subject, outbox_message.message,
+                    outbox_message.from_email, outbox_message.recipient_list,
+                    connection=connection)
+                try:
+                    connection.send_messages([mail])
+                except (SMTPException, IOError) as e:
+                    logger.warning('Sending outbox message %s failed: %r',
+                                   outbox_message.pk, e)
+                    OutboxMessage.objects.filter(pk=outbox_message.pk).update(
+                        attempts=outbox_message.attempts + 1,
+                        last_error=repr(e),
+                        claimed=None,
+                        modified=now())
+                    failed += 1
+                    # The connection may be broken, start over with a new one
+                    connection.close()
+                    connection.open()
+                else:
+                    OutboxMessage.objects.filter(pk=outbox_message.pk).update(
+                        sent=now(), modified=now())
+                    sent += 1
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
 def send_pledge_completed_message(request, pledge, mail_template=None):
     """ Send message after backer successfully pledged to a project """
 
+    context = Context({'pledge': pledge, 'user': request.user,
+                       'site': get_current_site(request)})
+
     # Try to get template from project if not explictly passed
     if mail_template is None:
-        try:
-            mail_template = MailTemplate.objects.get(
-                project=pledge.project,
-                action=MailTemplate.ACTION_THANKYOU
-            ).translated
-        except MailTemplate.DoesNotExist:
-            pass
+        templates = compiled_mail_template(pledge.project, MailTemplate.ACTION_THANKYOU)
+    else:
+        templates = Template(mail_template.subject), Template(mail_template.template)
 
-    context = Context({'pledge': pledge, 'user': request.user,
-                       'site': get_current_site(request)})
-    if mail_template is not None:
-        subject = Template(mail_template.subject).render(context)
-        message = Template(mail_template.template).render(context)
+    if templates is not None:
+        subject = templates[0].render(context)
+        message = templates[1].render(context)
     else:
         subject, message = render_mail('pledge_completed', context)
 
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL,
-              [pledge.backer.email], fail_silently=True)
+    queue_mail(subject, message, [pledge.backer.email], fail_silently=True)
+
+
+def send_mass_mail_batches(batches, template, context, connection=None):
+    """
+    Sends one mail per backer using a single SMTP connection.
+
+    The subject and message templates are compiled once and rendered for
+    every backer. Backers without e-mail address are skipped.
+
+    :param batches: Iterable of backer lists, each list is sent with one
+                    ``send_messages`` call.
+    :param template: Name of the mail template, e.g. ``new_update``.
+    :param context: Dictionary of variables shared by all mails.
+    :return: Number of mails sent.
+    """
+    subject_template = get_template('zipfelchappe/emails/%s_subject.txt' % template)
+    message_template = get_template('zipfelchappe/emails/%s_message.txt' % template)
+
+    connection = connection or get_connection()
+    connection.open()
+    sent = 0
+    try:
+        for backers in batches:
+            messages = []
+            for backer in backers:
+                if not backer.email:
+                    continue
+                backer_context = Context(dict(context, backer=backer))
+                messages.append(EmailMessage(
+                    subject_template.render(backer_context).strip(),
+                    message_template.render(backer_context),
+                    settings.DEFAULT_FROM_EMAIL, [backer.email],
+                    connection=connection))
+            sent += connection.send_messages(messages) or 0
+    finally:
+        connection.close()
+
+    return sent
+
+
+def project_backers(project, after=0):
+    """ Backers with an authorized or paid pledge for project, by id """
+    return Backer.objects.filter(
+        pledges__project=project,
+        pledges__status__gte=Pledge.AUTHORIZED,
+        pk__gt=after,
+    ).distinct().select_related('user').order_by('pk')
+
+
+def checkpointed_batches(obj, field, batch_size=MAIL_BATCH_SIZE):
+    """
+    Yields the backers of obj.project (or obj itself for projects) with an
+    id greater than the checkpoint stored in field in batches. The
+    checkpoint is saved after each batch has been sent, so an interrupted
+    run continues with the next batch.
+    """
+    project = obj if isinstance(obj, Project) else obj.project
+    while True:
+        backers = list(project_backers(project, getattr(obj, field))[:batch_size])
+        if not backers:
+            return
+        yield backers
+        setattr(obj, field, backers[-1].pk)
+        type(obj)._default_manager.filter(pk=obj.pk).update(**{field: backers[-1].pk})
+
+
+def send_update_mails(update, batch_size=MAIL_BATCH_SIZE, connection=None):
+    """ Informs all backers of the project about a published update """
+    context = {
+        'update': update,
+        'project': update.project,
+        'site': Site.objects.get_current(),
+    }
+    batches = checkpointed_batches(update, 'mails_checkpoint', batch_size)
+    sent = send_mass_mail_batches(batches, 'new_update', context, connection)
+
+    update.mails_sent = True
+    Update.objects.filter(pk=update.pk).update(mails_sent=True)
+    return sent
+
+
+def send_closing_mails(project, batch_size=MAIL_BATCH_SIZE, connection=None):
+    """ Informs all backers of an ended project whether it was funded """
+    template = 'project_successful' if project.is_financed else 'project_unsuccessful'
+    context = {
+        'project': project,
+        'site': Site.objects.get_current(),
+    }
+    batches = checkpointed_batches(project, 'closing_mails_checkpoint', batch_size)
+    sent = send_mass_mail_batches(batches, template, context, connection)
+
+    project.closing_mails_sent = True
+    Project.objects.filter(pk=project.pk).update(closing_mails_sent=True)
+    return sent
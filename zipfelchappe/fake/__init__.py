@@ -0,0 +1,15 @@
+from __future__ import unicode_literals, absolute_import
+from django.apps import AppConfig
+from .. import register_provider
+
+
+class FakeConfig(AppConfig):
+    name = 'zipfelchappe.fake'
+    verbose_name = 'Fake payment backend'
+
+    def ready(self):
+        from .provider import FakeProvider
+        register_provider('fake', FakeProvider('fake'))
+
+
+default_app_config = 'zipfelchappe.fake.FakeConfig'
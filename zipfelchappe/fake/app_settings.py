@@ -0,0 +1,25 @@
+"""
+Settings for the fake payment provider. It never talks to an external
+service and is meant for development and end-to-end benchmarks only.
+
+Latencies are given in seconds, either as a number or as a (min, max) tuple
+to pick a random latency for every call::
+
+    ZIPFELCHAPPE_FAKE = {
+        'AUTHORIZATION_LATENCY': (0.5, 2.0),
+        'COLLECTION_LATENCY': 0.3,
+        'FAILURE_PROBABILITY': 0.05,  # 5% of all calls fail
+        'SEED': None,  # set to an integer for reproducible runs
+    }
+"""
+from django.conf import settings
+
+# Fallback values
+FAKE = {
+    'AUTHORIZATION_LATENCY': 0,
+    'COLLECTION_LATENCY': 0,
+    'FAILURE_PROBABILITY': 0,
+    'SEED': None,
+}
+
+FAKE.update(getattr(settings, 'ZIPFELCHAPPE_FAKE', {}))
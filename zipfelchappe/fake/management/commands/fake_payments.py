@@ -0,0 +1,27 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from zipfelchappe import payment_providers
+from zipfelchappe.models import Project
+from zipfelchappe.payment_provider import plan_collection, format_collection_plan
+from zipfelchappe.fake.tasks import process_payments
+
+
+class Command(BaseCommand):
+    help = 'Collect all fake payments for finished projects (benchmarking)'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--dry-run', action='store_true', dest='dry_run', default=False,
+            help='List billable pledges and project the duration of the run '
+                 'without contacting the provider.'),
+    )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            pledges = payment_providers['fake'].billable_pledges(Project.objects.billable())
+            self.stdout.write(format_collection_plan(plan_collection('fake', pledges)))
+            return
+
+        pledges_processed = process_payments()
+        self.stdout.write('Total pledges processed: %d' % pledges_processed)
@@ -0,0 +1,80 @@
+# coding: utf-8
+from __future__ import absolute_import, unicode_literals
+import random
+import time
+
+from django.core.urlresolvers import reverse
+
+from .. import PaymentProviderException
+from ..models import Pledge
+from ..payment_provider import BasePaymentProvider
+from .app_settings import FAKE
+
+
+class FakePaymentException(PaymentProviderException):
+    pass
+
+
+class FakeProvider(BasePaymentProvider):
+    """
+    A payment provider that simulates authorization and collection with
+    configurable latency and failure probability. No external service is
+    contacted, so the whole checkout and collection pipeline can be
+    benchmarked locally.
+    """
+    def __init__(self, name, authorization_latency=None,
+                 collection_latency=None, failure_probability=None, seed=None):
+        super(FakeProvider, self).__init__(name)
+        self.authorization_latency = FAKE['AUTHORIZATION_LATENCY'] \
+            if authorization_latency is None else authorization_latency
+        self.collection_latency = FAKE['COLLECTION_LATENCY'] \
+            if collection_latency is None else collection_latency
+        self.failure_probability = FAKE['FAILURE_PROBABILITY'] \
+            if failure_probability is None else failure_probability
+        self.random = random.Random(FAKE['SEED'] if seed is None else seed)
+
+    def __unicode__(self):
+        return 'Fake'
+
+    def payment_url(self):
+        return reverse('zipfelchappe_fake_payment')
+
+    def _simulate_call(self, latency):
+        """
+        Sleeps for the configured latency.
+        :return: True if the simulated call succeeded.
+        """
+        if isinstance(latency, (list, tuple)):
+            latency = self.random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+        return self.random.random() >= self.failure_probability
+
+    def authorize_pledge(self, pledge):
+        """
+        Authorizes the pledge or marks it as failed.
+        :param pledge: An unauthorized pledge.
+        :return: True if the pledge has been authorized.
+        """
+        if not self._simulate_call(self.authorization_latency):
+            pledge.mark_failed('fake authorization declined')
+            return False
+        pledge.status = Pledge.AUTHORIZED
+        pledge.save()
+        return True
+
+    def collect_pledge(self, pledge):
+        if pledge.status != Pledge.AUTHORIZED:
+            raise FakePaymentException('Pledge %s is not authorized' % pledge.pk)
+        if not self._simulate_call(self.collection_latency):
+            pledge.mark_failed('fake collection failed')
+            raise FakePaymentException('Collection of pledge %s failed' % pledge.pk)
+        pledge.status = Pledge.PAID
+        pledge.save()
+        return {'STATUS': pledge.status}
+
+    def refund_pledge(self, pledge):
+        pass
+
+    def refund_payments(self, project):
+        pass
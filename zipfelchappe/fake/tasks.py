@@ -0,0 +1,24 @@
+from __future__ import unicode_literals, absolute_import
+import logging
+
+from .. import payment_providers
+from ..models import Project
+
+logger = logging.getLogger('zipfelchappe.fake')
+
+
+def process_payments():
+    """
+    Collects the fake payments for all successfully financed projects
+    that have ended.
+    """
+    provider = payment_providers['fake']
+    billable_projects = Project.objects.billable()
+
+    processed = 0
+    for project in billable_projects:
+        processed += provider.collect_billable_payments(project)
+
+    logger.info('Collected {0} pledges in {1} projects.'.format(
+        processed, len(billable_projects)))
+    return processed
@@ -0,0 +1,7 @@
+from __future__ import unicode_literals, absolute_import
+from django.conf.urls import url
+from . import views
+
+urlpatterns = [
+    url(r'^$', views.payment, name='zipfelchappe_fake_payment'),
+]
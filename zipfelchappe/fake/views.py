@@ -0,0 +1,16 @@
+from __future__ import unicode_literals, absolute_import
+
+from zipfelchappe import payment_providers
+from zipfelchappe.views import requires_pledge, redirect
+
+
+@requires_pledge
+def payment(request, pledge):
+    """ Authorizes the pledge without any user interaction and continues
+        like a real provider would after the user returns from its site.
+    """
+    provider = payment_providers[pledge.provider]
+    if provider.authorize_pledge(pledge):
+        return redirect('zipfelchappe_pledge_thankyou')
+    else:
+        return redirect('zipfelchappe_pledge_cancel')
@@ -1,30 +1,42 @@
 
 from django import forms
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import EMPTY_VALUES
 from django.utils.safestring import mark_safe
-from django.utils.translation import ugettext_lazy as _
+from django.utils.translation import get_language, ugettext_lazy as _
 from django.template.loader import render_to_string
 
 from . import payment_providers
 from .models import Pledge
 from .widgets import BootstrapRadioSelect
-from .app_settings import ALLOW_ANONYMOUS_PLEDGES, TERMS_URL
+from .app_settings import ALLOW_ANONYMOUS_PLEDGES, TERMS_URL, FRAGMENT_CACHE_TIMEOUT
+
+REWARD_OPTION_CACHE_KEY = 'zipfelchappe_reward_option_%s_%s_%s_%s'
+AVAILABILITY_PLACEHOLDER = 'zipfelchappe-availability-placeholder'
+AVAILABLE_PLACEHOLDER = 'zipfelchappe-available-placeholder'
 
 
 class RewardChoiceIterator(forms.models.ModelChoiceIterator):
+    def objects(self):
+        # The rewards are loaded once per form, with their translations
+        if getattr(self.field, 'reward_cache', None) is None:
+            self.field.reward_cache = self.queryset.model.load_translations(
+                self.queryset.all())
+        return self.field.reward_cache
+
     def __iter__(self):
         if self.field.empty_label is not None:
             yield (u'none', self.field.empty_label)
         if self.field.cache_choices:
             if self.field.choice_cache is None:
                 self.field.choice_cache = [
-                    self.choice(obj) for obj in self.queryset.all()
+                    self.choice(obj) for obj in self.objects()
                 ]
             for choice in self.field.choice_cache:
                 yield choice
         else:
-            for obj in self.queryset.all():
+            for obj in self.objects():
                 yield self.choice(obj)
 
 
@@ -58,7 +70,6 @@ class BackProjectForm(forms.ModelForm):
         4. Only allow adequate awards (minimal amount, still available)
         5. Select payment provider if necessary
     """
-    # TODO: remove project field from form.
     max_amount = 2000
 
     amount = forms.IntegerField(label=_('amount'),
@@ -74,10 +85,10 @@ class BackProjectForm(forms.ModelForm):
 
     class Meta:
         model = Pledge
-        exclude = ('backer', 'status', 'details') if ALLOW_ANONYMOUS_PLEDGES else \
-                  ('backer', 'status', 'anonymously', 'details')
+        # The project is taken from the url, not from the posted data
+        exclude = ('project', 'backer', 'status', 'details') if ALLOW_ANONYMOUS_PLEDGES else \
+                  ('project', 'backer', 'status', 'anonymously', 'details')
         widgets = {
-            'project': forms.widgets.HiddenInput(),
             'provider': forms.widgets.RadioSelect()
         }
 
@@ -86,7 +97,6 @@ class BackProjectForm(forms.ModelForm):
 
         initial = kwargs.get('initial', {})
         initial.update({
-            'project': self.project,
             'reward': None
         })
         providers = payment_providers.items()
@@ -98,8 +108,9 @@ class BackProjectForm(forms.ModelForm):
         kwargs['initial'] = initial
 
         super(BackProjectForm, self).__init__(*args, **kwargs)
+        self.instance.project = self.project
 
-        self.fields['reward'].queryset = self.project.rewards.all()
+        self.fields['reward'].queryset = self.project.rewards.with_reserved()
         self.fields['reward'].label_from_instance = self.label_for_reward
 
         self.fields['accept_tac'].label = mark_safe(_('I have read and agree with the '
@@ -112,10 +123,29 @@ class BackProjectForm(forms.ModelForm):
             self.fields['provider'].choices = providers
 
     def label_for_reward(self, reward):
-        return render_to_string('zipfelchappe/reward_option.html', {
-            'reward': reward,
-            'project': self.project
-        })
+        # The label shows the project currency, which is not part of the reward
+        key = REWARD_OPTION_CACHE_KEY % (
+            reward.pk, self.project.currency, get_language(),
+            reward.modified.isoformat())
+        label = cache.get(key)
+        if label is None:
+            label = render_to_string('zipfelchappe/reward_option.html', {
+                'reward': reward,
+                'project': self.project,
+                'availability': AVAILABILITY_PLACEHOLDER,
+                'available': AVAILABLE_PLACEHOLDER,
+            })
+            # Templates without placeholders show live values themselves
+            if AVAILABILITY_PLACEHOLDER in label:
+                cache.set(key, label, FRAGMENT_CACHE_TIMEOUT)
+
+        return mark_safe(label.replace(
+            AVAILABILITY_PLACEHOLDER,
+            'available' if reward.is_available else 'unavailable'
+        ).replace(
+            AVAILABLE_PLACEHOLDER,
+            str(reward.available) if reward.quantity else ''
+        ))
 
     def clean_amount(self):
         amount = self.cleaned_data['amount']
@@ -0,0 +1,186 @@
+"""
+Sort orders and facets of the project list.
+
+All orders except the position use columns of the project that are kept
+up to date by the refresh_sort_keys command (cronjob), so a sorted page of
+the list is a single query on an indexed column. The counts of all facet
+values are computed with a single query as well and cached until a project
+changes, starts or ends.
+"""
+from __future__ import absolute_import, unicode_literals
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import models
+from django.db.models import Case, Count, Min, Q, Sum, When
+from django.utils.timezone import now
+from django.utils.translation import ugettext_lazy as _
+
+from . import app_settings
+from .caching import CATEGORIES, generation, global_changed
+from .models import Project, Pledge
+
+SORTS = OrderedDict((
+    ('position', (_('Featured'), ('position',))),
+    ('ending', (_('Ending soon'), ('end', 'pk'))),
+    ('funded', (_('Most funded'), ('-funded_percent', 'pk'))),
+    ('backers', (_('Most backers'), ('-backer_total', 'pk'))),
+    ('recent', (_('Recently launched'), ('-start', 'pk'))),
+    ('trending', (_('Trending'), ('-trending_score', 'pk'))),
+))
+
+FACETS_KEY = 'zipfelchappe_facets_%s'
+
+STATUSES = OrderedDict((
+    ('active', _('Active')),
+    ('successful', _('Finished successfully')),
+    ('unsuccessful', _('Finished unsuccessfully')),
+))
+
+
+def has_categories():
+    """ The categories are an optional extension of the project """
+    return any(field.name == 'categories' for field in Project._meta.many_to_many)
+
+
+def status_filter(status, when):
+    if status == 'active':
+        return Q(end__gte=when)
+    elif status == 'successful':
+        return Q(end__lt=when, funded_percent__gte=100)
+    return Q(end__lt=when, funded_percent__lt=100)
+
+
+def project_filters(category=None, currency=None, status=None, when=None):
+    """ Returns {facet: Q} of the selected facet values """
+    when = when or now()
+    filters = {}
+    if category is not None:
+        filters['category'] = Q(categories=category)
+    if currency:
+        filters['currency'] = Q(currency=currency)
+    if status:
+        filters['status'] = status_filter(status, when)
+    return filters
+
+
+def filter_projects(queryset, sort='position', **selected):
+    """ Applies the selected facet values and the sort order to queryset """
+    for q in project_filters(**selected).values():
+        queryset = queryset.filter(q)
+    if sort == 'ending':
+        queryset = queryset.filter(end__gte=now())
+    return queryset.order_by(*SORTS[sort][1])
+
+
+def project_facets(queryset, categories=(), **selected):
+    """
+    Counts the projects of queryset for every category, currency and status.
+    The count of a value applies the selected values of the other facets,
+    so it is the number of projects shown after choosing that value.
+
+    Returns {facet: [(value, count)]}.
+    """
+    when = now()
+    filters = project_filters(when=when, **selected)
+
+    def count(facet, q):
+        for other, other_q in filters.items():
+            if other != facet:
+                q &= other_q
+        # Projects in several categories are joined more than once
+        return Count(Case(When(q, then='pk')), distinct=True)
+
+    values = OrderedDict((
+        ('category', [(category, Q(categories=category))
+                      for category in categories if has_categories()]),
+        ('currency', [(currency, Q(currency=currency))
+                      for currency in app_settings.CURRENCIES]),
+        ('status', [(status, status_filter(status, when)) for status in STATUSES]),
+    ))
+    aggregates = {}
+    for facet, choices in values.items():
+        for i, (value, q) in enumerate(choices):
+            aggregates['%s_%d' % (facet, i)] = count(facet, q)
+
+    counts = queryset.order_by().aggregate(**aggregates)
+    return OrderedDict(
+        (facet, [(value, counts['%s_%d' % (facet, i)])
+                 for i, (value, q) in enumerate(choices)])
+        for facet, choices in values.items())
+
+
+def cached_project_facets(categories=(), **selected):
+    """
+    project_facets of the online projects, cached under the global and the
+    categories generation until the next project starts or ends.
+    """
+    category = selected.get('category')
+    key = FACETS_KEY % '-'.join(str(part) for part in (
+        generation(), generation(CATEGORIES),
+        category.pk if category is not None else '',
+        selected.get('currency') or '', selected.get('status') or '',
+        ','.join(str(c.pk) for c in categories)))
+    counts = cache.get(key)
+    if counts is None:
+        facets = project_facets(Project.objects.online(), categories, **selected)
+        counts = dict((facet, [count for value, count in choices])
+                      for facet, choices in facets.items())
+
+        when = now()
+        upcoming = Project.objects.aggregate(
+            start=Min(Case(When(start__gt=when, then='start'),
+                           output_field=models.DateTimeField())),
+            end=Min(Case(When(end__gt=when, then='end'),
+                         output_field=models.DateTimeField())))
+        timeout = app_settings.FRAGMENT_CACHE_TIMEOUT
+        for next_change in filter(None, upcoming.values()):
+            timeout = min(timeout, int((next_change - when).total_seconds()) + 1)
+        cache.set(key, counts, timeout)
+
+    values = OrderedDict((
+        ('category', [category for category in categories if has_categories()]),
+        ('currency', app_settings.CURRENCIES),
+        ('status', STATUSES),
+    ))
+    return OrderedDict((facet, list(zip(choices, counts[facet])))
+                       for facet, choices in values.items())
+
+
+def refresh_sort_keys(when=None):
+    """
+    Stores the funded percentage, number of backers and trending score of
+    all online projects. The trending score is the percentage of the goal
+    pledged per day during the last ZIPFELCHAPPE_TRENDING_DAYS.
+
+    Returns the number of projects that changed.
+    """
+    when = when or now()
+    days = app_settings.TRENDING_DAYS
+    pledges = Pledge.objects.filter(status__gte=Pledge.AUTHORIZED).order_by()
+    totals = dict(
+        (row['project'], row) for row in pledges.values('project').annotate(
+            achieved=Sum('amount'), backers=Count('id')))
+    recent = dict(
+        pledges.filter(created__gte=when - timedelta(days=days)).values(
+            'project').annotate(recent=Sum('amount')).values_list('project', 'recent'))
+
+    changed = 0
+    projects = Project.objects.online().only(
+        'goal', 'funded_percent', 'backer_total', 'trending_score')
+    for project in projects.iterator():
+        row = totals.get(project.pk, {})
+        keys = {
+            'funded_percent': int(row.get('achieved', 0) * 100 / project.goal),
+            'backer_total': row.get('backers', 0),
+            'trending_score': float(recent.get(project.pk, 0) * 100 / project.goal) / days,
+        }
+        if any(getattr(project, key) != value for key, value in keys.items()):
+            Project.objects.filter(pk=project.pk).update(**keys)
+            changed += 1
+
+    if changed:
+        # The sorted lists are cached by the global generation
+        global_changed(Project)
+    return changed
@@ -0,0 +1,35 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from zipfelchappe.models import Pledge
+
+
+class Command(BaseCommand):
+
+    help = 'Copy the backer names to pledges without a display name'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', type='int', dest='batch_size', default=500,
+            help='Number of pledges updated per query.'),
+    )
+
+    def handle(self, *args, **options):
+        pledges = Pledge.objects.filter(display_name='', backer__isnull=False)
+        pledges = pledges.select_related('backer__user').order_by('pk')
+        last_pk = 0
+        count = 0
+        while True:
+            batch = list(pledges.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            # one update per distinct name instead of one per pledge
+            names = {}
+            for pledge in batch:
+                name = pledge.backer.full_name[:255]
+                if name:
+                    names.setdefault(name, []).append(pledge.pk)
+            for name, pks in names.items():
+                count += Pledge.objects.filter(pk__in=pks).update(display_name=name)
+        self.stdout.write('Display names of %d pledges updated' % count)
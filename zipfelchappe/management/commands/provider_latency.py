@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from zipfelchappe.metrics import latency_names, recent_latencies, percentile
+
+
+class Command(BaseCommand):
+
+    args = '[name ...]'
+    help = 'Print p50/p95/p99 latencies of recent payment provider calls'
+
+    def handle(self, *args, **options):
+        names = args or latency_names()
+        if not names:
+            self.stdout.write('No latencies recorded yet')
+            return
+
+        width = max(len(name) for name in names)
+        self.stdout.write('%s  %7s %8s %8s %8s' % (
+            'name'.ljust(width), 'samples', 'p50', 'p95', 'p99'))
+        for name in names:
+            samples = recent_latencies(name)
+            row = ['%8s' % ('%.3fs' % percentile(samples, p) if samples else '-')
+                   for p in (50, 95, 99)]
+            self.stdout.write('%s  %7d %s' % (name.ljust(width), len(samples), ' '.join(row)))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from zipfelchappe.search import rebuild_index
+
+
+class Command(BaseCommand):
+
+    help = 'Create the project search index and index all projects again'
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write('%d projects indexed' % count)
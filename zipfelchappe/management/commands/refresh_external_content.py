@@ -0,0 +1,23 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from zipfelchappe.app_settings import EMBED_REFRESH_AFTER
+from zipfelchappe.oembed import refresh_external_content, stale_updates
+
+
+class Command(BaseCommand):
+
+    help = 'Fetch the oEmbed content of updates again (cronjob)'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', dest='workers', default=4,
+            help='Number of concurrent requests to embed.ly.'),
+        make_option('--max-age', type='int', dest='max_age', default=EMBED_REFRESH_AFTER,
+            help='Refresh content fetched more than this many seconds ago.'),
+    )
+
+    def handle(self, *args, **options):
+        updates = stale_updates(options['max_age'])
+        refreshed, failed = refresh_external_content(updates, workers=options['workers'])
+        self.stdout.write('%d urls refreshed, %d failed' % (refreshed, failed))
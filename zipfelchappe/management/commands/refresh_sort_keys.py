@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from zipfelchappe.listing import refresh_sort_keys
+
+
+class Command(BaseCommand):
+
+    help = 'Update the stored sort keys of the project list (cronjob)'
+
+    def handle(self, *args, **options):
+        changed = refresh_sort_keys()
+        self.stdout.write('%d projects updated' % changed)
@@ -0,0 +1,19 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from zipfelchappe.renditions import regenerate_all
+
+
+class Command(BaseCommand):
+
+    help = 'Generate missing or outdated renditions of all project and update images'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--processes', type='int', dest='processes', default=None,
+            help='Number of worker processes, defaults to the number of CPUs.'),
+    )
+
+    def handle(self, *args, **options):
+        count = regenerate_all(options['processes'])
+        self.stdout.write('Renditions of %d images generated' % count)
@@ -0,0 +1,32 @@
+from datetime import timedelta
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from zipfelchappe.app_settings import CLOSING_MAILS_DAYS, MAIL_BATCH_SIZE
+from zipfelchappe.emails import send_closing_mails
+from zipfelchappe.models import Project
+
+
+class Command(BaseCommand):
+
+    help = 'Inform the backers of ended projects about the outcome (cronjob)'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', type='int', dest='batch_size', default=MAIL_BATCH_SIZE,
+            help='Number of mails sent per SMTP batch.'),
+        make_option('--days', type='int', dest='days', default=CLOSING_MAILS_DAYS,
+            help='Only mail about projects that ended during the last DAYS days.'),
+    )
+
+    def handle(self, *args, **options):
+        projects = Project.objects.filter(
+            end__lte=now(),
+            end__gte=now() - timedelta(days=options['days']),
+            closing_mails_sent=False,
+        )
+
+        for project in projects:
+            sent = send_closing_mails(project, batch_size=options['batch_size'])
+            self.stdout.write('%s: %d mails sent' % (project, sent))
@@ -0,0 +1,24 @@
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from zipfelchappe.app_settings import MAIL_BATCH_SIZE, MAIL_OUTBOX_MAX_ATTEMPTS
+from zipfelchappe.emails import send_outbox
+
+
+class Command(BaseCommand):
+
+    help = 'Deliver the mails waiting in the outbox (cronjob)'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', type='int', dest='batch_size', default=MAIL_BATCH_SIZE,
+            help='Number of messages loaded per batch.'),
+        make_option('--max-attempts', type='int', dest='max_attempts',
+            default=MAIL_OUTBOX_MAX_ATTEMPTS,
+            help='Skip messages that failed this many times.'),
+    )
+
+    def handle(self, *args, **options):
+        sent, failed = send_outbox(batch_size=options['batch_size'],
+                                   max_attempts=options['max_attempts'])
+        self.stdout.write('%d mails sent, %d failed' % (sent, failed))
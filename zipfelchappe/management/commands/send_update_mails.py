@@ -0,0 +1,32 @@
+from datetime import timedelta
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from zipfelchappe.app_settings import MAIL_BATCH_SIZE, UPDATE_MAILS_DAYS
+from zipfelchappe.emails import send_update_mails
+from zipfelchappe.models import Update
+
+
+class Command(BaseCommand):
+
+    help = 'Mail published updates to the backers of their project (cronjob)'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', type='int', dest='batch_size', default=MAIL_BATCH_SIZE,
+            help='Number of mails sent per SMTP batch.'),
+        make_option('--days', type='int', dest='days', default=UPDATE_MAILS_DAYS,
+            help='Only mail updates published during the last DAYS days.'),
+    )
+
+    def handle(self, *args, **options):
+        updates = Update.objects.filter(
+            status=Update.STATUS_PUBLISHED,
+            mails_sent=False,
+            modified__gte=now() - timedelta(days=options['days']),
+        ).select_related('project')
+
+        for update in updates:
+            sent = send_update_mails(update, batch_size=options['batch_size'])
+            self.stdout.write('%s: %d mails sent' % (update, sent))
@@ -0,0 +1,182 @@
+"""
+Latency bookkeeping for calls to payment providers.
+
+Samples are buffered in the process and appended to the default cache in
+one step every FLUSH_SAMPLES samples, after FLUSH_INTERVAL seconds and when
+the process exits, so measurements taken by one management command run can
+be used by the next one. Use a shared cache backend (memcached, database,
+...) to aggregate them across processes.
+
+Every request to a provider API goes through :func:`instrumented_request`,
+which additionally counts durations in in-process histograms and passes
+each call to ``ZIPFELCHAPPE_METRICS_HOOK``. The default hook writes a
+structured record to the ``zipfelchappe.metrics`` logger.
+"""
+from __future__ import absolute_import, unicode_literals
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+import atexit
+import logging
+import math
+import threading
+import time
+
+import requests
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from .app_settings import METRICS_HOOK
+
+LATENCY_SAMPLES = 200
+LATENCY_TIMEOUT = 60 * 60 * 24 * 30
+FLUSH_SAMPLES = 50
+FLUSH_INTERVAL = 60
+
+CACHE_KEY = 'zipfelchappe_latency_%s'
+NAMES_CACHE_KEY = 'zipfelchappe_latency_names'
+
+# Upper bounds in seconds of the histogram buckets, the last bucket is open
+HISTOGRAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+logger = logging.getLogger('zipfelchappe.metrics')
+
+_histograms = defaultdict(lambda: [0] * (len(HISTOGRAM_BUCKETS) + 1))
+_histograms_lock = threading.Lock()
+
+_pending = defaultdict(list)
+_pending_lock = threading.Lock()
+_last_flush = time.time()
+
+
+def record_latency(name, seconds):
+    """ Buffers a duration of name, see :func:`flush_latencies` """
+    with _pending_lock:
+        _pending[name].append(seconds)
+        due = (sum(len(samples) for samples in _pending.values()) >= FLUSH_SAMPLES or
+               time.time() - _last_flush >= FLUSH_INTERVAL)
+    if due:
+        flush_latencies()
+
+
+def flush_latencies():
+    """ Appends the buffered durations to the most recent samples in the cache """
+    global _last_flush
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.time()
+    if not pending:
+        return
+
+    keys = dict((name, CACHE_KEY % name) for name in pending)
+    stored = cache.get_many(list(keys.values()) + [NAMES_CACHE_KEY])
+    values = dict(
+        (keys[name], (stored.get(keys[name], []) + samples)[-LATENCY_SAMPLES:])
+        for name, samples in pending.items())
+    names = stored.get(NAMES_CACHE_KEY, [])
+    if not set(pending) <= set(names):
+        values[NAMES_CACHE_KEY] = sorted(set(names) | set(pending))
+    cache.set_many(values, LATENCY_TIMEOUT)
+
+
+atexit.register(flush_latencies)
+
+
+def latency_names():
+    """ Returns all names latencies have been recorded for """
+    with _pending_lock:
+        pending = list(_pending)
+    return sorted(set(cache.get(NAMES_CACHE_KEY) or []) | set(pending))
+
+
+def recent_latencies(name):
+    """ Returns the most recent durations recorded for name """
+    with _pending_lock:
+        pending = list(_pending.get(name, ()))
+    return ((cache.get(CACHE_KEY % name) or []) + pending)[-LATENCY_SAMPLES:]
+
+
+def percentile(samples, percent):
+    """ Nearest-rank percentile of samples or None if there are none """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = int(math.ceil(percent / 100.0 * len(ordered)))
+    return ordered[max(rank, 1) - 1]
+
+
+@contextmanager
+def timed(name):
+    """ Records the duration of the enclosed block, even if it raises """
+    start = time.time()
+    try:
+        yield
+    finally:
+        record_latency(name, time.time() - start)
+
+
+def histograms():
+    """ Returns a copy of the call duration histograms of this process """
+    with _histograms_lock:
+        return dict((name, list(counts)) for name, counts in _histograms.items())
+
+
+def log_call(provider, endpoint, duration, status=None, error=None):
+    """ Default metrics hook, logs every provider call """
+    logger.info(
+        '%s %s status=%s error=%s duration=%.3f',
+        provider, endpoint, status, error, duration,
+        extra={
+            'provider': provider,
+            'endpoint': endpoint,
+            'duration': duration,
+            'status': status,
+            'error': error,
+        })
+
+
+def record_call(provider, endpoint, duration, status=None, error=None):
+    """
+    Records one call to a provider API.
+
+    :param provider: Name of the payment provider, e.g. paypal.
+    :param endpoint: Name of the API endpoint that has been called.
+    :param duration: Duration of the call in seconds.
+    :param status: HTTP status code or None if no response arrived.
+    :param error: Error code of the provider or exception name, if any.
+    """
+    name = '%s.%s' % (provider, endpoint)
+    with _histograms_lock:
+        _histograms[name][bisect_left(HISTOGRAM_BUCKETS, duration)] += 1
+    record_latency(name, duration)
+
+    try:
+        import_string(METRICS_HOOK)(provider, endpoint, duration, status, error)
+    except Exception:
+        logger.exception('Metrics hook %s failed', METRICS_HOOK)
+
+
+def instrumented_request(provider, endpoint, method, url, error_code=None, **kwargs):
+    """
+    Sends a request using requests and records it with :func:`record_call`.
+
+    :param error_code: Function returning the provider error code of a
+                       response or None if the call was successful.
+    :return: The response of requests.
+    """
+    start = time.time()
+    try:
+        response = requests.request(method, url, **kwargs)
+    except Exception as e:
+        record_call(provider, endpoint, time.time() - start, error=type(e).__name__)
+        raise
+
+    error = None
+    if error_code is not None:
+        try:
+            error = error_code(response)
+        except Exception:
+            error = 'unparsable'
+    record_call(provider, endpoint, time.time() - start, response.status_code, error)
+    return response
@@ -4,10 +4,11 @@ from datetime import timedelta
 from django import forms
 
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 
 from django.db import models
-from django.db.models import signals, Sum
+from django.db.models import signals, Case, Count, Min, Sum, Value, When
 from django.db.models.fields import AutoField
 from django.db.models.fields.related import RelatedField
 
@@ -27,11 +28,16 @@ from feincms.content.application import models as app_models
 from .app_settings import (
         CURRENCIES, BACKER_PROFILE, ROOT_URLS,
         USER_EMAIL_FIELD, USER_FIRST_NAME_FIELD, USER_LAST_NAME_FIELD,
-        DEFAULT_IMAGE_URL, MAX_PROJECT_DURATION_DAYS
+        DEFAULT_IMAGE_URL, MAX_PROJECT_DURATION_DAYS, FRAGMENT_CACHE_TIMEOUT
 )
 from . import payment_providers
 from .base import CreateUpdateModel
+from .caching import (CATEGORIES, generation, bump_generation, project_changed,
+                      pledge_changed, global_changed, categories_changed)
 from .fields import CurrencyField
+from .renditions import image_name, project_saved, update_saved
+from .search import (project_indexed, project_deleting, project_deleted,
+                     content_indexed, setup_search)
 import warnings
 
 CURRENCY_CHOICES = list(((cur, cur) for cur in CURRENCIES))
@@ -56,6 +62,30 @@ class TranslatedMixin(object):
 
             return self._translation
 
+    @classmethod
+    def load_translations(cls, objects):
+        """
+        Sets the translations of objects in the active language with one
+        query, so accessing translated needs no further queries.
+        """
+        objects = list(objects)
+        for obj in objects:
+            obj._translation = obj
+        try:
+            model = objects[0].translations.model
+        except (IndexError, AttributeError):
+            return objects
+
+        filters = {'translation_of__in': objects}
+        if hasattr(objects[0], 'project_id'):
+            filters['translation__lang'] = get_language()
+        else:
+            filters['lang'] = get_language()
+        by_id = dict((obj.pk, obj) for obj in objects)
+        for translation in model.objects.filter(**filters):
+            by_id[translation.translation_of_id]._translation = translation
+        return objects
+
 
 class Backer(models.Model):
     """ The base model for all project backers with some transient attributes
@@ -122,12 +152,6 @@ class Backer(models.Model):
                 return None
         return self._profile_cache
 
-# PAYMENT_PROVIDERS += (
-#     ('offline', _('Offline')),
-#     ('fake', _('Fake')),
-# )
-# DEFAULT_PAYMENT_PROVIDER = PAYMENT_PROVIDERS[0][0]
-
 
 class Pledge(CreateUpdateModel, TranslatedMixin):
     """ The connection between a backer and a project. One pledge corresponds
@@ -159,6 +183,9 @@ class Pledge(CreateUpdateModel, TranslatedMixin):
     _first_name = models.CharField(_('first name'), max_length=30, blank=True)
     _last_name = models.CharField(_('last name'), max_length=30, blank=True)
     _email = models.EmailField(_('e-mail address'), blank=True)
+    # Copy of backer.full_name so backer lists need no joins
+    display_name = models.CharField(_('display name'), max_length=255,
+        blank=True, editable=False)
 
     backer = models.ForeignKey('Backer', verbose_name=_('backer'),
         related_name='pledges', blank=True, null=True)
@@ -192,11 +219,21 @@ class Pledge(CreateUpdateModel, TranslatedMixin):
         verbose_name = _('pledge')
         verbose_name_plural = _('pledges')
         ordering = ['-created']
+        # backer lists are paginated by (created, id) per project
+        index_together = (('project', 'created'),)
+
+    # fields shown on the cached project pages, see caching.pledge_changed
+    page_fields = ('status', 'amount', 'reward_id')
 
     def __init__(self, *args, **kwargs):
         super(Pledge, self).__init__(*args, **kwargs)
         if 'backer' in kwargs:
             self.set_backer(kwargs['backer'])
+        # values of page_fields when the pledge was loaded, None if deferred
+        self._loaded_page_values = self.page_values()
+
+    def page_values(self):
+        return tuple(self.__dict__.get(field) for field in self.page_fields)
 
     def __unicode__(self):
         return 'Pledge of %d %s from %s to %s' % \
@@ -215,6 +252,7 @@ class Pledge(CreateUpdateModel, TranslatedMixin):
         self._email = backer.email
         self._first_name = backer.first_name
         self._last_name = backer.last_name
+        self.display_name = backer.full_name[:255]
 
     def add_details(self, details):
         self.details += (details + '\n')
@@ -242,6 +280,8 @@ class Pledge(CreateUpdateModel, TranslatedMixin):
         """
         if self.anonymously:
             return ''
+        elif self.display_name or not self.backer_id:
+            return self.display_name
         else:
             return self.backer.full_name
 
@@ -268,6 +308,15 @@ class Pledge(CreateUpdateModel, TranslatedMixin):
         return related_values
 
 
+class RewardManager(models.Manager):
+
+    def with_reserved(self):
+        """ Rewards annotated with their reserved count """
+        return self.get_queryset().annotate(reserved_count=Sum(Case(
+            When(pledges__status__gte=Pledge.UNAUTHORIZED, then=Value(1)),
+            default=Value(0), output_field=models.IntegerField())))
+
+
 class Reward(CreateUpdateModel, TranslatedMixin):
     """ A reward is a give-away for backers that pledge a certain amount.
         Rewards may be limited to a maximum number of backers. """
@@ -284,6 +333,8 @@ class Reward(CreateUpdateModel, TranslatedMixin):
         help_text=_('How many times can this award be given away? ' +
             'Empty or 0 means unlimited.'))
 
+    objects = RewardManager()
+
     class Meta:
         verbose_name = _('reward')
         verbose_name_plural = _('rewards')
@@ -299,6 +350,8 @@ class Reward(CreateUpdateModel, TranslatedMixin):
 
     @property
     def reserved(self):
+        if hasattr(self, 'reserved_count'):
+            return self.reserved_count
         return self.pledges.filter(status__gte=Pledge.UNAUTHORIZED).count()
 
     @property
@@ -317,6 +370,34 @@ class Reward(CreateUpdateModel, TranslatedMixin):
             return self.available > 0
 
 
+CATEGORY_COUNTS_KEY = 'zipfelchappe_category_counts_%s'
+
+
+class CategoryManager(models.Manager):
+
+    def with_project_counts(self):
+        """
+        Returns a list of the categories annotated with the number of their
+        online projects, counted with one grouped query. The list is cached
+        until a category, the categories or start of a project change or
+        the next project goes online.
+        """
+        key = CATEGORY_COUNTS_KEY % generation(CATEGORIES)
+        categories = cache.get(key)
+        if categories is None:
+            when = now()
+            categories = list(self.annotate(online_project_count=Count(Case(
+                When(projects__start__lte=when, then='projects'),
+                output_field=models.IntegerField()))))
+            timeout = FRAGMENT_CACHE_TIMEOUT
+            next_start = Project.objects.filter(
+                start__gt=when).aggregate(next=Min('start'))['next']
+            if next_start is not None:
+                timeout = min(timeout, int((next_start - when).total_seconds()) + 1)
+            cache.set(key, categories, timeout)
+        return categories
+
+
 class Category(CreateUpdateModel):
     """ Simple categorisation model for projects """
 
@@ -326,6 +407,8 @@ class Category(CreateUpdateModel):
 
     ordering = models.SmallIntegerField(_('ordering'), default=0)
 
+    objects = CategoryManager()
+
     class Meta:
         verbose_name = _('category')
         verbose_name_plural = _('categories')
@@ -340,7 +423,10 @@ class Category(CreateUpdateModel):
 
     @property
     def project_count(self):
-        return self.projects.count()
+        """ Number of online projects """
+        if hasattr(self, 'online_project_count'):
+            return self.online_project_count
+        return self.projects.filter(start__lte=now()).count()
 
 
 def update_upload_to(instance, filename):
@@ -366,6 +452,8 @@ class Update(CreateUpdateModel, TranslatedMixin):
     status = models.CharField(_('status'), max_length=20,
         choices=STATUS_CHOICES, default='draft')
     mails_sent = models.BooleanField(editable=False, default=False)
+    # id of the last backer that received the mail about this update
+    mails_checkpoint = models.PositiveIntegerField(editable=False, default=0)
 
     image = models.ImageField(_('image'), blank=True, null=True,
         upload_to=update_upload_to)
@@ -373,6 +461,9 @@ class Update(CreateUpdateModel, TranslatedMixin):
     external = models.URLField(_('external content'), blank=True, null=True,
          help_text=_('Check http://embed.ly/providers for more details'),
     )
+    # oEmbed HTML of external, see zipfelchappe.oembed
+    external_html = models.TextField(editable=False, blank=True)
+    external_fetched = models.DateTimeField(editable=False, blank=True, null=True)
 
     content = RichTextField(_('content'), blank=True)
 
@@ -384,9 +475,22 @@ class Update(CreateUpdateModel, TranslatedMixin):
         verbose_name_plural = _('updates')
         ordering = ('-created',)
 
+    def __init__(self, *args, **kwargs):
+        super(Update, self).__init__(*args, **kwargs)
+        self._external = self.external
+        self._loaded_image = image_name(self, 'image')
+
     def __unicode__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # refresh_external_content fetches the content of the new url
+        if self.external != self._external:
+            self.external_html = ''
+            self.external_fetched = None
+        super(Update, self).save(*args, **kwargs)
+        self._external = self.external
+
     @app_models.permalink
     def get_absolute_url(self):
         return ('zipfelchappe_update_detail', ROOT_URLS,
@@ -499,6 +603,40 @@ class ExtraField(models.Model):
         return self.get_type(**kwargs)
 
 
+class OutboxMessage(CreateUpdateModel):
+    """ A mail waiting to be delivered by the send_outbox command """
+
+    subject = models.CharField(_('subject'), max_length=255)
+
+    message = models.TextField(_('message'))
+
+    from_email = models.CharField(_('from'), max_length=254)
+
+    # newline separated list of addresses
+    recipients = models.TextField(_('recipients'))
+
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+
+    last_error = models.TextField(_('last error'), blank=True)
+
+    # set by the send_outbox run that is delivering the message
+    claimed = models.DateTimeField(_('claimed'), blank=True, null=True, editable=False)
+
+    sent = models.DateTimeField(_('sent'), blank=True, null=True, db_index=True)
+
+    class Meta:
+        verbose_name = _('outbox message')
+        verbose_name_plural = _('outbox messages')
+        ordering = ('created',)
+
+    def __unicode__(self):
+        return self.subject
+
+    @property
+    def recipient_list(self):
+        return self.recipients.splitlines()
+
+
 class ProjectManager(models.Manager):
 
     def get_queryset(self):
@@ -510,6 +648,12 @@ class ProjectManager(models.Manager):
     def funding(self):
         return self.online().filter(end__gte=now)
 
+    def with_achieved(self):
+        """ Projects annotated with the amount of their authorized pledges """
+        return self.get_queryset().annotate(achieved_amount=Sum(Case(
+            When(pledges__status__gte=Pledge.AUTHORIZED, then='pledges__amount'),
+            default=Value(0), output_field=models.DecimalField())))
+
     def billable(self):
         """ Returns a list of projects that are successfully financed
             (payments can be collected) """
@@ -535,6 +679,9 @@ class Project(Base, TranslatedMixin):
         self.feincms_item_editor_includes['head'].update([
             'admin/zipfelchappe/_project_head_include.html',
         ])
+        # start of the project when it was loaded, None if deferred
+        self._loaded_start = self.__dict__.get('start')
+        self._loaded_teaser_image = image_name(self, 'teaser_image')
 
     title = models.CharField(_('title'), max_length=100)
 
@@ -548,10 +695,10 @@ class Project(Base, TranslatedMixin):
     currency = models.CharField(_('currency'), max_length=3,
         choices=CURRENCY_CHOICES, default=CURRENCY_CHOICES[0])
 
-    start = models.DateTimeField(_('start'),
+    start = models.DateTimeField(_('start'), db_index=True,
         help_text=_('Date when the project will be online.'))
 
-    end = models.DateTimeField(_('end'),
+    end = models.DateTimeField(_('end'), db_index=True,
         help_text=_('End of the fundraising campaign.'))
 
     backers = models.ManyToManyField('Backer', verbose_name=_('backers'),
@@ -562,6 +709,16 @@ class Project(Base, TranslatedMixin):
 
     teaser_text = RichTextField(_('text'), blank=True)
 
+    # set once all backers have been informed about the outcome
+    closing_mails_sent = models.BooleanField(editable=False, default=False)
+    # id of the last backer that received the outcome mail
+    closing_mails_checkpoint = models.PositiveIntegerField(editable=False, default=0)
+
+    # sort keys of the project list, refreshed by the refresh_sort_keys command
+    funded_percent = models.PositiveIntegerField(editable=False, default=0, db_index=True)
+    backer_total = models.PositiveIntegerField(editable=False, default=0, db_index=True)
+    trending_score = models.FloatField(editable=False, default=0, db_index=True)
+
     objects = ProjectManager()
 
     class Meta:
@@ -644,6 +801,20 @@ class Project(Base, TranslatedMixin):
         """
         return self.pledges.filter(status=Pledge.AUTHORIZED)
 
+    @cached_property
+    def backer_count(self):
+        """ Number of authorized or paid pledges """
+        return self.authorized_pledges.count()
+
+    @property
+    def backer_pledges(self):
+        """
+        Authorized pledges with only the columns needed to list them on
+        the project page.
+        """
+        return self.authorized_pledges.only(
+            'project', 'backer', 'created', 'anonymously', 'display_name')
+
     @cached_property
     def has_pledges(self):
         return self.pledges.count() > 0
@@ -654,6 +825,8 @@ class Project(Base, TranslatedMixin):
         Returns the amount of money raised
         :return: Amount raised
         """
+        if hasattr(self, 'achieved_amount'):
+            return self.achieved_amount or 0
         amount = self.authorized_pledges.aggregate(Sum('amount'))
         return amount['amount__sum'] or 0
 
@@ -712,3 +885,68 @@ class Project(Base, TranslatedMixin):
             field.add_formfield(fields, self)
 
         return type(b'Form%s' % self.pk, (forms.Form,), fields)
+
+
+class ProjectSearchEntry(models.Model):
+    """ Searchable text of a project in one language, see zipfelchappe.search """
+
+    project = models.ForeignKey(Project, related_name='search_entries')
+
+    language = models.CharField(max_length=10)
+
+    title = models.TextField()
+
+    text = models.TextField()
+
+    class Meta:
+        unique_together = (('project', 'language'),)
+
+    def __unicode__(self):
+        return u'%s (%s)' % (self.project_id, self.language)
+
+
+signals.post_save.connect(project_saved, sender=Project)
+signals.post_save.connect(update_saved, sender=Update)
+
+for model in (Project, Update, Reward):
+    signals.post_save.connect(project_changed, sender=model)
+    signals.post_delete.connect(project_changed, sender=model)
+signals.post_save.connect(pledge_changed, sender=Pledge)
+signals.post_delete.connect(project_changed, sender=Pledge)
+signals.post_save.connect(global_changed, sender=Category)
+signals.post_delete.connect(global_changed, sender=Category)
+
+
+def project_start_changed(sender, instance, created=False, **kwargs):
+    """ Category counts only include projects that started """
+    if created or instance.start != instance._loaded_start:
+        categories_changed(sender)
+    instance._loaded_start = instance.start
+
+
+signals.post_save.connect(project_start_changed, sender=Project)
+signals.post_delete.connect(categories_changed, sender=Project)
+signals.post_save.connect(categories_changed, sender=Category)
+signals.post_delete.connect(categories_changed, sender=Category)
+
+if 'django_comments' in settings.INSTALLED_APPS:
+    from django_comments.signals import comment_was_posted
+    from .caching import comment_posted
+    comment_was_posted.connect(comment_posted)
+
+
+def project_content_changed(sender, instance, **kwargs):
+    """ Content types are created at runtime, filter them here """
+    if getattr(sender, '_feincms_content_class', None) is Project:
+        bump_generation(instance.parent_id)
+
+
+signals.post_save.connect(project_content_changed)
+signals.post_delete.connect(project_content_changed)
+
+signals.post_save.connect(project_indexed, sender=Project)
+signals.pre_delete.connect(project_deleting, sender=Project)
+signals.post_delete.connect(project_deleted, sender=Project)
+signals.post_save.connect(content_indexed)
+signals.post_delete.connect(content_indexed)
+signals.post_migrate.connect(setup_search)
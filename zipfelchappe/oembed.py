@@ -0,0 +1,105 @@
+"""
+oEmbed content of updates.
+
+The HTML is fetched from embed.ly by the refresh_external_content command
+and stored on the update. The command fetches the content of new and
+changed urls and refreshes the others periodically. Saving an update and
+rendering templates never wait for embed.ly.
+"""
+from __future__ import absolute_import, unicode_literals
+from collections import defaultdict
+from datetime import timedelta
+from hashlib import sha1
+import logging
+
+import requests
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.timezone import now
+
+from .app_settings import (EMBED_SIZE, EMBED_TIMEOUT, EMBED_FAILURE_TIMEOUT,
+                           EMBED_REFRESH_AFTER)
+from .caching import bump_generations
+from .utils import map_concurrently
+
+EMBEDLY_URL = 'http://api.embed.ly/1/oembed'
+
+CACHE_KEY = 'zipfelchappe_oembed_%s'
+FAILURE_CACHE_KEY = 'zipfelchappe_oembed_failed_%s'
+
+logger = logging.getLogger('zipfelchappe.oembed')
+
+
+class OEmbedError(Exception):
+    pass
+
+
+def url_hash(url, size=EMBED_SIZE):
+    return sha1(('%s %s' % (url, size)).encode('utf-8')).hexdigest()
+
+
+def fetch_oembed_html(url, size=EMBED_SIZE):
+    """
+    Returns the oEmbed HTML of url from embed.ly. Failures are remembered
+    for EMBED_FAILURE_TIMEOUT seconds, during that time the url is not
+    requested again and OEmbedError is raised right away.
+    """
+    key = url_hash(url, size)
+    if cache.get(FAILURE_CACHE_KEY % key):
+        raise OEmbedError('Fetching %s failed recently' % url)
+
+    width, height = size.split('x')
+    try:
+        response = requests.get(EMBEDLY_URL, timeout=EMBED_TIMEOUT, params={
+            'url': url,
+            'maxwidth': width,
+            'maxheight': height,
+        })
+        response.raise_for_status()
+        data = response.json()
+        if data.get('type') == 'photo':
+            html = '<img src="%s" alt="%s" />' % (
+                escape(data['url']), escape(data.get('title', '')))
+        else:
+            html = data['html']
+    except (requests.RequestException, ValueError, KeyError) as e:
+        cache.set(FAILURE_CACHE_KEY % key, True, EMBED_FAILURE_TIMEOUT)
+        raise OEmbedError('Fetching %s failed: %r' % (url, e))
+
+    cache.set(CACHE_KEY % key, html, EMBED_REFRESH_AFTER)
+    return html
+
+
+def stale_updates(max_age=EMBED_REFRESH_AFTER):
+    """ Updates with external content that is new or was not fetched recently """
+    from .models import Update
+    return Update.objects.exclude(external__isnull=True).exclude(external='').filter(
+        Q(external_fetched__isnull=True) |
+        Q(external_fetched__lt=now() - timedelta(seconds=max_age)))
+
+
+def refresh_external_content(updates, fetch=fetch_oembed_html, workers=4):
+    """
+    Fetches the external content of updates concurrently and stores it.
+
+    :return: Tuple of the number of refreshed and failed urls.
+    """
+    from .models import Update
+    urls = defaultdict(list)
+    for update in updates:
+        urls[update.external].append(update.pk)
+
+    refreshed = failed = 0
+    for url, html, error in map_concurrently(fetch, list(urls), workers):
+        if error is not None:
+            logger.warning('%s', error)
+            failed += 1
+            continue
+        Update.objects.filter(pk__in=urls[url]).update(
+            external_html=html, external_fetched=now())
+        bump_generations(Update.objects.filter(pk__in=urls[url]).values_list(
+            'project_id', flat=True))
+        refreshed += 1
+
+    return refreshed, failed
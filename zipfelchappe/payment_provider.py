@@ -2,8 +2,12 @@
 from __future__ import absolute_import, unicode_literals
 import logging
 
+from django.db.models import Count, Sum
+
 # https://charlesleifer.com/blog/django-patterns-pluggable-backends/
 from . import PaymentProviderException, payment_providers
+from .app_settings import COLLECT_LATENCY_ESTIMATE
+from .metrics import percentile, recent_latencies, timed
 
 logger = logging.getLogger(__name__)
 
@@ -55,18 +59,32 @@ class BasePaymentProvider(object):
         """
         raise NotImplementedError()
 
+    def billable_pledges(self, projects):
+        """
+        Returns the pledges a collection run would process.
+        :param projects: The billable projects.
+        :return: Queryset of Pledges
+        """
+        from .models import Pledge
+        return Pledge.objects.filter(project__in=projects, provider=self.name,
+                                     status=Pledge.AUTHORIZED)
+
     def collect_billable_payments(self, project):
         """
         Collects billable payments for the given project.
         :param project: The project to collect payments for.
         :return: The amount of processed pledges.
         """
-        pledges = project.authorized_pledges.filter(provider=self.name)
+        pledges = self.billable_pledges([project])
+        processed = 0
         for pledge in pledges:
             try:
-                self.collect_pledge(pledge)
+                with timed('%s.collect' % self.name):
+                    self.collect_pledge(pledge)
             except PaymentProviderException as e:
                 logger.info(e.message)
+            processed += 1
+        return processed
 
     def refund_payments(self, project):
         """
@@ -76,3 +94,54 @@ class BasePaymentProvider(object):
         """
         raise NotImplementedError()
 
+
+def plan_collection(name, pledges, concurrency=1):
+    """
+    Summarizes a collection run without contacting the provider.
+    :param name: The provider name, used to look up recent call latencies.
+    :param pledges: Queryset of the pledges that would be collected.
+    :param concurrency: Number of provider calls made in parallel.
+    :return: A dict with one row per project, totals and projected duration.
+    """
+    projects = list(
+        pledges.order_by().values('project__title', 'currency')
+        .annotate(pledges=Count('pk'), amount=Sum('amount'))
+        .order_by('project__title'))
+
+    totals = {}
+    for row in projects:
+        totals[row['currency']] = totals.get(row['currency'], 0) + row['amount']
+    count = sum(row['pledges'] for row in projects)
+
+    samples = recent_latencies('%s.collect' % name)
+    latency = percentile(samples, 50) if samples else COLLECT_LATENCY_ESTIMATE
+
+    return {
+        'provider': name,
+        'projects': projects,
+        'pledges': count,
+        'totals': totals,
+        'samples': len(samples),
+        'latency': latency,
+        'concurrency': concurrency,
+        'duration': count * latency / max(concurrency, 1),
+    }
+
+
+def format_collection_plan(plan):
+    """ Renders the result of plan_collection as plain text """
+    lines = ['Dry run for %s, no payments are collected.' % plan['provider']]
+    for row in plan['projects']:
+        lines.append('  %s: %d pledges, %s %s' % (
+            row['project__title'], row['pledges'], row['amount'], row['currency']))
+    for currency, amount in sorted(plan['totals'].items()):
+        lines.append('Total %s: %s' % (currency, amount))
+    if plan['samples']:
+        source = 'median of %d recent calls' % plan['samples']
+    else:
+        source = 'no recent calls, estimated'
+    lines.append('Total pledges: %d' % plan['pledges'])
+    lines.append('Latency per call: %.2fs (%s)' % (plan['latency'], source))
+    lines.append('Projected duration: %ds with concurrency %d' % (
+        round(plan['duration']), plan['concurrency']))
+    return '\n'.join(lines)
@@ -30,3 +30,9 @@ PAYPAL = {
 PAYPAL.update(getattr(settings, 'ZIPFELCHAPPE_PAYPAL', {}))
 
 MAXIMUM_ALLOWED_REWARD = 100  # US$
+
+SYNC_STALE_MINUTES = 30  # age of unauthorized preapprovals to look up
+SYNC_MAX_AGE_HOURS = 24  # older preapprovals were abandoned and are not looked up
+SYNC_WORKERS = 4  # concurrent PreapprovalDetails requests
+SYNC_RATE = 5  # max. PreapprovalDetails requests per second
+SYNC_BATCH_SIZE = 100  # preapprovals written per transaction
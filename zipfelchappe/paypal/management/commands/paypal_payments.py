@@ -1,11 +1,26 @@
+from optparse import make_option
+
 from django.core.management.base import BaseCommand
 
-from zipfelchappe.paypal.tasks import process_payments
+from zipfelchappe.models import Project
+from zipfelchappe.payment_provider import plan_collection, format_collection_plan
+from zipfelchappe.paypal.tasks import process_payments, billable_pledges
 
 
 class Command(BaseCommand):
     help = 'Collect all paypal payments for finished projects (cronjob)'
 
+    option_list = BaseCommand.option_list + (
+        make_option('--dry-run', action='store_true', dest='dry_run', default=False,
+            help='List billable pledges and project the duration of the run '
+                 'without contacting Paypal.'),
+    )
+
     def handle(self, *args, **options):
+        if options['dry_run']:
+            pledges = billable_pledges(Project.objects.billable())
+            self.stdout.write(format_collection_plan(plan_collection('paypal', pledges)))
+            return
+
         pledges_processed = process_payments()
         print "Total pledges processed: %d" % pledges_processed
@@ -0,0 +1,40 @@
+from collections import Counter
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from zipfelchappe.paypal.app_settings import (
+    SYNC_MAX_AGE_HOURS, SYNC_WORKERS, SYNC_RATE, SYNC_BATCH_SIZE)
+from zipfelchappe.paypal.tasks import sync_preapprovals, stale_preapprovals
+
+
+class Command(BaseCommand):
+    help = 'Look up the status of preapprovals without IPN message (cronjob)'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', dest='workers', default=SYNC_WORKERS,
+            help='Number of concurrent requests to paypal.'),
+        make_option('--rate', type='float', dest='rate', default=SYNC_RATE,
+            help='Maximum number of requests per second.'),
+        make_option('--batch-size', type='int', dest='batch_size', default=SYNC_BATCH_SIZE,
+            help='Number of preapprovals written per transaction.'),
+        make_option('--max-age', type='int', dest='max_age', default=SYNC_MAX_AGE_HOURS,
+            help='Skip preapprovals created more than this many hours ago.'),
+    )
+
+    def handle(self, *args, **options):
+        changes = sync_preapprovals(
+            list(stale_preapprovals(options['max_age'])),
+            workers=options['workers'],
+            rate=options['rate'],
+            batch_size=options['batch_size'],
+        )
+
+        transitions = Counter((old, new) for preapproval, old, new in changes)
+        for (old, new), count in sorted(transitions.items()):
+            if new is None:
+                self.stdout.write('%s: %d failed lookups' % (old, count))
+            else:
+                self.stdout.write('%s -> %s: %d' % (old, new, count))
+        self.stdout.write('Total preapprovals synced: %d' % sum(
+            1 for preapproval, old, new in changes if new is not None))
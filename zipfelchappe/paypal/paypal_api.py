@@ -6,7 +6,6 @@ https://developer.paypal.com/docs/classic/api/#ap
 """
 
 import json
-import requests
 import logging
 from datetime import datetime
 from decimal import Decimal
@@ -21,6 +20,7 @@ from feincms.content.application.models import app_reverse
 
 from . import app_settings as settings
 from ..app_settings import ROOT_URLS
+from ..metrics import instrumented_request
 
 PP_REQ_HEADERS = {
     'X-PAYPAL-SECURITY-USERID': settings.PAYPAL['USERID'],
@@ -43,6 +43,19 @@ PP_CMD_URL = PP_CMD_LIVE_URL if settings.PAYPAL['LIVE'] else PP_CMD_SANDBOX_URL
 logger = logging.getLogger('zipfelchappe.paypal.ipn')
 
 
+def error_id(response):
+    """ Returns the id of the first error in an API response """
+    errors = response.json().get('error')
+    return errors[0].get('errorId') if errors else None
+
+
+def api_request(operation, data):
+    """ Posts data to an Adaptive Payments API operation """
+    return instrumented_request(
+        'paypal', operation, 'post', PP_API_URL + '/AdaptivePayments/' + operation,
+        error_code=error_id, headers=PP_REQ_HEADERS, data=json.dumps(data))
+
+
 def zuluTimeFormat(date):
     return date.strftime('%Y-%m-%dT%H:%M:%SZ')
 
@@ -55,7 +68,8 @@ def verify_ipn_message(data):
     verify_params = {'cmd': '_notify-validate'}
     verify_params.update(data)
 
-    verify_result = requests.get(PP_CMD_URL, params=verify_params).text
+    verify_result = instrumented_request(
+        'paypal', 'notify-validate', 'get', PP_CMD_URL, params=verify_params).text
     logger.info(verify_result)
     return verify_result == 'VERIFIED'
 
@@ -63,8 +77,6 @@ def verify_ipn_message(data):
 def create_preapproval(pledge):
     site = Site.objects.get_current()
 
-    url = PP_API_URL + '/AdaptivePayments/Preapproval'
-
     data = {
         'returnUrl': 'http://%s%s' % (site,
             app_reverse('zipfelchappe_pledge_thankyou', ROOT_URLS)),
@@ -85,9 +97,16 @@ def create_preapproval(pledge):
 
     logger.debug('ipn url %s' % data['ipnNotificationUrl'])
 
-    response = requests.post(url, headers=PP_REQ_HEADERS, data=json.dumps(data))
+    return api_request('Preapproval', data)
 
-    return response
+
+def get_preapproval_details(key):
+    data = {
+        'preapprovalKey': key,
+        "requestEnvelope": {'errorLanguage': 'en_US'},
+    }
+
+    return api_request('PreapprovalDetails', data)
 
 
 def get_receiver_entry(receiver, amount):
@@ -103,8 +122,6 @@ def create_payment(preapproval):
 
     pledge = preapproval.pledge
 
-    url = PP_API_URL + '/AdaptivePayments/Pay'
-
     if not settings.PAYPAL['RECEIVERS']:
         # TODO: do this on Project save as well.
         raise ImproperlyConfigured(_('No paypal receivers defined!'))
@@ -134,4 +151,4 @@ def create_payment(preapproval):
         "requestEnvelope": {"errorLanguage": "en_US"},
     }
 
-    return requests.post(url, headers=PP_REQ_HEADERS, data=json.dumps(data))
+    return api_request('Pay', data)
@@ -4,7 +4,7 @@ from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
 from django.utils.translation import ugettext_lazy as _
 from ..payment_provider import BasePaymentProvider
-from .tasks import process_pledge
+from .tasks import process_pledge, billable_pledges
 from .app_settings import MAXIMUM_ALLOWED_REWARD
 
 
@@ -18,6 +18,9 @@ class PaypalProvider(BasePaymentProvider):
     def payment_url(self):
         return reverse('zipfelchappe_paypal_payment')
 
+    def billable_pledges(self, projects):
+        return billable_pledges(projects)
+
     def collect_pledge(self, pledge):
         return process_pledge(pledge)
 
@@ -1,9 +1,22 @@
 import json
+from collections import defaultdict
+from datetime import timedelta
 
+from django.db import transaction
+from django.utils.timezone import now
+
+from zipfelchappe.caching import bump_generations
+from zipfelchappe.metrics import timed
 from zipfelchappe.models import Project, Pledge
+from zipfelchappe.utils import chunked, map_concurrently
 
+from .app_settings import (SYNC_STALE_MINUTES, SYNC_MAX_AGE_HOURS, SYNC_WORKERS,
+                           SYNC_RATE, SYNC_BATCH_SIZE)
 from .models import Preapproval, Payment
-from .paypal_api import create_payment
+from .paypal_api import create_payment, get_preapproval_details
+
+# Preapprovals in these states can not be used for a payment anymore
+CLOSED_PREAPPROVAL_STATUSES = ('CANCELED', 'DEACTIVED')
 
 
 class PaypalException(Exception):
@@ -45,6 +58,17 @@ def process_pledge(pledge):
     return pp_data
     
 
+def billable_pledges(projects):
+    """ Pledges of the given projects that are ready to be payed """
+    return Pledge.objects.filter(
+        project__in=projects,
+        provider='paypal',
+        status=Pledge.AUTHORIZED,
+        paypal_preapproval__status='ACTIVE',
+        paypal_preapproval__approved=True,
+    )
+
+
 def process_payments():
     """
     Collects the paypal payments for all successfully financed projects
@@ -53,18 +77,12 @@ def process_payments():
 
     billable_projects = Project.objects.billable()
 
-    # Pledges that are ready to be payed
-    processing_pledges = Pledge.objects.filter(
-        project__in=billable_projects,
-        provider='paypal',
-        status=Pledge.AUTHORIZED,
-        paypal_preapproval__status='ACTIVE',
-        paypal_preapproval__approved=True,
-    )
+    processing_pledges = billable_pledges(billable_projects)
 
     for pledge in processing_pledges:
         try:
-            process_pledge(pledge)
+            with timed('paypal.collect'):
+                process_pledge(pledge)
         except PaypalException as e:
             pledge.status = pledge.FAILED
             pledge.save()
@@ -72,3 +90,80 @@ def process_payments():
             print e.message
 
     return processing_pledges.count()
+
+
+def preapproval_details(key):
+    """ Returns the PreapprovalDetails response for key as dict """
+    return get_preapproval_details(key).json()
+
+
+def stale_preapprovals(max_age_hours=SYNC_MAX_AGE_HOURS):
+    """ Preapprovals of unauthorized pledges that should have received an
+        IPN message by now. Older preapprovals were abandoned during the
+        checkout and are not looked up again on every run. """
+    return Preapproval.objects.filter(
+        pledge__status=Pledge.UNAUTHORIZED,
+        created__lt=now() - timedelta(minutes=SYNC_STALE_MINUTES),
+        created__gte=now() - timedelta(hours=max_age_hours),
+    ).exclude(status__in=CLOSED_PREAPPROVAL_STATUSES)
+
+
+def sync_preapprovals(preapprovals, query=preapproval_details, workers=SYNC_WORKERS,
+                      rate=SYNC_RATE, batch_size=SYNC_BATCH_SIZE):
+    """
+    Looks up the given preapprovals at paypal and writes their status back
+    the same way the IPN handler does. Pledges of closed preapprovals are
+    marked as failed, so they don't reserve rewards anymore.
+
+    :param preapprovals: List of Preapproval instances.
+    :param query: Function returning the PreapprovalDetails response for a key.
+    :return: List of (preapproval, old status, new status) tuples, failed
+             lookups have None as new status.
+    """
+    results = map_concurrently(lambda p: query(p.key), preapprovals, workers, rate)
+
+    changes = []
+    updated = []
+    for preapproval, data, error in results:
+        if error is None and 'error' in data:
+            error = data['error'][0].get('message')
+        if error is not None or 'status' not in data:
+            changes.append((preapproval, preapproval.status, None))
+            continue
+        changes.append((preapproval, preapproval.status, data['status']))
+        updated.append((preapproval, data))
+
+    for batch in chunked(updated, batch_size):
+        pledge_ids = defaultdict(list)
+        with transaction.atomic():
+            timestamp = now()
+            for preapproval, data in batch:
+                preapproval.status = data['status']
+                preapproval.approved = data.get('approved') == 'true'
+                preapproval.sender = data.get('senderEmail', preapproval.sender)
+                preapproval.data = json.dumps(data, indent=2)
+                Preapproval.objects.filter(pk=preapproval.pk).update(
+                    status=preapproval.status,
+                    approved=preapproval.approved,
+                    sender=preapproval.sender,
+                    data=preapproval.data,
+                    modified=timestamp,
+                )
+                if preapproval.status == 'ACTIVE' and preapproval.approved:
+                    pledge_ids[Pledge.AUTHORIZED].append(preapproval.pledge_id)
+                elif preapproval.status in CLOSED_PREAPPROVAL_STATUSES:
+                    pledge_ids[Pledge.FAILED].append(preapproval.pledge_id)
+
+            pledges = Pledge.objects.filter(status=Pledge.UNAUTHORIZED)
+            if pledge_ids[Pledge.AUTHORIZED]:
+                pledges.filter(pk__in=pledge_ids[Pledge.AUTHORIZED]).update(
+                    status=Pledge.AUTHORIZED, modified=timestamp)
+            if pledge_ids[Pledge.FAILED]:
+                pledges.filter(pk__in=pledge_ids[Pledge.FAILED]).update(
+                    status=Pledge.FAILED, reward=None, modified=timestamp)
+
+        bump_generations(Pledge.objects.filter(
+            pk__in=[preapproval.pledge_id for preapproval, data in batch],
+        ).values_list('project_id', flat=True))
+
+    return changes
@@ -1,16 +1,27 @@
 from xml.etree import ElementTree
 
-import requests
 import logging
+from zipfelchappe.metrics import instrumented_request
 from zipfelchappe.postfinance.app_settings import POSTFINANCE
 
 env = 'prod' if POSTFINANCE['LIVE'] else 'test'
 api_logger = logging.getLogger('zipfelchappe.postfinance.api')
 
 
+def ncerror(response):
+    """ Returns the NCERROR of a direct link response unless it is 0 """
+    error = ElementTree.fromstring(response.text).get('NCERROR')
+    return error if error and error != '0' else None
+
+
+def direct_request(endpoint, payload):
+    url = 'https://e-payment.postfinance.ch/ncol/%s/%s.asp' % (env, endpoint)
+    return instrumented_request('postfinance', endpoint, 'post', url,
+                                error_code=ncerror, data=payload)
+
+
 def request_payment(payid):
     """ request payment of payid and close transaction """
-    url = 'https://e-payment.postfinance.ch/ncol/%s/maintenancedirect.asp' % env
     payload = {
         'PSPID': POSTFINANCE['PSPID'],
         'USERID': POSTFINANCE['USERID'],
@@ -19,7 +30,7 @@ def request_payment(payid):
         'OPERATION': 'SAS'
     }
 
-    response = requests.post(url, data=payload)
+    response = direct_request('maintenancedirect', payload)
     api_logger.debug('Requesting payment for ID {0}\n{1}'.format(
         payid, response.text
     ))
@@ -28,7 +39,6 @@ def request_payment(payid):
 
 
 def update_payment(payid):
-    url = 'https://e-payment.postfinance.ch/ncol/%s/querydirect.asp' % env
     payload = {
         'PSPID': POSTFINANCE['PSPID'],
         'USERID': POSTFINANCE['USERID'],
@@ -36,7 +46,7 @@ def update_payment(payid):
         'PAYID': payid,
     }
 
-    response = requests.post(url, data=payload)
+    response = direct_request('querydirect', payload)
     api_logger.debug('Updating payment for PayID {0}\n{1}'.format(
         payid, response.text
     ))
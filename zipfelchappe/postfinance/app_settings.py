@@ -27,3 +27,7 @@ POSTFINANCE = {
 POSTFINANCE.update(getattr(settings, 'ZIPFELCHAPPE_POSTFINANCE', {}))
 
 MAX_BLOCKING_DURATION_DAYS = 29  # maximum duration for funds to be blocked.
+
+RECONCILE_WORKERS = 4  # concurrent querydirect requests
+RECONCILE_RATE = 10  # max. querydirect requests per second
+RECONCILE_BATCH_SIZE = 100  # status changes written per transaction
@@ -1,12 +1,27 @@
+from optparse import make_option
+
 from django.core.management.base import BaseCommand
 
-from zipfelchappe.postfinance.tasks import process_payments
+from zipfelchappe.models import Project
+from zipfelchappe.payment_provider import plan_collection, format_collection_plan
+from zipfelchappe.postfinance.tasks import process_payments, billable_pledges
 
 
 class Command(BaseCommand):
 
     help = 'Collect all postfinance payments for finished projects (cronjob)'
 
+    option_list = BaseCommand.option_list + (
+        make_option('--dry-run', action='store_true', dest='dry_run', default=False,
+            help='List billable pledges and project the duration of the run '
+                 'without contacting Postfinance.'),
+    )
+
     def handle(self, *args, **options):
+        if options['dry_run']:
+            pledges = billable_pledges(Project.objects.billable())
+            self.stdout.write(format_collection_plan(plan_collection('postfinance', pledges)))
+            return
+
         payments_processed = process_payments()
         print "Total payments processed: %d " % payments_processed
@@ -0,0 +1,42 @@
+from collections import Counter
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from zipfelchappe.postfinance.app_settings import (
+    RECONCILE_WORKERS, RECONCILE_RATE, RECONCILE_BATCH_SIZE)
+from zipfelchappe.postfinance.models import STATUS_DICT
+from zipfelchappe.postfinance.tasks import reconcile_non_final_payments
+
+
+class Command(BaseCommand):
+
+    help = 'Query the status of all pending postfinance payments (cronjob)'
+
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', dest='workers', default=RECONCILE_WORKERS,
+            help='Number of concurrent requests to postfinance.'),
+        make_option('--rate', type='float', dest='rate', default=RECONCILE_RATE,
+            help='Maximum number of requests per second.'),
+        make_option('--batch-size', type='int', dest='batch_size',
+            default=RECONCILE_BATCH_SIZE,
+            help='Number of status changes written per transaction.'),
+    )
+
+    def handle(self, *args, **options):
+        changes = reconcile_non_final_payments(
+            workers=options['workers'],
+            rate=options['rate'],
+            batch_size=options['batch_size'],
+        )
+
+        transitions = Counter((old, new) for payment, old, new in changes)
+        for (old, new), count in sorted(transitions.items()):
+            if new is None:
+                self.stdout.write('%s (%s): %d failed queries' % (
+                    old, STATUS_DICT.get(old), count))
+            else:
+                self.stdout.write('%s (%s) -> %s (%s): %d' % (
+                    old, STATUS_DICT.get(old), new, STATUS_DICT.get(new), count))
+        self.stdout.write('Total payments changed: %d' % sum(
+            1 for payment, old, new in changes if new is not None))
@@ -1,13 +1,38 @@
 from __future__ import unicode_literals, absolute_import, print_function
+from collections import defaultdict
 import logging
-from .. import PaymentProviderException
 
+from django.db import transaction
+from django.db.models import TextField, Value
+from django.db.models.functions import Concat
+from django.utils.timezone import now
+
+from .. import PaymentProviderException
+from ..caching import bump_generations
+from ..metrics import timed
 from ..models import Project, Pledge
+from ..utils import chunked, map_concurrently
+from .app_settings import RECONCILE_WORKERS, RECONCILE_RATE, RECONCILE_BATCH_SIZE
 from .models import Payment, STATUS_DICT
 from .api.direct_link_v1 import request_payment, update_payment
 
 logger = logging.getLogger('zipfelchappe.postfinance.ipn')
 
+# Payments in these states change without any action on our side
+NON_FINAL_STATUSES = ('5', '51', '91', '92')
+# Payments in these states were requested and wait for postfinance
+PROCESSING_STATUSES = ('91', '92')
+
+# Pledge status implied by a payment status
+PLEDGE_STATUS = {
+    '1': Pledge.FAILED,
+    '2': Pledge.FAILED,
+    '5': Pledge.AUTHORIZED,
+    '6': Pledge.FAILED,
+    '9': Pledge.PAID,
+    '93': Pledge.FAILED,
+}
+
 
 class PostfinanceException(PaymentProviderException):
     def __init__(self, message, *args, **kwargs):
@@ -22,20 +47,13 @@ def process_pledge(pledge):
     except Payment.DoesNotExist:
         raise PostfinanceException('Payment for pledge %s not found' % pledge.pk)
 
-    if payment.STATUS == '91':
+    if payment.STATUS in PROCESSING_STATUSES:
         # payment is in processing state, check status
-        result = update_payment(payment.PAYID)
-        if result['STATUS'] == '9':
-            payment.STATUS = result['STATUS']
-            payment.save()
-
-            payment.pledge.status = Pledge.PAID
-            payment.pledge.save()
-            logger.info('Pledge {0} has been paid.'.format(pledge.pk))
-            return result
+        reconcile_payments([payment])
         logger.debug('New status for pledge {0}: {1}:{2}'.format(
-            pledge.pk, payment.STATUS, STATUS_DICT[payment.STATUS]
+            pledge.pk, payment.STATUS, STATUS_DICT.get(payment.STATUS)
         ))
+        return {'STATUS': payment.STATUS}
 
     elif payment.STATUS == '5':
         # Payment is authorized, request transaction
@@ -57,6 +75,16 @@ def process_pledge(pledge):
         raise PostfinanceException('Payment is not authorized')
 
 
+def billable_pledges(projects):
+    """ Authorized postfinance pledges of the given projects. Payments that
+        are already being processed are left to reconcile_payments. """
+    return Pledge.objects.filter(
+        project__in=projects,
+        provider='postfinance',
+        status=Pledge.AUTHORIZED
+    ).exclude(postfinance_payment__STATUS__in=PROCESSING_STATUSES)
+
+
 def process_payments():
     """
     Collect postfinance payments for all successfully financed projects
@@ -66,18 +94,15 @@ def process_payments():
 
     billable_projects = Project.objects.billable()
 
-    pledges = Pledge.objects.filter(
-        project__in=billable_projects,
-        provider='postfinance',
-        status=Pledge.AUTHORIZED
-    )
+    pledges = billable_pledges(billable_projects)
     logger.info('Collecting payments for {0} pledges in {1} projects.'.format(
         len(pledges), len(billable_projects)
     ))
 
     for pledge in pledges:
         try:
-            process_pledge(pledge)
+            with timed('postfinance.collect'):
+                process_pledge(pledge)
         except PostfinanceException as e:
             pledge.mark_failed(e.message)
             print(e.message)
@@ -85,3 +110,65 @@ def process_payments():
     return pledges.count()
 
 
+def reconcile_payments(payments, query=update_payment, workers=RECONCILE_WORKERS,
+                       rate=RECONCILE_RATE, batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Queries the current status of the given payments from postfinance and
+    writes changed statuses of payments and their pledges in batches.
+
+    :param payments: List of Payment instances.
+    :param query: Function returning the postfinance response for a PAYID.
+    :return: List of (payment, old status, new status) tuples, failed queries
+             have None as new status.
+    """
+    results = map_concurrently(lambda p: query(p.PAYID), payments, workers, rate)
+
+    changes = []
+    for payment, result, error in results:
+        if error is not None:
+            logger.warning('Could not query payment {0}: {1}'.format(payment.PAYID, error))
+            changes.append((payment, payment.STATUS, None))
+        elif result.get('STATUS') and result['STATUS'] != payment.STATUS:
+            changes.append((payment, payment.STATUS, result['STATUS']))
+
+    updated = [change for change in changes if change[2] is not None]
+    for batch in chunked(updated, batch_size):
+        payment_ids = defaultdict(list)
+        pledge_ids = defaultdict(list)
+        for payment, old, new in batch:
+            payment.STATUS = new
+            payment_ids[new].append(payment.pk)
+            if new in PLEDGE_STATUS:
+                pledge_ids[new].append(payment.pledge_id)
+
+        with transaction.atomic():
+            timestamp = now()
+            for status, ids in payment_ids.items():
+                Payment.objects.filter(pk__in=ids).update(
+                    STATUS=status, updated=timestamp)
+            for status, ids in pledge_ids.items():
+                # pledges only move forward, like with Pledge.mark_failed
+                pledge_status = PLEDGE_STATUS[status]
+                pledges = Pledge.objects.filter(pk__in=ids, status__gt=Pledge.FAILED)
+                if pledge_status == Pledge.FAILED:
+                    message = 'postfinance status {0}: {1}\n'.format(
+                        status, STATUS_DICT.get(status, 'unknown'))
+                    pledges.update(status=pledge_status, reward=None, modified=timestamp,
+                                   details=Concat('details', Value(message),
+                                                  output_field=TextField()))
+                else:
+                    pledges.filter(status__lt=pledge_status).update(
+                        status=pledge_status, modified=timestamp)
+
+        bump_generations(Pledge.objects.filter(
+            pk__in=[payment.pledge_id for payment, old, new in batch],
+        ).values_list('project_id', flat=True))
+
+    return changes
+
+
+def reconcile_non_final_payments(**kwargs):
+    """ Reconciles all payments that may still change their status """
+    payments = list(Payment.objects.filter(STATUS__in=NON_FINAL_STATUSES)
+                    .exclude(PAYID=''))
+    return reconcile_payments(payments, **kwargs)
@@ -0,0 +1,167 @@
+"""
+Server-sent events stream of the funding progress of projects.
+
+All streams of a process are served from one ProgressFeed. Its thread
+checks the generation counters (see zipfelchappe.caching) of the
+subscribed projects once per tick and only queries the pledge totals of
+projects that changed, with a single query for all of them. The streams
+just wait for the feed, so the number of viewers does not change the
+number of database reads.
+
+Every open stream occupies a worker thread, so the stream urls should only
+be included if the site is served by a threaded or asynchronous server.
+"""
+from __future__ import absolute_import, unicode_literals
+from collections import defaultdict
+import json
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Sum
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from . import app_settings
+from .caching import GENERATION_KEY, generation
+from .models import Project, Pledge
+
+
+def progress_totals(project_ids):
+    """ Returns {project_id: (achieved, backers)} with a single query """
+    totals = dict((project_id, (0, 0)) for project_id in project_ids)
+    pledges = Pledge.objects.filter(
+        project__in=project_ids, status__gte=Pledge.AUTHORIZED
+    ).order_by().values('project').annotate(
+        achieved=Sum('amount'), backers=Count('id'))
+    for row in pledges:
+        totals[row['project']] = (float(row['achieved']), row['backers'])
+    return totals
+
+
+class ProgressFeed(object):
+    """ Polls the progress of subscribed projects and wakes up the streams """
+
+    def __init__(self, interval=None, totals=progress_totals):
+        self.interval = interval or app_settings.PROGRESS_STREAM_INTERVAL
+        self.totals = totals
+        self.condition = threading.Condition()
+        self.subscribers = defaultdict(int)
+        self.generations = {}
+        self.snapshots = {}
+        self.thread = None
+
+    def subscribe(self, project_id):
+        with self.condition:
+            self.subscribers[project_id] += 1
+            if self.thread is None:
+                self.start()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def unsubscribe(self, project_id):
+        with self.condition:
+            self.subscribers[project_id] -= 1
+            if self.subscribers[project_id] <= 0:
+                del self.subscribers[project_id]
+                self.generations.pop(project_id, None)
+                self.snapshots.pop(project_id, None)
+
+    def poll(self):
+        """ Refreshes the snapshots of all subscribed projects that changed """
+        with self.condition:
+            project_ids = list(self.subscribers)
+        if not project_ids:
+            return
+
+        keys = dict((GENERATION_KEY % pk, pk) for pk in project_ids)
+        current = dict((pk, None) for pk in project_ids)
+        for key, value in cache.get_many(list(keys)).items():
+            current[keys[key]] = value
+        for pk, value in current.items():
+            if value is None:
+                current[pk] = generation(pk)
+
+        changed = [pk for pk in project_ids
+                   if current[pk] != self.generations.get(pk)]
+        if not changed:
+            return
+        totals = self.totals(changed)
+
+        with self.condition:
+            for pk in changed:
+                if pk in self.subscribers:
+                    self.generations[pk] = current[pk]
+                    self.snapshots[pk] = totals[pk]
+            self.condition.notify_all()
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.subscribers:
+                    self.thread = None
+                    connection.close()
+                    return
+            self.poll()
+            time.sleep(self.interval)
+
+    def wait(self, project_id, last=None, timeout=None):
+        """
+        Blocks until the snapshot of project_id differs from last or the
+        timeout passed. Returns the current snapshot.
+        """
+        deadline = time.time() + (timeout or 0)
+        with self.condition:
+            while self.snapshots.get(project_id) in (None, last):
+                remaining = deadline - time.time()
+                if timeout is not None and remaining <= 0:
+                    break
+                self.condition.wait(remaining if timeout is not None else None)
+            return self.snapshots.get(project_id)
+
+
+feed = ProgressFeed()
+
+
+def progress_events(project, feed=feed, duration=None, keepalive=15):
+    """
+    Yields a progress event whenever the snapshot of project changes and a
+    comment line every keepalive seconds. Browsers reconnect after the
+    stream ended, so no connection is kept longer than duration.
+    """
+    duration = duration or app_settings.PROGRESS_STREAM_DURATION
+    end = time.time() + duration
+    feed.subscribe(project.pk)
+    try:
+        yield 'retry: %d\n\n' % (feed.interval * 1000)
+        last = None
+        while time.time() < end:
+            snapshot = feed.wait(project.pk, last, min(keepalive, end - time.time()))
+            if snapshot is None or snapshot == last:
+                yield ': keepalive\n\n'
+                continue
+            last = snapshot
+            achieved, backers = snapshot
+            yield 'event: progress\ndata: %s\n\n' % json.dumps({
+                'achieved': achieved,
+                'goal': float(project.goal),
+                'percent': int(round(achieved * 100 / float(project.goal))),
+                'backers': backers,
+            })
+    finally:
+        feed.unsubscribe(project.pk)
+
+
+def progress_stream(request, slug):
+    """ Server-sent events with the funding progress of a project """
+    project = get_object_or_404(Project.objects.online(), slug=slug)
+    response = StreamingHttpResponse(
+        progress_events(project), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,6 @@
+from django.conf.urls import patterns, url
+
+urlpatterns = patterns('zipfelchappe.progress',
+    url(r'^(?P<slug>[\w-]+)/$', 'progress_stream',
+        name='zipfelchappe_project_progress_stream'),
+)
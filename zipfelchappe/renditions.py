@@ -0,0 +1,113 @@
+"""
+Pre-generated image renditions.
+
+Renditions are generated when an image is uploaded or replaced, in a
+background thread, and by the regenerate_renditions command. They use the names
+of feincms' thumbnail and cropscale filters, so templates can build the
+url from the image name alone and never resize images while rendering.
+"""
+from __future__ import absolute_import, unicode_literals
+from multiprocessing import Pool
+import threading
+
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import six
+from feincms import settings as feincms_settings
+from feincms.templatetags.feincms_thumbnail import Thumbnailer, CropscaleThumbnailer
+
+from .app_settings import RENDITIONS_ASYNC
+
+RENDITIONS = {
+    'teaser': (CropscaleThumbnailer, '150x150'),
+    'og': (CropscaleThumbnailer, '1200x630'),
+    'update': (Thumbnailer, '648x648'),
+}
+
+PROJECT_RENDITIONS = ('teaser', 'og')
+UPDATE_RENDITIONS = ('update',)
+
+
+def rendition_name(name, kind):
+    """ Returns the storage name of the rendition kind of image name """
+    thumbnailer, size = RENDITIONS[kind]
+    try:
+        basename, format = name.rsplit('.', 1)
+    except ValueError:
+        basename, format = name, 'jpg'
+    return ''.join([feincms_settings.FEINCMS_THUMBNAIL_DIR, basename,
+                    thumbnailer.MARKER, size, '.', format])
+
+
+def rendition_url(image, kind):
+    """ Returns the url of the rendition kind of an image field value """
+    if not image:
+        return ''
+    storage = getattr(image, 'storage', default_storage)
+    return storage.url(rendition_name(image.name, kind))
+
+
+def generate_renditions(name, kinds):
+    """ Generates the missing or outdated renditions of image name """
+    for kind in kinds:
+        thumbnailer, size = RENDITIONS[kind]
+        six.text_type(thumbnailer(name, size))
+
+
+def image_name(instance, field):
+    """ Name of the image in field without loading a deferred field """
+    value = instance.__dict__.get(field)
+    return getattr(value, 'name', value) or ''
+
+
+def schedule_renditions(image, kinds):
+    """ Generates the renditions of an image field value after saving """
+    if not image:
+        return
+    if RENDITIONS_ASYNC:
+        thread = threading.Thread(target=generate_renditions, args=(image.name, kinds))
+        thread.daemon = True
+        thread.start()
+    else:
+        generate_renditions(image.name, kinds)
+
+
+def project_saved(sender, instance, **kwargs):
+    name = image_name(instance, 'teaser_image')
+    if name != instance._loaded_teaser_image:
+        schedule_renditions(instance.teaser_image, PROJECT_RENDITIONS)
+    instance._loaded_teaser_image = name
+
+
+def update_saved(sender, instance, **kwargs):
+    name = image_name(instance, 'image')
+    if name != instance._loaded_image:
+        schedule_renditions(instance.image, UPDATE_RENDITIONS)
+    instance._loaded_image = name
+
+
+def _generate(task):
+    generate_renditions(*task)
+    return task[0]
+
+
+def regenerate_all(processes=None):
+    """
+    Generates the renditions of all project and update images in a process
+    pool. Returns the number of images processed.
+    """
+    from .models import Project, Update
+    tasks = [(name, PROJECT_RENDITIONS) for name in Project.objects.exclude(
+        teaser_image='').exclude(teaser_image__isnull=True).values_list(
+        'teaser_image', flat=True)]
+    tasks += [(name, UPDATE_RENDITIONS) for name in Update.objects.exclude(
+        image='').exclude(image__isnull=True).values_list('image', flat=True)]
+
+    # The forked workers must not share the database connection
+    connection.close()
+    pool = Pool(processes)
+    try:
+        return len(pool.map(_generate, tasks))
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,368 @@
+"""
+Full-text search of projects.
+
+The title, teaser text and rich text contents of a project are stored in
+one ProjectSearchEntry per language, taken from the translation of that
+language if there is one. The entries are updated whenever a project, a
+translation or one of their contents is saved.
+
+The entries are searched with an SQLite FTS5 table or a PostgreSQL tsvector
+column, other databases fall back to LIKE. The FTS5 table and the tsvector
+column are created after migrate and by the rebuild_search_index command.
+"""
+from __future__ import absolute_import, unicode_literals
+import re
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
+from django.db.models import Q
+from django.utils import six
+from django.utils.html import strip_tags
+from django.utils.timezone import now
+from django.utils.translation import get_language
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# PostgreSQL text search configurations of the languages
+CONFIGS = {
+    'da': 'danish', 'de': 'german', 'en': 'english', 'es': 'spanish',
+    'fi': 'finnish', 'fr': 'french', 'it': 'italian', 'nl': 'dutch',
+    'no': 'norwegian', 'pt': 'portuguese', 'ru': 'russian', 'sv': 'swedish',
+}
+
+# Projects that are being deleted must not be indexed again by the signals
+# of their contents and translations
+_deleting = set()
+
+
+def search_terms(query):
+    return WORD_RE.findall(query or '')
+
+
+def search_language(language=None):
+    """ Language of the entries searched for the active language """
+    language = language or get_language() or ''
+    codes = [code for code, name in settings.LANGUAGES]
+    for code in (language, language.split('-')[0]):
+        if code in codes:
+            return code
+    return codes[0]
+
+
+def plain_text(html):
+    return ' '.join(strip_tags(html or '').split())
+
+
+def content_text(obj):
+    """ Texts of the rich text contents of a project or translation """
+    texts = []
+    for region in obj.template.regions:
+        for content in getattr(obj.content, region.key):
+            text = getattr(content, 'text', None)
+            if isinstance(text, six.string_types):
+                texts.append(text)
+    return texts
+
+
+def project_texts(project):
+    """ Returns {language: (title, text)} of all languages """
+    base = (project.title, [project.teaser_text] + content_text(project))
+    translated = {}
+    # translations are an optional app
+    if hasattr(project, 'translations'):
+        for translation in project.translations.all():
+            translated[translation.lang] = (
+                translation.title,
+                [translation.teaser_text] + content_text(translation))
+
+    texts = {}
+    for language, name in settings.LANGUAGES:
+        title, parts = translated.get(language, base)
+        texts[language] = (plain_text(title), ' '.join(filter(None, map(plain_text, parts))))
+    return texts
+
+
+class SearchBackend(object):
+    """ Searches the entries with LIKE, used if no full-text index is available """
+
+    def setup(self):
+        pass
+
+    def index(self, entries):
+        pass
+
+    def remove(self, entry_ids):
+        pass
+
+    def entries(self, terms, language):
+        from .models import ProjectSearchEntry
+        entries = ProjectSearchEntry.objects.filter(
+            language=language, project__start__lte=now())
+        for term in terms:
+            entries = entries.filter(Q(title__icontains=term) | Q(text__icontains=term))
+        return entries
+
+    def count(self, terms, language):
+        return self.entries(terms, language).count()
+
+    def search(self, terms, language, offset, limit):
+        """ Returns the ids of the matching online projects, best match first """
+        entries = self.entries(terms, language).order_by('project__position')
+        return list(entries.values_list('project', flat=True)[offset:offset + limit])
+
+
+class SqliteBackend(SearchBackend):
+    """ Mirrors the entries into an FTS5 table """
+
+    table = 'zipfelchappe_projectsearch_fts'
+
+    def tables(self):
+        from .models import Project, ProjectSearchEntry
+        quote = connection.ops.quote_name
+        return {
+            'fts': quote(self.table),
+            'entry': quote(ProjectSearchEntry._meta.db_table),
+            'project': quote(Project._meta.db_table),
+        }
+
+    def setup(self):
+        connection.cursor().execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS %(fts)s USING fts5(title, text)' % self.tables())
+
+    def index(self, entries):
+        cursor = connection.cursor()
+        self.remove([entry.pk for entry in entries])
+        cursor.executemany(
+            'INSERT INTO %(fts)s (rowid, title, text) VALUES (%%s, %%s, %%s)' % self.tables(),
+            [(entry.pk, entry.title, entry.text) for entry in entries])
+
+    def remove(self, entry_ids):
+        if entry_ids:
+            connection.cursor().execute(
+                'DELETE FROM %s WHERE rowid IN (%s)' % (
+                    self.tables()['fts'], ', '.join(['%s'] * len(entry_ids))),
+                entry_ids)
+
+    def query(self, select, terms, language, suffix='', params=()):
+        # prefix queries of all terms, the terms are words without quotes
+        match = ' '.join('"%s"*' % term for term in terms)
+        cursor = connection.cursor()
+        cursor.execute(('SELECT ' + select + ' FROM %(fts)s'
+                        ' JOIN %(entry)s e ON e.id = %(fts)s.rowid'
+                        ' JOIN %(project)s p ON p.id = e.project_id'
+                        ' WHERE %(fts)s MATCH %%s AND e.language = %%s'
+                        ' AND p.start <= %%s' % self.tables()) + suffix,
+                       [match, language, now()] + list(params))
+        return cursor.fetchall()
+
+    def count(self, terms, language):
+        return self.query('COUNT(*)', terms, language)[0][0]
+
+    def search(self, terms, language, offset, limit):
+        # matches in the title weigh ten times as much as in the text
+        rows = self.query('e.project_id', terms, language,
+                          ' ORDER BY bm25(%s, 10.0, 1.0) LIMIT %%s OFFSET %%s'
+                          % self.tables()['fts'], (limit, offset))
+        return [row[0] for row in rows]
+
+
+class PostgresBackend(SearchBackend):
+    """ Stores a tsvector of every entry in a column with a GIN index """
+
+    def setup(self):
+        from .models import ProjectSearchEntry
+        table = connection.ops.quote_name(ProjectSearchEntry._meta.db_table)
+        cursor = connection.cursor()
+        cursor.execute('ALTER TABLE %s ADD COLUMN IF NOT EXISTS document tsvector' % table)
+        cursor.execute('CREATE INDEX IF NOT EXISTS zipfelchappe_projectsearch_document'
+                       ' ON %s USING gin(document)' % table)
+
+    def config(self, language):
+        return CONFIGS.get(language.split('-')[0], 'simple')
+
+    def index(self, entries):
+        from .models import ProjectSearchEntry
+        cursor = connection.cursor()
+        for entry in entries:
+            config = self.config(entry.language)
+            cursor.execute(
+                'UPDATE %s SET document ='
+                " setweight(to_tsvector(%%s::regconfig, title), 'A') ||"
+                " setweight(to_tsvector(%%s::regconfig, text), 'B')"
+                ' WHERE id = %%s' % connection.ops.quote_name(ProjectSearchEntry._meta.db_table),
+                [config, config, entry.pk])
+
+    def query(self, select, terms, language, suffix='', params=()):
+        from .models import Project, ProjectSearchEntry
+        quote = connection.ops.quote_name
+        cursor = connection.cursor()
+        cursor.execute(
+            'SELECT ' + select + ' FROM %s e JOIN %s p ON p.id = e.project_id,'
+            ' to_tsquery(%%s::regconfig, %%s) query'
+            ' WHERE e.document @@ query AND e.language = %%s AND p.start <= %%s' % (
+                quote(ProjectSearchEntry._meta.db_table), quote(Project._meta.db_table)
+            ) + suffix,
+            [self.config(language), ' & '.join('%s:*' % term for term in terms),
+             language, now()] + list(params))
+        return cursor.fetchall()
+
+    def count(self, terms, language):
+        return self.query('COUNT(*)', terms, language)[0][0]
+
+    def search(self, terms, language, offset, limit):
+        rows = self.query('e.project_id', terms, language,
+                          ' ORDER BY ts_rank(e.document, query) DESC LIMIT %s OFFSET %s',
+                          (limit, offset))
+        return [row[0] for row in rows]
+
+
+_fts5 = None
+
+
+def sqlite_has_fts5():
+    global _fts5
+    if _fts5 is None:
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA compile_options')
+        _fts5 = any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+    return _fts5
+
+
+def get_backend():
+    if connection.vendor == 'sqlite' and sqlite_has_fts5():
+        return SqliteBackend()
+    elif connection.vendor == 'postgresql':
+        return PostgresBackend()
+    return SearchBackend()
+
+
+def update_project(project):
+    """ Updates the search entries of project in all languages """
+    from .models import ProjectSearchEntry
+    existing = dict((entry.language, entry) for entry in project.search_entries.all())
+    changed = []
+    for language, (title, text) in project_texts(project).items():
+        entry = existing.pop(language, None)
+        if entry is None:
+            entry = ProjectSearchEntry.objects.create(
+                project=project, language=language, title=title, text=text)
+        elif (entry.title, entry.text) != (title, text):
+            entry.title, entry.text = title, text
+            entry.save()
+        else:
+            continue
+        changed.append(entry)
+
+    backend = get_backend()
+    if existing:
+        # languages that were removed from the settings
+        stale_ids = [stale.pk for stale in existing.values()]
+        backend.remove(stale_ids)
+        ProjectSearchEntry.objects.filter(pk__in=stale_ids).delete()
+    if changed:
+        backend.index(changed)
+
+
+def update_project_id(project_id):
+    from .models import Project
+    if project_id in _deleting:
+        return
+    project = Project.objects.filter(pk=project_id).first()
+    if project is not None:
+        update_project(project)
+
+
+def rebuild_index():
+    """ Creates the full-text index and updates the entries of all projects """
+    from .models import Project
+    backend = get_backend()
+    backend.setup()
+    count = 0
+    for project in Project.objects.all():
+        # index all entries again, the full-text index may be new
+        backend.remove(list(project.search_entries.values_list('id', flat=True)))
+        project.search_entries.all().delete()
+        update_project(project)
+        count += 1
+    return count
+
+
+class SearchResults(object):
+    """ Online projects matching a query, ranked and sliced by the paginator """
+
+    def __init__(self, query, language=None):
+        self.terms = search_terms(query)
+        self.language = search_language(language)
+        self.backend = get_backend()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.terms, self.language) if self.terms else 0
+        return self._count
+
+    __len__ = count
+
+    def __getitem__(self, index):
+        from .models import Project
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        stop = self.count() if index.stop is None else index.stop
+        if not self.terms or stop <= start:
+            return []
+        ids = self.backend.search(self.terms, self.language, start, stop - start)
+        projects = dict((project.pk, project) for project in Project.load_translations(
+            Project.objects.with_achieved().filter(pk__in=ids)))
+        return [projects[pk] for pk in ids if pk in projects]
+
+
+def search_projects(query, language=None):
+    return SearchResults(query, language)
+
+
+# -----------------------------------
+#  signal handlers
+# -----------------------------------
+
+def setup_search(sender, **kwargs):
+    """ Creates the full-text index after migrate """
+    if getattr(sender, 'name', None) == 'zipfelchappe':
+        get_backend().setup()
+
+
+def project_indexed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_project(instance)
+
+
+def project_deleting(sender, instance, **kwargs):
+    _deleting.add(instance.pk)
+    get_backend().remove(list(instance.search_entries.values_list('id', flat=True)))
+
+
+def project_deleted(sender, instance, **kwargs):
+    _deleting.discard(instance.pk)
+
+
+def content_indexed(sender, instance, raw=False, **kwargs):
+    """ Content types are created at runtime, filter them here """
+    from .models import Project
+    if raw or not hasattr(instance, 'text'):
+        return
+    if getattr(sender, '_feincms_content_class', None) is Project:
+        update_project_id(instance.parent_id)
+
+
+def translation_indexed(sender, instance, raw=False, **kwargs):
+    """ Handler for project translations and their contents """
+    if raw:
+        return
+    try:
+        if hasattr(instance, 'translation_of_id'):
+            update_project_id(instance.translation_of_id)
+        elif hasattr(instance, 'text'):
+            update_project_id(instance.parent.translation_of_id)
+    except ObjectDoesNotExist:
+        pass  # deleted together with the project
@@ -1,4 +1,22 @@
 $(function () {
+    // Panes with a data-src are loaded the first time they are shown
+    function load($pane, search) {
+        $pane.data('loaded', true);
+        $pane.load($pane.data('src') + (search || ''));
+    }
+
+    $('.tab-content').on('click', '.tab-pane[data-src] .pagination a', function (e) {
+        load($(this).closest('.tab-pane'), $(this).attr('href').split('#')[0]);
+        return false;
+    });
+
+    $('.nav-tabs a').on('show', function (e) {
+        var $pane = $($(this).attr('href'));
+        if ($pane.data('src') && !$pane.data('loaded')) {
+            load($pane, document.location.search);
+        }
+    });
+
     $('.nav-tabs a').click(function (e) {
       document.location.hash = $(this).attr('href');
       $(this).tab('show');
@@ -12,4 +30,4 @@ $(function () {
     } else {
         $('.nav-tabs a[href="'+window.location.hash+'"]').tab('show');
     }
-});
\ No newline at end of file
+});
@@ -2,6 +2,10 @@ from __future__ import unicode_literals, absolute_import
 from django.utils import timezone
 from django import template
 
+from zipfelchappe.app_settings import FRAGMENT_CACHE_TIMEOUT
+from zipfelchappe.caching import generation
+from zipfelchappe.renditions import rendition_url
+
 register = template.Library()
 
 
@@ -41,3 +45,23 @@ def remaining(project, value):
             return (td.seconds//60) % 60
     else:
         return 0
+
+
+@register.filter
+def rendition(image, kind):
+    """ Url of a pre-generated rendition, see zipfelchappe.renditions """
+    return rendition_url(image, kind)
+
+
+@register.assignment_tag
+def project_cache(project):
+    """
+    Timeout and generation for fragment caches of a project::
+
+        {% project_cache project as fragment %}
+        {% cache fragment.timeout project_rewards project.pk LANGUAGE_CODE fragment.generation %}
+    """
+    return {
+        'timeout': FRAGMENT_CACHE_TIMEOUT,
+        'generation': generation(project.pk),
+    }
@@ -1,10 +1,16 @@
 
 from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models import signals
+from django.utils.timezone import now
 from django.utils.translation import ugettext_lazy as _
 
 from feincms.models import Base
 
+from zipfelchappe.caching import bump_generation
+from zipfelchappe.search import translation_indexed
+
 
 class ProjectTranslation(Base):
 
@@ -96,3 +102,55 @@ class MailTemplateTranslation(models.Model):
     def __unicode__(self):
         return u'%s (%s)' % (self.translation_of,
             self.translation.get_lang_display())
+
+
+def translation_changed(sender, instance, **kwargs):
+    if isinstance(instance, ProjectTranslation):
+        bump_generation(instance.translation_of_id)
+    else:
+        try:
+            bump_generation(instance.translation.translation_of_id)
+        except ObjectDoesNotExist:
+            pass  # deleted together with the project
+
+
+for model in (ProjectTranslation, RewardTranslation, UpdateTranslation):
+    signals.post_save.connect(translation_changed, sender=model)
+    signals.post_delete.connect(translation_changed, sender=model)
+
+
+def translated_object_touched(sender, instance, **kwargs):
+    """
+    Reward option labels and compiled mail templates are cached by the
+    modification time of the translated object, update it.
+    """
+    translated_model = sender._meta.get_field('translation_of').rel.to
+    translated_model.objects.filter(pk=instance.translation_of_id).update(modified=now())
+
+
+for model in (RewardTranslation, MailTemplateTranslation):
+    signals.post_save.connect(translated_object_touched, sender=model)
+    signals.post_delete.connect(translated_object_touched, sender=model)
+
+
+def translation_content_changed(sender, instance, **kwargs):
+    """ Content types are created at runtime, filter them here """
+    if getattr(sender, '_feincms_content_class', None) is ProjectTranslation:
+        try:
+            bump_generation(instance.parent.translation_of_id)
+        except ObjectDoesNotExist:
+            pass  # deleted together with the project
+
+
+signals.post_save.connect(translation_content_changed)
+signals.post_delete.connect(translation_content_changed)
+
+
+def translation_content_indexed(sender, instance, **kwargs):
+    if (sender is ProjectTranslation or
+            getattr(sender, '_feincms_content_class', None) is ProjectTranslation):
+        translation_indexed(sender, instance, **kwargs)
+
+
+signals.post_save.connect(translation_content_indexed)
+signals.post_delete.connect(translation_content_indexed)
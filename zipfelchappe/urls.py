@@ -7,12 +7,27 @@ urlpatterns = patterns(
     url(r'^$',
         views.ProjectListView.as_view(),
         name='zipfelchappe_project_list'),
+    url(r'^search/$',
+        views.ProjectSearchView.as_view(),
+        name='zipfelchappe_project_search'),
     url(r'^project/(?P<slug>[\w-]+)/$',
         views.ProjectDetailView.as_view(),
         name='zipfelchappe_project_detail'),
     url(r'^project/(?P<slug>[\w-]+)/backed/$',
         views.ProjectDetailHasBackedView.as_view(),
         name='zipfelchappe_project_backed'),
+    url(r'^project/(?P<slug>[\w-]+)/updates/$',
+        views.ProjectUpdatesView.as_view(),
+        name='zipfelchappe_project_updates'),
+    url(r'^project/(?P<slug>[\w-]+)/backers/$',
+        views.ProjectBackersView.as_view(),
+        name='zipfelchappe_project_backers'),
+    url(r'^project/(?P<slug>[\w-]+)/comments/$',
+        views.ProjectCommentsView.as_view(),
+        name='zipfelchappe_project_comments'),
+    url(r'^project/(?P<slug>[\w-]+)/progress/$',
+        views.project_progress,
+        name='zipfelchappe_project_progress'),
     url(r'^category/(?P<slug>[\w-]+)/',
         views.ProjectCategoryListView.as_view(),
         name='zipfelchappe_project_category_list'),
@@ -1,9 +1,15 @@
 from __future__ import absolute_import, unicode_literals
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+import threading
+import time
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Q
 from django.db.models.fields import FieldDoesNotExist
+from django.utils import timezone
 from django.utils.html import conditional_escape
 from django.utils.safestring import mark_safe
 
@@ -63,3 +69,124 @@ def get_user_search_fields():
             fields.remove(field_name)
 
     return fields
+
+
+def chunked(items, size):
+    """ Splits a list into lists of at most size items """
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class RateLimiter(object):
+    """ Spaces out calls to wait() so at most rate calls per second pass """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_call = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.time()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def map_concurrently(func, items, workers=4, rate=None):
+    """
+    Calls func for every item in a bounded thread pool, optionally limited
+    to rate calls per second. Meant for calls to external services, func
+    should not access the database.
+
+    Returns a list of (item, result, exception) tuples in the order of items.
+    """
+    limiter = RateLimiter(rate)
+
+    def call(item):
+        limiter.wait()
+        try:
+            return item, func(item), None
+        except Exception as e:
+            return item, None, e
+
+    pool = ThreadPool(max(workers, 1))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+
+def encode_cursor(obj):
+    """ Returns a keyset cursor for the (created, id) position of obj """
+    created = obj.created
+    if timezone.is_aware(created):
+        created = timezone.make_naive(created, timezone.utc)
+    return '%s.%d' % (created.strftime(CURSOR_FORMAT), obj.pk)
+
+
+def decode_cursor(cursor):
+    """ Returns the (created, id) tuple of a cursor, raises ValueError """
+    created, pk = cursor.split('.')
+    created = datetime.strptime(created, CURSOR_FORMAT)
+    if settings.USE_TZ:
+        created = timezone.make_aware(created, timezone.utc)
+    return created, int(pk)
+
+
+class KeysetPage(object):
+    """ One page of a keyset paginated queryset, newest objects first """
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.has_previous else None
+
+
+def keyset_page(queryset, per_page, after=None, before=None):
+    """
+    Returns a KeysetPage of queryset ordered by (created, id) descending.
+    Unlike offset pagination the database does not need to skip the
+    objects of all previous pages, so deep pages are as fast as the first.
+
+    :param after: Cursor of the last object of the previous page.
+    :param before: Cursor of the first object of the following page.
+    Invalid cursors return the first page.
+    """
+    try:
+        if before:
+            created, pk = decode_cursor(before)
+            newer = queryset.filter(
+                Q(created__gt=created) | Q(created=created, pk__gt=pk)
+            ).order_by('created', 'pk')
+            objects = list(newer[:per_page + 1])
+            return KeysetPage(objects[:per_page][::-1], True, len(objects) > per_page)
+        if after:
+            created, pk = decode_cursor(after)
+            queryset = queryset.filter(
+                Q(created__lt=created) | Q(created=created, pk__lt=pk))
+    except ValueError:
+        after = None
+
+    objects = list(queryset.order_by('-created', '-pk')[:per_page + 1])
+    return KeysetPage(objects[:per_page], len(objects) > per_page, bool(after))
@@ -1,6 +1,6 @@
 from __future__ import absolute_import, unicode_literals
 from functools import wraps
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
+import time
 
 from django.shortcuts import get_object_or_404, redirect as _redirect
 from django.views.generic import ListView, DetailView, TemplateView
@@ -8,16 +8,26 @@ from django.views.generic import ListView, DetailView, TemplateView
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.urlresolvers import NoReverseMatch
+from django.db.models import Count, Sum
+from django.contrib.messages import get_messages
+from django.http import Http404, HttpResponseNotModified, JsonResponse
 from django.utils.decorators import method_decorator
-from django.utils.translation import ugettext_lazy as _
+from django.utils.http import parse_etags, quote_etag, urlencode
+from django.utils.timezone import now
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.utils.translation import get_language, ugettext_lazy as _
 
-from feincms.content.application.models import app_reverse
+from feincms.content.application.models import app_reverse, standalone
 from feincms.module.mixins import ContentView
 
 from . import forms, app_settings, payment_providers
+from .caching import generation
 from .emails import send_pledge_completed_message
+from .listing import SORTS, STATUSES, cached_project_facets, filter_projects, has_categories
+from .search import search_projects
 from .models import Project, Pledge, Backer, Category, Update
-from .utils import get_object_or_none
+from .utils import get_object_or_none, keyset_page
 
 
 # -----------------------------------
@@ -25,11 +35,20 @@ from .utils import get_object_or_none
 # -----------------------------------
 
 def get_session_pledge(request):
-    """ returns the last created pledge for the current session or None """
+    """ returns the last created pledge for the current session or None.
+        The pledge is looked up once per request and cached on it. """
     pledge_id = request.session.get('pledge_id', None)
+    cached = getattr(request, '_zipfelchappe_session_pledge', None)
+    if cached is not None and cached[0] == pledge_id:
+        return cached[1]
+
+    pledge = None
     if pledge_id:
-        return get_object_or_none(Pledge, pk=pledge_id)
-    return None
+        pledge = get_object_or_none(
+            Pledge.objects.select_related('project', 'backer__user', 'reward'),
+            pk=pledge_id)
+    request._zipfelchappe_session_pledge = (pledge_id, pledge)
+    return pledge
 
 
 def requires_pledge(func):
@@ -83,7 +102,9 @@ class PledgeContextMixin(object):
     def get_context_data(self, *args, **kwargs):
         context = super(PledgeContextMixin, self).get_context_data(*args, **kwargs)
 
-        pledge = getattr(self, 'pledge', get_session_pledge(self.request))
+        pledge = getattr(self, 'pledge', None)
+        if pledge is None:
+            pledge = get_session_pledge(self.request)
 
         if pledge:
             context.update({
@@ -101,6 +122,47 @@ class FeincmsRenderMixin(object):
         return self.get_template_names(), context
 
 
+class ConditionalGetMixin(object):
+    """
+    Answers GET requests of anonymous visitors with 304 Not Modified while
+    the ETag they send is current. The ETag is built from get_etag, the
+    language and the current period of ZIPFELCHAPPE_CONDITIONAL_GET_PERIOD
+    seconds, so time dependent content such as the days left is refreshed
+    after one period at the latest. Rendered pages only carry the ETag if
+    conditional_response_processor is registered on the page model.
+    """
+
+    def get_etag(self, request, *args, **kwargs):
+        return None
+
+    def dispatch(self, request, *args, **kwargs):
+        period = app_settings.CONDITIONAL_GET_PERIOD
+        # Pages of logged in users and pages with messages are personal
+        if (period and request.method in ('GET', 'HEAD') and
+                not request.user.is_authenticated() and
+                not len(get_messages(request))):
+            etag = self.get_etag(request, *args, **kwargs)
+            if etag is not None:
+                etag = '%s-%s-%d' % (etag, get_language(), int(time.time()) // period)
+                if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+                    response = HttpResponseNotModified()
+                    response['ETag'] = quote_etag(etag)
+                    return response
+                request._zipfelchappe_etag = etag
+        return super(ConditionalGetMixin, self).dispatch(request, *args, **kwargs)
+
+
+def conditional_response_processor(page, request, response):
+    """
+    Page response processor sending the ETag of the project views::
+
+        Page.register_response_processor(conditional_response_processor)
+    """
+    etag = getattr(request, '_zipfelchappe_etag', None)
+    if etag and response.status_code == 200 and not response.has_header('ETag'):
+        response['ETag'] = quote_etag(etag)
+
+
 def reverse(view_name, *args, **kwargs):
     """ Reverse within our app context """
     return app_reverse(view_name, app_settings.ROOT_URLS, args=args, kwargs=kwargs)
@@ -118,34 +180,145 @@ def redirect(view_name, *args, **kwargs):
 #  views
 # -----------------------------------
 
-class ProjectListView(FeincmsRenderMixin, ListView):
+class ProjectListView(ConditionalGetMixin, FeincmsRenderMixin, ListView):
     """ List view of all projects that are active or finished.
         To change pagination count set ZIPFELCHAPPE_PAGINATE_BY in settings.
+        The list is sorted by the sort parameter and filtered by the
+        currency and status parameters, see zipfelchappe.listing.
     """
     context_object_name = "project_list"
     paginate_by = app_settings.PAGINATE_BY
     model = Project
 
+    def get_etag(self, request, *args, **kwargs):
+        return 'projects-%s' % generation()
+
+    def get_category(self):
+        return None
+
+    def get_params(self):
+        """ Returns the valid sort and filter parameters of the request """
+        params = {}
+        sort = self.request.GET.get('sort')
+        if sort in SORTS and sort != 'position':
+            params['sort'] = sort
+        currency = self.request.GET.get('currency')
+        if currency in app_settings.CURRENCIES:
+            params['currency'] = currency
+        status = self.request.GET.get('status')
+        if status in STATUSES:
+            params['status'] = status
+        return params
+
     def get_queryset(self):
-        return Project.objects.online().select_related()
+        self.category = self.get_category()
+        self.params = self.get_params()
+        return filter_projects(
+            Project.objects.online(),
+            sort=self.params.get('sort', 'position'),
+            category=self.category,
+            currency=self.params.get('currency'),
+            status=self.params.get('status'),
+        ).select_related()
+
+    def query(self, **changes):
+        """ Query string of the current parameters with changes applied """
+        params = dict(self.params, **changes)
+        return urlencode(sorted((k, v) for k, v in params.items() if v))
 
     def get_context_data(self, **kwargs):
         context = super(ProjectListView, self).get_context_data(**kwargs)
-        context['category_list'] = Category.objects.all()
+        params = self.params
+        categories = Category.objects.with_project_counts() if has_categories() else []
+        # Without other filters the category counts are the cached totals
+        filtered = 'currency' in params or 'status' in params
+        facets = cached_project_facets(
+            categories=categories if filtered else (),
+            category=self.category,
+            currency=params.get('currency'),
+            status=params.get('status'),
+        )
+        if not filtered:
+            facets['category'] = [
+                (category, category.project_count) for category in categories]
+        context['category'] = self.category
+        context['query'] = self.query()
+        context['sort_list'] = [{
+            'label': label,
+            'query': self.query(sort=None if sort == 'position' else sort),
+            'selected': params.get('sort', 'position') == sort,
+        } for sort, (label, ordering) in SORTS.items()]
+        context['category_list'] = [{
+            'category': category,
+            'count': count,
+            'selected': category == self.category,
+        } for category, count in facets['category']]
+        context['currency_list'] = [{
+            'label': currency,
+            'count': count,
+            'query': self.query(currency=currency),
+            'selected': params.get('currency') == currency,
+        } for currency, count in facets['currency']]
+        context['status_list'] = [{
+            'label': STATUSES[status],
+            'count': count,
+            'query': self.query(status=status),
+            'selected': params.get('status') == status,
+        } for status, count in facets['status']]
+        context['unfiltered_queries'] = {
+            'currency': self.query(currency=None),
+            'status': self.query(status=None),
+        }
         return context
 
 
 class ProjectCategoryListView(ProjectListView):
     """ Filtered project list view for only one category """
 
+    def get_category(self):
+        return get_object_or_404(Category, slug=self.kwargs['slug'])
+
+
+class ProjectSearchView(FeincmsRenderMixin, ListView):
+    """ Online projects matching the q parameter, best match first """
+
+    context_object_name = "project_list"
+    paginate_by = app_settings.PAGINATE_BY
+    template_name = 'zipfelchappe/project_search.html'
+
     def get_queryset(self):
-        category = get_object_or_404(Category, slug=self.kwargs['slug'])
-        online_projects = Project.objects.online().select_related()
-        return online_projects.filter(categories=category)
+        self.query = self.request.GET.get('q', '').strip()
+        return search_projects(self.query)
+
+    def get_context_data(self, **kwargs):
+        context = super(ProjectSearchView, self).get_context_data(**kwargs)
+        context['query'] = self.query
+        return context
+
+
+def project_etag(slug):
+    """ ETag part of the pages of an online project, None if there is none """
+    project_id = Project.objects.online().filter(
+        slug=slug).values_list('id', flat=True).first()
+    if project_id is not None:
+        return 'project-%s-%s' % (project_id, generation(project_id))
+
+
+def backer_page(request, project):
+    """ Keyset paginated list of the backers of a project """
+    return keyset_page(
+        project.backer_pledges,
+        app_settings.PAGINATE_BACKERS_BY,
+        after=request.GET.get('backers-after'),
+        before=request.GET.get('backers-before'),
+    )
 
 
-class ProjectDetailView(FeincmsRenderMixin, ContentView):
-    """ Show status, description, updates, backers and comments of a project """
+class ProjectDetailView(ConditionalGetMixin, FeincmsRenderMixin, ContentView):
+    """
+    Show status and description of a project. The updates, backers and
+    comments tabs are loaded from the fragment views when they are shown.
+    """
 
     context_object_name = "project"
     model = Project
@@ -154,30 +327,86 @@ class ProjectDetailView(FeincmsRenderMixin, ContentView):
         # limit queryset to projects that have started.
         return Project.objects.online()
 
+    def get_etag(self, request, *args, **kwargs):
+        return project_etag(kwargs['slug'])
+
     def get_context_data(self, **kwargs):
         context = super(ProjectDetailView, self).get_context_data(**kwargs)
         context['disqus_shortname'] = app_settings.DISQUS_SHORTNAME
-        context['updates'] = context['project'].updates.filter(
+        context['backer_count'] = context['project'].backer_count
+        return context
+
+
+class ProjectFragmentView(ConditionalGetMixin, DetailView):
+    """
+    Base of the tab fragments of the project detail page. The fragments
+    are sent without the page around them and carry their own ETag.
+    """
+
+    context_object_name = 'project'
+    model = Project
+
+    def get_queryset(self):
+        return Project.objects.online()
+
+    def get_etag(self, request, *args, **kwargs):
+        etag = project_etag(kwargs['slug'])
+        if etag is not None:
+            return '%s-%s' % (self.fragment, etag)
+
+    @method_decorator(standalone)
+    def dispatch(self, request, *args, **kwargs):
+        return super(ProjectFragmentView, self).dispatch(request, *args, **kwargs)
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super(ProjectFragmentView, self).render_to_response(
+            context, **response_kwargs)
+        etag = getattr(self.request, '_zipfelchappe_etag', None)
+        if etag:
+            response['ETag'] = quote_etag(etag)
+        return response
+
+
+class ProjectUpdatesView(ProjectFragmentView):
+    """ Published updates of a project """
+
+    fragment = 'updates'
+    template_name = 'zipfelchappe/project_updates.html'
+
+    def get_context_data(self, **kwargs):
+        context = super(ProjectUpdatesView, self).get_context_data(**kwargs)
+        context['updates'] = self.object.updates.filter(
             status=Update.STATUS_PUBLISHED
         )
-        # create a paginated list of backers.
-        pledges = context['project'].authorized_pledges
-        paginator = Paginator(pledges, app_settings.PAGINATE_BACKERS_BY)
-        context['backer_count'] = len(pledges)
-        context['paginator'] = paginator
-        page = int(self.request.GET.get('backers-page', 1))
-        try:
-            context['page_obj'] = paginator.page(page)
-        except PageNotAnInteger:
-            # If page is not an integer, deliver first page.
-            context['page_obj'] = paginator.page(1)
-        except EmptyPage:
-            # If page is out of range (e.g. 9999), deliver last page of results.
-            context['page_obj'] = paginator.page(paginator.num_pages)
+        return context
+
 
+class ProjectBackersView(ProjectFragmentView):
+    """ One page of the backers of a project """
+
+    fragment = 'backers'
+    template_name = 'zipfelchappe/project_backers.html'
+
+    def get_etag(self, request, *args, **kwargs):
+        etag = super(ProjectBackersView, self).get_etag(request, *args, **kwargs)
+        if etag is not None:
+            return '%s-%s-%s' % (etag, request.GET.get('backers-after', ''),
+                                 request.GET.get('backers-before', ''))
+
+    def get_context_data(self, **kwargs):
+        context = super(ProjectBackersView, self).get_context_data(**kwargs)
+        context['backer_count'] = self.object.backer_count
+        context['page_obj'] = backer_page(self.request, self.object)
         return context
 
 
+class ProjectCommentsView(ProjectFragmentView):
+    """ Comments of a project and the form to write one """
+
+    fragment = 'comments'
+    template_name = 'zipfelchappe/project_comments.html'
+
+
 class UpdateDetailView(FeincmsRenderMixin, DetailView):
     """ Just a simple view of one project update for preview purposes """
 
@@ -198,8 +427,13 @@ class ProjectDetailHasBackedView(ProjectDetailView):
     def get_queryset(self):
         return Project.objects.online()
 
+    def get_etag(self, request, *args, **kwargs):
+        # Shows the pledge completed in this session
+        return None
+
     def get_context_data(self, **kwargs):
         context = super(ProjectDetailHasBackedView, self).get_context_data(**kwargs)
+        context['page_obj'] = backer_page(self.request, context['project'])
 
         if 'completed_pledge_id' in self.request.session:
             pledge_id = self.request.session['completed_pledge_id']
@@ -264,6 +498,7 @@ def backer_authenticate(request, pledge):
     """
     payment_view = payment_providers[pledge.provider].payment_url()
     backer, created = Backer.objects.get_or_create(user=request.user)
+    backer.user = request.user  # saves loading the user again
     pledge.set_backer(backer)
 
     pledge.save()
@@ -297,6 +532,52 @@ def pledge_cancel(request):
         return redirect('zipfelchappe_project_detail', slug=pledge.project.slug)
 
 
+def progress_minute():
+    """ Current minute, the remaining time of the progress is exact to it """
+    return int(time.time()) // 60
+
+
+def project_progress_state(request, slug):
+    """
+    Returns (id, goal, end) of an online project, looked up once per request
+    for both the ETag and the response.
+    """
+    if not hasattr(request, '_zipfelchappe_progress'):
+        state = Project.objects.online().filter(slug=slug).values_list(
+            'id', 'goal', 'end').first()
+        if state is None:
+            raise Http404
+        request._zipfelchappe_progress = state
+    return request._zipfelchappe_progress
+
+
+def project_progress_etag(request, slug):
+    # The generation changes with the pledges, goal and end of the project
+    project_id = project_progress_state(request, slug)[0]
+    return 'progress-%s-%s-%d' % (project_id, generation(project_id), progress_minute())
+
+
+@cache_control(public=True, max_age=app_settings.PROGRESS_MAX_AGE)
+@condition(etag_func=project_progress_etag)
+def project_progress(request, slug):
+    """ Funding progress of a project as JSON for polling clients """
+    project_id, goal, end = project_progress_state(request, slug)
+    totals = Pledge.objects.filter(
+        project=project_id, status__gte=Pledge.AUTHORIZED
+    ).aggregate(achieved=Sum('amount'), backers=Count('id'))
+    achieved = totals['achieved'] or 0
+    remaining = end - now()
+
+    return JsonResponse({
+        'achieved': float(achieved),
+        'goal': float(goal),
+        'percent': int(round((achieved * 100) / goal)),
+        'backers': totals['backers'],
+        'end': end.isoformat(),
+        'remaining': max(int(remaining.total_seconds()), 0),
+    })
+
+
 class PledgeLostView(FeincmsRenderMixin, TemplateView):
     """ Error message showed by @pledge_required if not pledge was found """
     template_name = "zipfelchappe/pledge_lost.html"
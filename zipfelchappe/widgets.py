@@ -5,7 +5,7 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.admin.widgets import AdminFileWidget
 
-from feincms.templatetags.feincms_thumbnail import cropscale
+from .renditions import rendition_url
 
 
 class AdminImageWidget(AdminFileWidget):
@@ -29,7 +29,7 @@ class AdminImageWidget(AdminFileWidget):
 
         if value and hasattr(value, "url"):
             template = self.template_with_initial
-            substitutions['initial'] = u'<img src="%s" />' % cropscale(value, '150x150')
+            substitutions['initial'] = u'<img src="%s" />' % rendition_url(value, 'teaser')
             if not self.is_required:
                 checkbox_name = self.clear_checkbox_name(name)
                 checkbox_id = self.clear_checkbox_id(checkbox_name)